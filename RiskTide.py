@@ -1,32 +1,49 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import pandas as pd
-import pickle  # For saving the portfolio data
 import webbrowser  # For clickable links
-import subprocess
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import sys
 import os
-from matplotlib.backends.backend_pdf import PdfPages
-import winsound
+try:
+    import winsound  # Windows only; the startup sound is skipped elsewhere
+except ImportError:
+    winsound = None
+import risktide_metrics  # In-process metrics engine (formerly run as RiskTide Metrics.py)
+import risktide_store  # SQLite portfolio store (replaces portfolio.pkl)
+import risktide_import
+import risktide_prices
+from risktide_views import VirtualTreeview
+import risktide_graphs  # Background graph rendering with an image cache
+import risktide_report  # Headless PDF report
+import risktide_horizon  # Benchmark refresh (formerly run as RiskTide Horizon.py)
+import risktide_trace  # Stage timings for the Diagnostics window
+import risktide_workspace  # Named portfolios sharing one benchmark
 startup_sound_file = 'startuprt.wav'  # Make sure this file exists in the same directory or update the path
 
-from tkinter import filedialog
+from tkinter import filedialog, simpledialog
 import threading  # Add this at the top of your script
-def run_external_scripts_threaded():
-    """Runs external scripts in a separate thread"""
-    threading.Thread(target=run_external_scripts).start()
-
-def run_external_scripts():
-    # Run RiskTide Horizon.py and wait for it to finish
-    subprocess.run(["python", "RiskTide Horizon.py"])
-    
-    # After Horizon finishes, run RiskTide Metrics.py
-    subprocess.run(["python", "RiskTide Metrics.py"])
+import queue
+def refresh_workspace(workspace, progress=print):
+    """Refresh the benchmark and bring the metrics of every portfolio up to date, reporting each stage to progress"""
+    with risktide_trace.run('refresh'):
+        # Refresh the SPY benchmark in-process; returns in milliseconds when it is still fresh
+        progress("Checking SPY benchmark...")
+        risktide_horizon.main()
+
+        # Loaded once per refresh and shared read-only by every portfolio
+        progress("Loading SPY benchmark...")
+        workspace.load_benchmark(reload=True)
+
+        # Daily price histories, when some were ingested, give the metrics real returns instead of lot prices
+        prices = risktide_prices.PriceStore.open_existing()
+
+        # Only portfolios whose lots (or the benchmark) changed are recomputed, several at a time
+        names = workspace.names()
+        progress(f"Computing metrics for {len(names)} portfolios...")
+        return workspace.compute_all(names, prices=prices, progress=progress)
     
 def play_startup_sound():
+    if winsound is None:
+        return
     if os.path.exists(startup_sound_file):
         try:
             winsound.PlaySound(startup_sound_file, winsound.SND_FILENAME | winsound.SND_ASYNC)
@@ -168,21 +185,26 @@ class RiskTideGUI:
 
         self.scrollbar_y = tk.Scrollbar(self.treeview_frame, orient="vertical")
         self.scrollbar_y.pack(side="right", fill="y")
-        self.columns = ("Stock Ticker", "Date Purchased", "Units Purchased", "Purchase Price", "Total Purchase Price")
+        self.columns = risktide_store.portfolio_columns
 
-        # Place the Treeview inside the treeview_frame instead of root
-        self.tree = ttk.Treeview(self.treeview_frame, columns=self.columns, show="headings", height=10)
+        # Place the Treeview inside the treeview_frame instead of root; only the visible rows are materialized
+        self.portfolio_view = VirtualTreeview(self.treeview_frame, columns=self.columns, height=10, yscrollbar=self.scrollbar_y)
+        self.tree = self.portfolio_view.tree
         
         # Configure columns and headings
         for col in self.columns:
-            self.tree.heading(col, text=col, anchor="center", command=lambda c=col: self.sort_column(c, False))
+            self.tree.heading(col, text=col, anchor="center", command=lambda c=col: self.sort_column(c))
             self.tree.column(col, anchor="center", width=150)
+
+        # Shift+click on a heading adds it as a secondary sort column
+        self.sort_order = []  # [(column, reverse), ...], most significant first
+        self.sort_shift = False
+        self.tree.bind("<Button-1>", lambda e: setattr(self, "sort_shift", bool(e.state & 0x0001)), add="+")
         
         # Pack the Treeview and scrollbars within the frame
-        self.tree.pack(fill="both", expand=True)
-        self.scrollbar_y.config(command=self.tree.yview)
+        self.portfolio_view.pack(fill="both", expand=True)
         self.scrollbar_x.config(command=self.tree.xview)
-        self.tree.config(yscrollcommand=self.scrollbar_y.set, xscrollcommand=self.scrollbar_x.set)
+        self.tree.config(xscrollcommand=self.scrollbar_x.set)
         
         # Portfolio Management Section
         # Create a frame for the Add Stock and Delete Entry buttons
@@ -207,6 +229,20 @@ class RiskTideGUI:
         
         self.help_button = tk.Button(self.button_frame, text="Help", font=("Arial", 12, "bold"), fg="white", bg="#4A90E2", command=self.show_help_modal)
         self.help_button.pack(side=tk.LEFT, padx=10)
+
+        # Diagnostics Button: timing breakdown of the last refresh
+        self.diagnostics_button = tk.Button(self.button_frame, text="Diagnostics", font=("Arial", 12, "bold"), fg="white", bg="#4A90E2", command=self.show_diagnostics_modal)
+        self.diagnostics_button.pack(side=tk.LEFT, padx=10)
+
+        # Portfolio selector: every named portfolio of the workspace, kept open once visited
+        self.workspace = risktide_workspace.Workspace()
+        self.portfolio_var = tk.StringVar(value=risktide_workspace.default_portfolio_name)
+        self.portfolio_selector = ttk.Combobox(self.button_frame, textvariable=self.portfolio_var, values=self.workspace.names(), state="readonly", font=("Arial", 12), width=24)
+        self.portfolio_selector.pack(side=tk.LEFT, padx=10)
+        self.portfolio_selector.bind("<<ComboboxSelected>>", lambda e: self.switch_portfolio(self.portfolio_var.get()))
+
+        self.new_portfolio_button = tk.Button(self.button_frame, text="New Portfolio", font=("Arial", 12, "bold"), fg="white", bg="#4A90E2", command=self.new_portfolio)
+        self.new_portfolio_button.pack(side=tk.LEFT, padx=10)
         
         # Import Button
         self.import_button = tk.Button(self.button_frame, text="Jstock Import", font=("Arial", 12, "bold"), fg="white", bg="#4A90E2", command=self.import_csv_threaded)
@@ -216,80 +252,102 @@ class RiskTideGUI:
         # Result Label (Positioned at the bottom of the window)
         self.result_label = tk.Label(self.root, text="(c) 2024 SIG Labs", font=("Arial", 14), fg="white", bg="#2D3E50", justify="left")
         self.result_label.pack(side=tk.BOTTOM, pady=5)
+
+        # Status Label for the background refresh pipeline
+        self.status_label = tk.Label(self.root, text="", font=("Arial", 11), fg="#D1E8FF", bg="#2D3E50")
+        self.status_label.pack(side=tk.BOTTOM, pady=2)
         
+        # Latest metrics summary; starts from the last saved summary, marked stale until the refresh finishes
+        self.metrics_df = None
+        self.metrics_stale = True
+        self.pipeline_running = False
+        self.pipeline_rerun = False
+
+        # Background threads hand widget updates to the Tk thread through this queue
+        self.ui_queue = queue.Queue()
+        self.poll_ui_queue()
+
+        # The active portfolio: its store, per-ticker metrics cache (so edits only recompute the tickers
+        # they touch) and last results
+        self.account = self.workspace.portfolio(risktide_workspace.default_portfolio_name)
+        self.store = self.account.store
+        self.graph_renderer = risktide_graphs.GraphRenderer()
+        self.load_cached_metrics()
+
         # Load portfolio
+        self.portfolio_model = risktide_store.PortfolioModel()  # Typed copy used for sorting
         self.load_portfolio()
 
     def import_csv_threaded(self):
         """Runs the import_csv method in a separate thread."""
-        threading.Thread(target=lambda: self.import_csv()).start()
+        self.import_button.config(state=tk.DISABLED)
+        threading.Thread(target=lambda: self.import_csv(), daemon=True).start()
 
- 
- 
+    def run_on_ui(self, func, *args):
+        """Schedule func(*args) on the Tk thread (safe to call from any thread)."""
+        self.ui_queue.put((func, args))
+
+    def poll_ui_queue(self):
+        """Run the widget updates queued by background threads"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                func(*args)
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_ui_queue)
     
     def import_csv(self):
-        """Import stock data from the JStock CSV file and populate the portfolio."""
-        import_file = "Buy Portfolio Management.csv"  # File name to import
+        """Import stock data from the JStock CSV file and merge it into the live portfolio."""
+        import_file = risktide_import.jstock_file  # File name to import
+        imported = 0
+        rejected_chunks = []
+        account = self.account  # Lots go to the portfolio that was active when the import started
         try:
-            # Read the CSV file
-            df = pd.read_csv(import_file)
-    
-            # Ensure required columns are present
-            required_columns = ["Code", "Date", "Units", "Purchase Price"]
-            if not all(col in df.columns for col in required_columns):
-                messagebox.showerror("Error", "Missing required columns in CSV.")
-                return
-    
-            # Extract and transform relevant data
-            imported_data = []
-            for _, row in df.iterrows():
-                try:
-                    stock_ticker = row["Code"]
-                    date_purchased = pd.to_datetime(row["Date"]).strftime("%d-%m-%Y")  # Convert to DD-MM-YYYY
-                    units_purchased = float(row["Units"])
-                    purchase_price = float(row["Purchase Price"])
-                    total_purchase_price = units_purchased * purchase_price
-    
-                    imported_data.append((stock_ticker, date_purchased, units_purchased, purchase_price, total_purchase_price))
-                except Exception as e:
-                    print(f"Error processing row: {row} -> {e}")
-                    continue
-    
-            # Populate the Treeview
-            for stock_data in imported_data:
-                self.tree.insert("", "end", values=stock_data)
-    
-            # Save to portfolio file
-            self.save_portfolio()
-            messagebox.showinfo("Success", f"Imported {len(imported_data)} stocks successfully!")
-    
-            # Notify user and restart the program
-            messagebox.showinfo("Restarting", "The program will now restart to apply changes.")
-            
-            # Restart the program in a new process
-            python = sys.executable
-            script = sys.argv[0]
-    
-            # Launch a new process to restart the program
-            subprocess.Popen([python, script])
-    
-            # Kill the old process
-            os.kill(os.getpid(), 9)  # Forcefully terminate the old process
-    
+            # Stream the export in chunks; each chunk is converted in one vectorized pass
+            for lots, rejected in risktide_import.read_jstock_csv(import_file):
+                rejected_chunks.append(rejected)
+                imported_data = list(lots.itertuples(index=False, name=None))
+
+                # Save each chunk to the portfolio store in one transaction, then show it
+                lot_ids = account.store.add_lots(imported_data)
+                self.run_on_ui(self.add_rows, list(zip(lot_ids, imported_data)), account)
+                imported += len(imported_data)
+                self.run_on_ui(self.status_label.config, {"text": f"Importing... {imported} lots"})
+
+            rejected_count = risktide_import.write_rejections(rejected_chunks)
+            self.run_on_ui(self.finish_import, imported, rejected_count)
+
         except FileNotFoundError:
-            messagebox.showerror(
+            self.run_on_ui(
+                messagebox.showerror,
                 "INFO",
                 f"File '{import_file}' not found. Use JStock first to export the data into a Buy Portfolio Management.csv file and place it in the same dir as RiskTide, after this you can press import"
             )
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to import CSV: {e}")
+            self.run_on_ui(messagebox.showerror, "Error", f"Failed to import CSV: {e}")
+        finally:
+            self.run_on_ui(self.import_button.config, {"state": tk.NORMAL})
+
+    def finish_import(self, imported, rejected_count):
+        """Report the import and recompute the metrics of the affected tickers"""
+        message = f"Imported {imported} stocks successfully!"
+        if rejected_count:
+            message += f"\n\n{rejected_count} rows could not be imported; see {risktide_import.rejections_file} for the reasons."
+        messagebox.showinfo("Success", message)
+        if imported:
+            self.start_refresh_pipeline()
  
 
     def generate_graphs(self):
-        """Generate and display various graphs for risk metrics."""
+        """Show the risk metric graphs; images are rendered in the background as they scroll into view."""
         try:
             # Load the metrics summary data
-            df = pd.read_csv('stock_metrics_summary.csv')
+            df = self.load_metrics()
+            digest = risktide_graphs.summary_hash(df)
+            # Every portfolio keeps its own images; those of its older summaries will never be shown again
+            cache_dir = self.account.path(risktide_graphs.graph_cache_dir)
+            risktide_graphs.prune_graph_cache(digest, cache_dir)
     
             # Create a popup window for the graphs
             graph_window = tk.Toplevel(self.root)
@@ -306,110 +364,80 @@ class RiskTideGUI:
             scrollbar = tk.Scrollbar(graph_window, orient=tk.VERTICAL, command=canvas.yview)
             scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
-            canvas.configure(yscrollcommand=scrollbar.set)
-    
             # Create a frame inside the Canvas
             scrollable_frame = tk.Frame(canvas)
             canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+
+            # One fixed-size placeholder per plot, so the layout is known before anything is rendered
+            slots = {}
+            for plot in risktide_graphs.plots:
+                width, height = risktide_graphs.image_size(plot)
+                slot = tk.Frame(scrollable_frame, width=width, height=height)
+                slot.pack_propagate(False)
+                slot.pack(pady=10)
+                label = tk.Label(slot, text="Rendering graph...", font=("Arial", 12))
+                label.pack(fill=tk.BOTH, expand=True)
+                slots[plot] = label
+            requested = set()
+
+            def show_image(plot, path, error):
+                """Put a rendered image (or the reason it is missing) into its placeholder (Tk thread)"""
+                if not graph_window.winfo_exists():
+                    return
+                label = slots[plot]
+                if error is not None:
+                    label.config(text=f"INFO: {error}" if isinstance(error, risktide_graphs.NotEnoughData) else f"Failed to render graph: {error}", wraplength=500)
+                    return
+                label.image = tk.PhotoImage(file=path)  # Keep a reference or Tk drops the image
+                label.config(image=label.image, text="")
+
+            def show_visible(*args):
+                """Load cached images and request renders for the placeholders in (or near) the viewport"""
+                if not graph_window.winfo_exists():
+                    return
+                top = canvas.canvasy(0)
+                bottom = top + canvas.winfo_height()
+                margin = canvas.winfo_height() // 2  # Start rendering slightly before a plot scrolls in
+                for plot, label in slots.items():
+                    if plot in requested:
+                        continue
+                    slot = label.master
+                    y = slot.winfo_y()
+                    if y + slot.winfo_height() < top - margin or y > bottom + margin:
+                        continue
+                    requested.add(plot)
+                    path = risktide_graphs.cached_path(digest, plot, cache_dir)
+                    if os.path.exists(path):
+                        show_image(plot, path, None)
+                    else:
+                        self.graph_renderer.submit(df, digest, plot, lambda p, path, error: self.run_on_ui(show_image, p, path, error), cache_dir)
+
+            def on_yscroll(first, last):
+                scrollbar.set(first, last)
+                show_visible()
+
+            canvas.configure(yscrollcommand=on_yscroll)
+            canvas.bind("<Configure>", show_visible)
+            graph_window.bind("<MouseWheel>", lambda e: canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
     
             # Update the scrollable region dynamically
             def update_scroll_region(event):
                 canvas.configure(scrollregion=canvas.bbox("all"))
+                show_visible()
     
             scrollable_frame.bind("<Configure>", update_scroll_region)
     
-            # Graph 1: Bar Chart (Sharpe Ratio)
-            plt.figure(figsize=(8, 4))
-            sns.barplot(x="Stock Ticker", y="Sharpe Ratio", data=df)
-            plt.title("Sharpe Ratio by Stock")
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-            canvas_plot.draw()
-            canvas_plot.get_tk_widget().pack(pady=10)
-    
-            # Graph 2: Pie Chart (Proportion of Max Drawdown)
-            plt.figure(figsize=(6, 6))
-            plt.pie(
-                df["Max Drawdown"].abs(),
-                labels=df["Stock Ticker"],
-                autopct='%1.1f%%',
-                startangle=140,
-                colors=sns.color_palette("pastel"),
-            )
-            plt.title("Proportion of Max Drawdown")
-            canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-            canvas_plot.draw()
-            canvas_plot.get_tk_widget().pack(pady=10)
-    
-            # Graph 3: Scatter Plot (Alpha vs. Beta)
-            plt.figure(figsize=(8, 5))
-            sns.scatterplot(x="Alpha", y="Beta", data=df, hue="Stock Ticker", s=100, palette="viridis")
-            plt.title("Alpha vs. Beta")
-            plt.tight_layout()
-            canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-            canvas_plot.draw()
-            canvas_plot.get_tk_widget().pack(pady=10)
-    
-            # Graph 4: Box Plot (Distribution of Sharpe Ratios)
-            plt.figure(figsize=(6, 4))
-            sns.boxplot(y="Sharpe Ratio", data=df, color=sns.color_palette("Set2")[0])
-            plt.title("Distribution of Sharpe Ratios")
-            plt.tight_layout()
-            canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-            canvas_plot.draw()
-            canvas_plot.get_tk_widget().pack(pady=10)
-    
-            # Graph 5: Line Chart (Sample Trend - Simulate Cumulative Returns)
-            cumulative_returns = (1 + df["Alpha"].fillna(0)).cumprod()
-            plt.figure(figsize=(8, 4))
-            plt.plot(df["Stock Ticker"], cumulative_returns, marker="o", linestyle="-", color="green")
-            plt.title("Cumulative Returns (Simulated using Alpha)")
-            plt.xlabel("Stock Ticker")
-            plt.ylabel("Cumulative Returns")
-            plt.tight_layout()
-            canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-            canvas_plot.draw()
-            canvas_plot.get_tk_widget().pack(pady=10)
-    
-            # Graph 6: Heatmap (Correlation Matrix)
-            plt.figure(figsize=(8, 6))
-    
-            # Check if there is enough data for correlation matrix
-            if df.shape[0] > 1:  # Ensure more than 1 row of data
-                # Drop rows with NaN values in the selected columns
-                df_clean = df.dropna(subset=["Alpha", "Beta", "Sharpe Ratio", "Sortino Ratio", "Omega Ratio"])
-                
-                if df_clean.shape[0] > 1:  # Check if enough rows remain
-                    correlation_matrix = df_clean[["Alpha", "Beta", "Sharpe Ratio", "Sortino Ratio", "Omega Ratio"]].corr()
-                    sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm", fmt=".2f", cbar=True)
-                    plt.title("Correlation Matrix of Metrics")
-                    plt.tight_layout()
-                    canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-                    canvas_plot.draw()
-                    canvas_plot.get_tk_widget().pack(pady=10)
-                else:
-                    messagebox.showwarning("INFO", "Not enough data for correlation matrix. Please add enough Portfolio data first or import and restart. Skipping...")
-            else:
-                messagebox.showwarning("INFO", "Not enough rows in the dataset for meaningful correlation. Please add enough Portfolio data first or import and restart. Skipping...")
-    
-            # Graph 7: Histogram (Frequency of Skewness)
-            plt.figure(figsize=(8, 4))
-            sns.histplot(df["Skewness"], kde=True, bins=10, color="purple")
-            plt.title("Distribution of Skewness")
-            plt.tight_layout()
-            canvas_plot = FigureCanvasTkAgg(plt.gcf(), master=scrollable_frame)
-            canvas_plot.draw()
-            canvas_plot.get_tk_widget().pack(pady=10)
-    
             def export_graphs():
                 file_path = tk.filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
                 if file_path:
-                    pdf_pages = PdfPages(file_path)
-                    for figure in plt.get_fignums():
-                        pdf_pages.savefig(figure)
-                    pdf_pages.close()
-                    messagebox.showinfo("Success", "Graphs exported successfully!")
+                    # One export at a time, drawn on the graph render thread (pyplot is not thread-safe)
+                    export_button.config(state=tk.DISABLED)
+                    future = self.graph_renderer.run(self.export_graphs_pdf, df, file_path)
+                    future.add_done_callback(lambda future: self.run_on_ui(export_done))
+
+            def export_done():
+                if export_button.winfo_exists():
+                    export_button.config(state=tk.NORMAL)
     
             export_button = tk.Button(scrollable_frame, text="Export Graphs", command=export_graphs, font=("Arial", 12), fg="white", bg="#4A90E2")
             export_button.pack(pady=10)
@@ -423,62 +451,169 @@ class RiskTideGUI:
         except Exception as e:
             messagebox.showerror("INFO", f"Please add enough Portfolio data first or import. Failed to generate graphs: {e}")
 
+    def export_graphs_pdf(self, df, file_path):
+        """Write the graphs and the metrics table to a PDF report (graph render thread), one page at a time."""
+        try:
+            risktide_report.write_report(df, file_path)
+            self.run_on_ui(messagebox.showinfo, "Success", "Graphs exported successfully!")
+        except Exception as e:
+            self.run_on_ui(messagebox.showerror, "Error", f"Failed to export graphs: {e}")
+
     def delete_entry(self):
         """Delete the selected entry from the portfolio."""
-        selected_item = self.tree.selection()
+        selected_item = self.portfolio_view.selection()
         if not selected_item:
             messagebox.showerror("Error", "No entry selected to delete.")
             return
 
-        for item in selected_item:
-            self.tree.delete(item)
+        # Rows of the portfolio view are keyed by the lot ids in the portfolio store
+        self.store.delete_lots(selected_item)
+        self.portfolio_view.delete(selected_item)
+        self.portfolio_model.delete(selected_item)
 
-        self.save_portfolio()
+        self.start_refresh_pipeline()
         messagebox.showinfo("Success", "Entry deleted successfully!")
 
-    def save_portfolio(self):
-        """Save the portfolio to a file using pickle"""
-        portfolio_data = []
-        for row in self.tree.get_children():
-            stock_data = self.tree.item(row)["values"]
-            portfolio_data.append(stock_data)
-        
-        with open("portfolio.pkl", "wb") as f:
-            pickle.dump(portfolio_data, f)
-    
-        # Save as CSV file
-        portfolio_df = pd.DataFrame(portfolio_data, columns=self.columns)  # Use all columns
-        portfolio_df.to_csv('portfolio_data.csv', index=False)
+    def get_portfolio_df(self):
+        """Return the portfolio as a DataFrame, read from the portfolio store"""
+        return self.store.to_frame()
 
-    def load_portfolio(self):
-        """Load the portfolio from a file"""                                         
+    def load_cached_metrics(self):
+        """Show the last saved summary right away; it stays marked stale until the refresh completes"""
+        self.metrics_df = self.account.summary
+        if self.metrics_df is not None:
+            self.status_label.config(text=f"{self.account.name}: showing cached metrics (stale) - refresh pending")
+        else:
+            self.status_label.config(text=f"{self.account.name}: no cached metrics yet - refresh pending")
+
+    def switch_portfolio(self, name):
+        """Show another portfolio; after its first visit its lots, sort order and metrics come from memory"""
+        if name == self.account.name:
+            return
+        self.account = self.workspace.portfolio(name)
+        self.store = self.account.store
+        self.metrics_df = self.account.summary
+        self.metrics_stale = self.pipeline_running or not self.account.is_current(self.workspace.version, risktide_prices.PriceStore.open_existing())
+        self.load_portfolio()
+        if self.metrics_df is None:
+            self.status_label.config(text=f"{name}: no metrics yet - refresh pending")
+        elif self.metrics_stale:
+            self.status_label.config(text=f"{name}: showing cached metrics (stale) - refresh pending")
+        else:
+            self.status_label.config(text=f"{name}: metrics up to date ({len(self.metrics_df)} tickers)")
+
+    def new_portfolio(self):
+        """Create an empty named portfolio and switch to it"""
+        name = simpledialog.askstring("New Portfolio", "Portfolio name:", parent=self.root)
+        if not name:
+            return
         try:
-            with open("portfolio.pkl", "rb") as f:
-                portfolio_data = pickle.load(f)
-                for stock_data in portfolio_data:
-                    self.tree.insert("", "end", values=stock_data)
-        except FileNotFoundError:
-            pass  # No portfolio file found, nothing to load
-
-    def sort_column(self, col, reverse):
-        data = [(self.tree.set(item, col), item) for item in self.tree.get_children("")]
-        
-        # Custom sorting for different column types
-        if col in ["Units Purchased", "Purchase Price", "Total Purchase Price"]:
-            # Sort numerically
-            data.sort(key=lambda x: float(x[0]), reverse=reverse)
-        elif col == "Date Purchased":
-            # Sort dates
-            data.sort(key=lambda x: pd.to_datetime(x[0], format="%d-%m-%Y"), reverse=reverse)
+            self.workspace.create(name.strip())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.portfolio_selector.config(values=self.workspace.names())
+        self.portfolio_var.set(name.strip())
+        self.switch_portfolio(name.strip())
+
+    def start_refresh_pipeline(self):
+        """Refresh the benchmark and recompute the metrics in the background"""
+        self.metrics_stale = True
+        if self.pipeline_running:
+            # Run again once the current pass finishes so the latest edits are included
+            self.pipeline_rerun = True
+            return
+        self.pipeline_running = True
+
+        def worker():
+            try:
+                # The worker reads the stores, never the widgets; portfolio_data.csv (the default portfolio,
+                # for RiskTide Metrics.py) is only rewritten if its lots changed
+                self.workspace.portfolio(risktide_workspace.default_portfolio_name).store.export_csv()
+                outcome = refresh_workspace(self.workspace, progress=lambda stage: self.run_on_ui(self.show_pipeline_stage, stage))
+                self.run_on_ui(self.finish_refresh_pipeline, outcome, None)
+            except Exception as e:
+                self.run_on_ui(self.finish_refresh_pipeline, None, e)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_pipeline_stage(self, stage):
+        """Show the current pipeline stage in the main window"""
+        prefix = "Cached metrics (stale) - " if self.metrics_stale and self.metrics_df is not None else ""
+        self.status_label.config(text=f"{prefix}{stage}")
+
+    def finish_refresh_pipeline(self, outcome, error):
+        """Swap in the new metrics of the active portfolio (Tk thread) and start the queued rerun, if any"""
+        self.pipeline_running = False
+        failed = {name: e for name, e in (outcome or {}).items() if e is not None}
+        error = error or failed.get(self.account.name)
+        if error is not None:
+            self.status_label.config(text=f"{self.account.name}: metrics refresh failed: {error}")
+        elif self.account.summary is None:
+            self.status_label.config(text=f"{self.account.name}: refresh pending")
         else:
-            # Sort alphabetically
-            data.sort(key=lambda x: x[0].lower(), reverse=reverse)
-        
-        for index, (val, item) in enumerate(data):
-            self.tree.move(item, "", index)
-        
-        # Reverse sort next time
-        self.tree.heading(col, command=lambda: self.sort_column(col, not reverse))
+            # Swap the whole summary at once so views never see a half-updated result
+            self.metrics_df = self.account.summary
+            self.metrics_stale = False
+            others = f" - {len(failed)} other portfolios failed" if failed else ""
+            self.status_label.config(text=f"{self.account.name}: metrics up to date ({len(self.metrics_df)} tickers){others}")
+
+        if self.pipeline_rerun:
+            self.pipeline_rerun = False
+            self.start_refresh_pipeline()
+
+    def load_metrics(self):
+        """Return the latest metrics summary, falling back to the saved CSV"""
+        if self.metrics_df is not None:
+            return self.metrics_df
+        return pd.read_csv(self.account.path(risktide_metrics.summary_file))
+
+    def load_portfolio(self):
+        """Load the portfolio from the portfolio store"""
+        lots, self.portfolio_model = self.account.view_state()
+        with risktide_trace.span('treeview_populate', rows=len(lots), view='portfolio'):
+            self.portfolio_view.set_rows(lots)
+            self.apply_sort()
+
+    def add_rows(self, rows, account=None):
+        """Show new lots (Tk thread), keeping the current sort order"""
+        if account is not None and account is not self.account:
+            return  # Added to a portfolio that is not shown; it reloads its lots when shown again
+        with risktide_trace.span('treeview_populate', rows=len(rows), view='portfolio'):
+            self.portfolio_view.extend(rows)
+            self.portfolio_model.append(rows)
+            self.apply_sort()
+
+    def sort_column(self, col):
+        """Sort by a column (click again to reverse); Shift+click adds or flips a secondary column."""
+        order = list(self.sort_order)
+        columns = [c for c, _ in order]
+        if self.sort_shift and order:
+            if col in columns:
+                i = columns.index(col)
+                order[i] = (col, not order[i][1])
+            else:
+                order.append((col, False))
+        elif columns[:1] == [col]:
+            order = [(col, not order[0][1])]
+        else:
+            order = [(col, False)]
+        self.sort_order = order
+        self.apply_sort()
+
+    def apply_sort(self):
+        """Reorder the view from the typed model; only the visible rows are redrawn"""
+        if self.sort_order:
+            self.portfolio_view.reorder(self.portfolio_model.sorted_ids(self.sort_order).tolist())
+
+        # Show the sort direction (and priority when sorting by several columns) in the headings
+        for col in self.columns:
+            self.tree.heading(col, text=col)
+        for priority, (col, reverse) in enumerate(self.sort_order, start=1):
+            marker = "▼" if reverse else "▲"
+            if len(self.sort_order) > 1:
+                marker += str(priority)
+            self.tree.heading(col, text=f"{col} {marker}")
 
     def add_stock_modal(self):
         """Open a modal dialog for adding a stock."""
@@ -518,8 +653,9 @@ class RiskTideGUI:
             try:
                 total_purchase_price = float(units_purchased) * float(purchase_price)
                 stock_data = (stock_ticker, date_purchased, units_purchased, purchase_price, total_purchase_price)
-                self.tree.insert("", "end", values=stock_data)
-                self.save_portfolio()
+                lot_id = self.store.add_lots([stock_data])[0]
+                self.add_rows([(lot_id, stock_data)])
+                self.start_refresh_pipeline()
                 modal.destroy()  # Close the modal dialog
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to add stock: {e}")
@@ -535,8 +671,10 @@ class RiskTideGUI:
     def calculate_risk_metrics(self):
         """Load and display risk metrics from CSV in a tidy modal."""
         try:
-            # Load the stock metrics summary from the CSV file
-            stock_metrics_df = pd.read_csv('stock_metrics_summary.csv')
+            # Load the stock metrics summary
+            stock_metrics_df = self.load_metrics()
+            if stock_metrics_df.empty:
+                raise pd.errors.EmptyDataError("No metrics computed")
     
             # Create a new modal window to display the data
             metrics_modal = tk.Toplevel(self.root)
@@ -551,36 +689,39 @@ class RiskTideGUI:
             title_frame.pack(fill="x", pady=10)
             
             # Title label
-            title_label = tk.Label(title_frame, text="Risk Metrics Summary", font=("Arial", 18, "bold"), fg="white", bg="#2D3E50")
+            title_text = f"Risk Metrics Summary - {self.account.name}" + (" (cached - may be out of date)" if self.metrics_stale else "")
+            title_label = tk.Label(title_frame, text=title_text, font=("Arial", 18, "bold"), fg="white", bg="#2D3E50")
             title_label.pack(padx=20, pady=10)
     
             # Create a frame for the data
             data_frame = tk.Frame(metrics_modal, bg="#2D3E50")
             data_frame.pack(fill="both", expand=True, padx=20, pady=20)
     
-            # Create a treeview to display the data with customized columns
+            # Add scrollbars for the treeview
+            scrollbar_y = tk.Scrollbar(data_frame, orient="vertical")
+            scrollbar_y.pack(side="right", fill="y")
+
+            scrollbar_x = tk.Scrollbar(data_frame, orient="horizontal")
+            scrollbar_x.pack(side="bottom", fill="x")
+
+            # Create a virtual treeview to display the data with customized columns
             columns = stock_metrics_df.columns.tolist()
-            tree = ttk.Treeview(data_frame, columns=columns, show="headings", height=12)
+            metrics_view = VirtualTreeview(data_frame, columns=columns, height=12, yscrollbar=scrollbar_y)
+            tree = metrics_view.tree
     
             # Set column headings and style
             for col in columns:
                 tree.heading(col, text=col, anchor="center")
                 tree.column(col, anchor="center", width=150)  # Set the column width
     
-            # Insert the data into the treeview
-            for _, row in stock_metrics_df.iterrows():
-                tree.insert("", "end", values=row.tolist())
-    
-            # Add scrollbars for the treeview
-            scrollbar_y = tk.Scrollbar(data_frame, orient="vertical", command=tree.yview)
-            scrollbar_y.pack(side="right", fill="y")
-            tree.config(yscrollcommand=scrollbar_y.set)
-    
-            scrollbar_x = tk.Scrollbar(data_frame, orient="horizontal", command=tree.xview)
-            scrollbar_x.pack(side="bottom", fill="x")
+            # Hand the rows to the view's backing model; only the visible ones become Treeview items
+            with risktide_trace.span('treeview_populate', rows=len(stock_metrics_df), view='metrics'):
+                metrics_view.set_rows(enumerate(stock_metrics_df.itertuples(index=False, name=None)))
+
+            scrollbar_x.config(command=tree.xview)
             tree.config(xscrollcommand=scrollbar_x.set)
     
-            tree.pack(fill="both", expand=True)
+            metrics_view.pack(fill="both", expand=True)
     
             # Add a frame for buttons
             button_frame = tk.Frame(metrics_modal, bg="#2D3E50")
@@ -628,6 +769,51 @@ class RiskTideGUI:
         link_label.pack(pady=10)
         link_label.bind("<Button-1>", lambda e: webbrowser.open("https://peterdeceuster.uk/index2.html"))
 
+    def show_diagnostics_modal(self):
+        """Show where the last refresh spent its time, one row per stage."""
+        stages = risktide_trace.breakdown(risktide_trace.last_run())
+
+        diagnostics_modal = tk.Toplevel(self.root)
+        diagnostics_modal.title("Diagnostics")
+        diagnostics_modal.geometry("900x500")
+        diagnostics_modal.iconbitmap('logo.ico')
+
+        title_text = "Last run - time per stage" if stages else "No run recorded yet"
+        tk.Label(diagnostics_modal, text=title_text, font=("Arial", 16, "bold")).pack(pady=10)
+
+        data_frame = tk.Frame(diagnostics_modal)
+        data_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        scrollbar_y = tk.Scrollbar(data_frame, orient="vertical")
+        scrollbar_y.pack(side="right", fill="y")
+
+        columns = ("Stage", "Calls", "Wall (ms)", "CPU (ms)", "Rows", "Peak (MB)", "Errors")
+        tree = ttk.Treeview(data_frame, columns=columns, show="headings", yscrollcommand=scrollbar_y.set)
+        for col in columns:
+            tree.heading(col, text=col, anchor="center")
+            tree.column(col, anchor="w" if col == "Stage" else "e", width=220 if col == "Stage" else 100)
+        scrollbar_y.config(command=tree.yview)
+
+        for stage in stages:
+            tree.insert("", tk.END, values=(
+                "    " * stage['depth'] + stage['span'],
+                stage['calls'],
+                f"{stage['wall'] * 1000:,.1f}",
+                f"{stage['cpu'] * 1000:,.1f}",
+                "" if stage['rows'] is None else f"{stage['rows']:,}",
+                "off" if stage['peak_mb'] is None else f"{stage['peak_mb']:,.1f}",
+                stage['errors'] or "",
+            ))
+        tree.pack(fill="both", expand=True)
+
+        note = f"Every span is also logged to {risktide_trace.trace_file}. Set RISKTIDE_TRACE_MEMORY=1 to record peak allocations."
+        tk.Label(diagnostics_modal, text=note, font=("Arial", 10)).pack(pady=5)
+
+        button_frame = tk.Frame(diagnostics_modal)
+        button_frame.pack(fill="x", pady=10)
+        tk.Button(button_frame, text="Refresh", font=("Arial", 12, "bold"), fg="white", bg="#4A90E2",
+                  command=lambda: (diagnostics_modal.destroy(), self.show_diagnostics_modal())).pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Close", font=("Arial", 12, "bold"), fg="white", bg="#E94E77", command=diagnostics_modal.destroy).pack(side=tk.RIGHT, padx=10)
+
     def show_help_modal(self):
             """Display the Help modal with detailed guidance."""
             help_modal = tk.Toplevel(self.root)
@@ -826,14 +1012,19 @@ class RiskTideGUI:
             close_button = tk.Button(help_modal, text="Close", command=help_modal.destroy)
             close_button.pack(pady=10)
 
-# Create the main application window
-root = tk.Tk()
+def main():
+    # Create the main application window
+    root = tk.Tk()
+
+    # Instantiate the RiskTideGUI class
+    app = RiskTideGUI(root)
+
+    # Refresh benchmark and metrics in the background, then start the Tkinter event loop
+    app.start_refresh_pipeline()
+    threading.Thread(target=play_startup_sound).start()
 
-# Instantiate the RiskTideGUI class
-app = RiskTideGUI(root)
+    root.mainloop()
 
-# Start the Tkinter event loop
-run_external_scripts()
-threading.Thread(target=play_startup_sound).start()
 
-root.mainloop()
+if __name__ == '__main__':
+    main()
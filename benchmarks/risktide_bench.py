@@ -0,0 +1,358 @@
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import warnings
+import argparse
+import contextlib
+import platform
+import tempfile
+import statistics
+import tracemalloc
+
+# Offline performance benchmarks of the RiskTide code paths, on seeded synthetic data.
+#
+#   python benchmarks/risktide_bench.py --tickers 250 --lots-per-ticker 40 --output bench.json
+#   python benchmarks/risktide_bench.py --save-baseline benchmarks/baseline.json
+#   python benchmarks/risktide_bench.py --baseline benchmarks/baseline.json   # exit 1 on a regression
+#
+# Every scenario is timed --repeat times (best and median wall time, throughput from the best run),
+# then run once more under tracemalloc for its peak Python/NumPy allocation. Scenarios that need Tk
+# are skipped without a display; run them headless with `xvfb-run python benchmarks/risktide_bench.py`.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import risktide_synthetic  # noqa: E402
+import risktide_trace  # noqa: E402
+from risktide_files import atomic_write  # noqa: E402
+
+# Results file layout; bump when it changes so old baselines are not compared
+results_format = 1
+
+# Default allowed slowdown (and memory growth) against the baseline
+default_tolerance = 0.25
+
+# Differences below these are noise, whatever the tolerance
+time_slack_seconds = 0.05
+memory_slack_mb = 2.0
+
+# Exit codes
+exit_ok = 0
+exit_regression = 1
+exit_usage = 2
+
+
+class SkipScenario(Exception):
+    """A scenario cannot run here (e.g. no display for Tk)."""
+
+
+class Dataset:
+    """Synthetic input files plus the frames the scenarios start from, built once per run."""
+
+    def __init__(self, directory, tickers, lots_per_ticker, days, seed):
+        import pandas as pd
+        import risktide_metrics
+
+        self.directory = directory
+        self.params = {'tickers': tickers, 'lots_per_ticker': lots_per_ticker, 'days': days, 'seed': seed}
+        self.paths = risktide_synthetic.write_dataset(directory, tickers, lots_per_ticker, days, seed)
+        self.portfolio_df = pd.read_csv(self.paths['portfolio'])
+        self.lots = list(self.portfolio_df.itertuples(index=False, name=None))
+        self.spy = risktide_metrics.load_spy_data(self.paths['spy'])
+        self.summary_df = None
+
+    def metrics_summary(self):
+        import risktide_metrics
+
+        if self.summary_df is None:
+            self.summary_df = risktide_metrics.compute_metrics(self.portfolio_df, self.spy)
+        return self.summary_df
+
+    def fresh_path(self, name):
+        """A path in the dataset directory that does not exist yet."""
+        path = os.path.join(self.directory, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return path
+
+
+# Scenarios: each does its setup and returns (timed callable, items processed per call)
+
+def bench_process_stock(data):
+    """Per-ticker metrics (process_stock on a thread pool), the original 'RiskTide Metrics' path."""
+    import risktide_metrics
+
+    return (lambda: risktide_metrics.compute_metrics(data.portfolio_df, data.spy, engine='threads')), len(data.lots)
+
+
+def bench_metrics_vectorized(data):
+    """All tickers in one grouped pass, the default engine."""
+    import risktide_metrics
+
+    return (lambda: risktide_metrics.compute_metrics(data.portfolio_df, data.spy)), len(data.lots)
+
+
+def bench_save_portfolio(data):
+    """Write every lot to a new portfolio store and export portfolio_data.csv."""
+    from risktide_store import PortfolioStore
+
+    def run():
+        store = PortfolioStore(data.fresh_path('save.db'))
+        try:
+            store.add_lots(data.lots)
+            store.export_csv(data.fresh_path('save_export.csv'))
+        finally:
+            store.close()
+    return run, len(data.lots)
+
+
+def bench_load_portfolio(data):
+    """Read every lot back from the store and build the typed model behind the portfolio view."""
+    from risktide_store import PortfolioStore, PortfolioModel
+
+    store = PortfolioStore(data.fresh_path('load.db'))
+    store.add_lots(data.lots)
+    store.close()
+
+    def run():
+        store = PortfolioStore(os.path.join(data.directory, 'load.db'))
+        try:
+            PortfolioModel.from_lots(store.all_lots())
+        finally:
+            store.close()
+    return run, len(data.lots)
+
+
+def bench_import_csv(data):
+    """Stream the JStock export into a new store chunk by chunk, as the Jstock Import button does."""
+    import risktide_import
+    from risktide_store import PortfolioStore
+
+    def run():
+        store = PortfolioStore(data.fresh_path('import.db'))
+        rejected_chunks = []
+        try:
+            for lots, rejected in risktide_import.read_jstock_csv(data.paths['jstock']):
+                rejected_chunks.append(rejected)
+                store.add_lots(lots.itertuples(index=False, name=None))
+            risktide_import.write_rejections(rejected_chunks, data.fresh_path('import_rejections.csv'))
+        finally:
+            store.close()
+    return run, len(data.lots)
+
+
+def bench_sort_column(data):
+    """Cold sort permutations of the portfolio model: by ticker, then by date and ticker."""
+    from risktide_store import PortfolioModel
+
+    model = PortfolioModel.from_lots(list(enumerate(data.lots)))
+
+    def run():
+        model.invalidate()
+        model.sorted_ids([('Stock Ticker', False)])
+        model.sorted_ids([('Date Purchased', True), ('Stock Ticker', False)])
+    return run, 2 * len(data.lots)
+
+
+def bench_generate_graphs(data):
+    """Render every graph of the metrics summary to PNG, with an empty image cache."""
+    import risktide_graphs
+
+    df = data.metrics_summary()
+
+    def run():
+        cache_dir = data.fresh_path('graph_cache')
+        for plot in risktide_graphs.plots:
+            try:
+                risktide_graphs.render_graph(df, plot, cache_dir=cache_dir)
+            except risktide_graphs.NotEnoughData:
+                pass
+    return run, len(risktide_graphs.plots)
+
+
+def bench_portfolio_view(data):
+    """Fill the virtual portfolio Treeview with every lot and reorder it (needs Tk)."""
+    import tkinter as tk
+    from risktide_store import PortfolioModel, portfolio_columns
+    from risktide_views import VirtualTreeview
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SkipScenario(f"no display for Tk ({e})")
+    root.withdraw()
+    view = VirtualTreeview(root, columns=portfolio_columns, height=30)
+    view.pack()
+    rows = list(enumerate(data.lots))
+    order = PortfolioModel.from_lots(rows).sorted_ids([('Stock Ticker', True)]).tolist()
+
+    def run():
+        view.set_rows(rows)
+        view.reorder(order)
+        root.update_idletasks()
+    return run, len(rows)
+
+
+# Scenario name -> setup function, in run order
+scenarios = {
+    'process_stock': bench_process_stock,
+    'metrics_vectorized': bench_metrics_vectorized,
+    'save_portfolio': bench_save_portfolio,
+    'load_portfolio': bench_load_portfolio,
+    'import_csv': bench_import_csv,
+    'sort_column': bench_sort_column,
+    'generate_graphs': bench_generate_graphs,
+    'portfolio_view': bench_portfolio_view,
+}
+
+
+def measure(run, items, repeat):
+    """Time run repeat times, then once under tracemalloc for the peak allocation."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'seconds': best,
+        'median_seconds': statistics.median(times),
+        'items': items,
+        'items_per_second': items / best if best > 0 else None,
+        'peak_mb': peak / 2**20,
+    }
+
+
+def run_benchmarks(data, names, repeat=3):
+    """Run the named scenarios; returns the results document."""
+    results = {}
+    for name in names:
+        try:
+            run, items = scenarios[name](data)
+            results[name] = measure(run, items, repeat)
+            print(f"{name:20s} {results[name]['seconds']:8.3f} s  {results[name]['items_per_second'] or 0:12.0f} items/s  {results[name]['peak_mb']:8.1f} MB", file=sys.stderr)
+        except SkipScenario as e:
+            results[name] = {'skipped': str(e)}
+            print(f"{name:20s} skipped: {e}", file=sys.stderr)
+
+    import numpy as np
+    import pandas as pd
+    return {
+        'format': results_format,
+        'params': data.params,
+        'repeat': repeat,
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__, 'platform': platform.platform()},
+        'results': results,
+    }
+
+
+def compare(document, baseline, tolerance=default_tolerance):
+    """
+    Scenarios slower (or using more memory) than the baseline by more than tolerance.
+
+    :return: List of human-readable regressions, empty when none.
+    :raises ValueError: when the baseline was recorded with other dataset sizes or another format.
+    """
+    if baseline.get('format') != results_format:
+        raise ValueError(f"Baseline has format {baseline.get('format')}, expected {results_format}")
+    if baseline.get('params') != document['params']:
+        raise ValueError(f"Baseline was recorded with {baseline.get('params')}, this run used {document['params']}")
+
+    regressions = []
+    for name, current in document['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or 'skipped' in previous or 'skipped' in current:
+            continue
+        if current['seconds'] > previous['seconds'] * (1 + tolerance) + time_slack_seconds:
+            regressions.append(f"{name}: {current['seconds']:.3f} s vs {previous['seconds']:.3f} s baseline")
+        if current['peak_mb'] > previous['peak_mb'] * (1 + tolerance) + memory_slack_mb:
+            regressions.append(f"{name}: peak {current['peak_mb']:.1f} MB vs {previous['peak_mb']:.1f} MB baseline")
+    return regressions
+
+
+def write_json(document, path):
+    if path == '-':
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    with atomic_write(path) as f:
+        json.dump(document, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark RiskTide on seeded synthetic data")
+    parser.add_argument('--tickers', type=int, default=risktide_synthetic.default_tickers)
+    parser.add_argument('--lots-per-ticker', type=int, default=risktide_synthetic.default_lots_per_ticker)
+    parser.add_argument('--days', type=int, default=risktide_synthetic.default_days, help="Trading days of benchmark history")
+    parser.add_argument('--seed', type=int, default=risktide_synthetic.default_seed)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per scenario (default: %(default)s)")
+    parser.add_argument('--scenario', action='append', choices=list(scenarios), help="Only this scenario (repeatable)")
+    parser.add_argument('--output', '-o', default='-', help="Results JSON, '-' for stdout (default: %(default)s)")
+    parser.add_argument('--baseline', help="Fail when a scenario regresses against this results file")
+    parser.add_argument('--tolerance', type=float, default=default_tolerance, help="Allowed slowdown, 0.25 = 25%% (default: %(default)s)")
+    parser.add_argument('--save-baseline', help="Also write the results to this baseline file")
+    parser.add_argument('--data-dir', help="Keep the synthetic files here instead of a temporary directory")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read baseline {args.baseline}: {e}", file=sys.stderr)
+            return exit_usage
+
+    directory = args.data_dir or tempfile.mkdtemp(prefix='risktide_bench_')
+    # Stage spans stay on, as in production, but log next to the synthetic data
+    risktide_trace.enable(path=os.path.join(directory, risktide_trace.trace_file))
+    try:
+        # The code under test prints progress; keep stdout for the results JSON
+        with contextlib.redirect_stdout(sys.stderr), warnings.catch_warnings():
+            # Bar charts of hundreds of tickers cannot fit tight_layout; that is expected here
+            warnings.filterwarnings('ignore', message='Tight layout not applied')
+            data = Dataset(directory, args.tickers, args.lots_per_ticker, args.days, args.seed)
+            document = run_benchmarks(data, args.scenario or list(scenarios), repeat=args.repeat)
+    finally:
+        risktide_trace.set_log_path(None)  # Close the log before its directory goes
+        if not args.data_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    write_json(document, args.output)
+    if args.save_baseline:
+        write_json(document, args.save_baseline)
+
+    if baseline is not None:
+        try:
+            regressions = compare(document, baseline, args.tolerance)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return exit_usage
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return exit_regression
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+    return exit_ok
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# Seeded synthetic inputs for the benchmarks: spy_data.csv, portfolio_data.csv and a JStock
+# "Buy Portfolio Management.csv" export, in the layouts RiskTide reads. The same sizes and seed
+# always give the same files.
+#
+#   python benchmarks/risktide_synthetic.py --tickers 500 --lots-per-ticker 40 --days 2520 --out bench_data
+
+# Default dataset size (10,000 lots over ten years of trading days)
+default_tickers = 250
+default_lots_per_ticker = 40
+default_days = 2520
+default_seed = 0
+
+# File names, as RiskTide expects them
+spy_file = 'spy_data.csv'
+portfolio_file = 'portfolio_data.csv'
+jstock_file = 'Buy Portfolio Management.csv'
+
+# Share of JStock rows with an unparseable price, to exercise the rejection report
+bad_row_fraction = 0.001
+
+
+def trading_days(days, start='2010-01-04'):
+    return pd.bdate_range(start, periods=days)
+
+
+def synthetic_spy(days=default_days, seed=default_seed):
+    """Benchmark prices: a geometric random walk with a small drift, one row per trading day."""
+    rng = np.random.default_rng([seed, 0])
+    log_close = np.log(100.0) + np.cumsum(rng.normal(0.0003, 0.011, days))
+    close = np.exp(log_close)
+    return pd.DataFrame({
+        'Date': trading_days(days).strftime('%Y-%m-%d'),
+        'Open': close,
+        'High': close,
+        'Low': close,
+        'Close': close,
+        'Volume': rng.integers(50_000_000, 150_000_000, days),
+    })
+
+
+def synthetic_lots(spy_df, tickers=default_tickers, lots_per_ticker=default_lots_per_ticker, seed=default_seed):
+    """
+    Purchase lots whose prices follow the benchmark through a random beta plus idiosyncratic noise.
+
+    :return: DataFrame with the portfolio columns (dates as datetimes), grouped by ticker in date order.
+    """
+    rng = np.random.default_rng([seed, 1])
+    days = len(spy_df)
+    log_spy = np.log(spy_df['Close'].to_numpy())
+
+    day_index = np.sort(rng.integers(0, days, (tickers, lots_per_ticker)), axis=1)
+    beta = rng.uniform(0.3, 1.8, (tickers, 1))
+    volatility = rng.uniform(0.005, 0.03, (tickers, 1))
+    start_price = rng.uniform(5, 500, (tickers, 1))
+
+    # Idiosyncratic random walk sampled at the lot dates: variance grows with the gap between lots
+    gaps = np.diff(day_index, axis=1, prepend=day_index[:, :1])
+    noise = np.cumsum(volatility * np.sqrt(gaps) * rng.standard_normal(day_index.shape), axis=1)
+    log_price = np.log(start_price) + beta * (log_spy[day_index] - log_spy[day_index[:, :1]]) + noise
+    price = np.round(np.exp(log_price), 2).ravel()
+    units = rng.integers(1, 200, price.shape)
+
+    names = np.array([f'T{i:05d}' for i in range(tickers)], dtype=object)
+    return pd.DataFrame({
+        'Stock Ticker': np.repeat(names, lots_per_ticker),
+        'Date Purchased': pd.to_datetime(spy_df['Date'].to_numpy()[day_index.ravel()]),
+        'Units Purchased': units,
+        'Purchase Price': price,
+        'Total Purchase Price': np.round(units * price, 2),
+    })
+
+
+def portfolio_csv_frame(lots):
+    """Lots in the portfolio_data.csv layout (DD-MM-YYYY dates)."""
+    return lots.assign(**{'Date Purchased': lots['Date Purchased'].dt.strftime('%d-%m-%Y')})
+
+
+def jstock_frame(lots, seed=default_seed):
+    """Lots as a JStock Buy Portfolio Management export, including a few rows RiskTide rejects."""
+    rng = np.random.default_rng([seed, 2])
+    price = lots['Purchase Price'].map('{:.2f}'.format)
+    bad = rng.random(len(lots)) < bad_row_fraction
+    price[bad] = 'n/a'
+    return pd.DataFrame({
+        'Code': lots['Stock Ticker'],
+        'Symbol': lots['Stock Ticker'] + ' Corp',
+        'Date': lots['Date Purchased'].dt.strftime('%b %d, %Y'),
+        'Units': lots['Units Purchased'].astype(float),
+        'Purchase Price': price,
+        'Current Price': lots['Purchase Price'],
+        'Purchase Value': lots['Total Purchase Price'],
+        'Broker': 0.0,
+        'Comment': '',
+    })
+
+
+def write_dataset(directory, tickers=default_tickers, lots_per_ticker=default_lots_per_ticker, days=default_days, seed=default_seed):
+    """
+    Write the three input files into directory.
+
+    :return: dict with the paths under 'spy', 'portfolio' and 'jstock'.
+    """
+    os.makedirs(directory, exist_ok=True)
+    spy_df = synthetic_spy(days, seed)
+    lots = synthetic_lots(spy_df, tickers, lots_per_ticker, seed)
+    paths = {
+        'spy': os.path.join(directory, spy_file),
+        'portfolio': os.path.join(directory, portfolio_file),
+        'jstock': os.path.join(directory, jstock_file),
+    }
+    spy_df.to_csv(paths['spy'], index=False)
+    portfolio_csv_frame(lots).to_csv(paths['portfolio'], index=False)
+    jstock_frame(lots, seed).to_csv(paths['jstock'], index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write seeded synthetic RiskTide input files")
+    parser.add_argument('--out', default='bench_data', help="Directory to write to (default: %(default)s)")
+    parser.add_argument('--tickers', type=int, default=default_tickers)
+    parser.add_argument('--lots-per-ticker', type=int, default=default_lots_per_ticker)
+    parser.add_argument('--days', type=int, default=default_days, help="Trading days of benchmark history")
+    parser.add_argument('--seed', type=int, default=default_seed)
+    args = parser.parse_args(argv)
+
+    paths = write_dataset(args.out, args.tickers, args.lots_per_ticker, args.days, args.seed)
+    for path in paths.values():
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
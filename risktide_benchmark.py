@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from risktide_files import atomic_write
+
+# The cache of a benchmark CSV is a directory next to it holding one subdirectory per build, with
+# the arrays as .npy files, and meta.json naming the current build. A rebuild writes a new
+# subdirectory and then switches meta.json to it atomically, so open memory maps are never written
+# over (on Windows a mapped file cannot be replaced at all) and a reader opening the cache sees one
+# whole build, old or new, never a mix. Builds other than the current and the previous one are
+# deleted afterwards; one still mapped somewhere (Windows refuses to delete it) is retried at the
+# next rebuild.
+
+# Bump when the cache layout changes so old caches are rebuilt
+cache_version = 2
+
+cache_arrays = ('dates', 'close', 'returns')
+
+
+class Benchmark:
+    """Benchmark series opened from the binary cache: sorted dates, close prices and daily returns."""
+
+    def __init__(self, dates, close, returns, paths=None, key=None):
+        self.dates = dates  # datetime64[ns], ascending
+        self.close = close
+        self.returns = returns
+        self.paths = paths or {}  # array name -> .npy file, when backed by the cache
+        self.key = key or {}  # fingerprint of the source CSV
+
+    def __len__(self):
+        return len(self.dates)
+
+    def to_frame(self):
+        """Return the benchmark as the 'Date' / 'Close' / 'SPY Return' frame the metrics engine used to read."""
+        return pd.DataFrame({
+            'Date': pd.to_datetime(np.asarray(self.dates)),
+            'Close': np.asarray(self.close),
+            'SPY Return': np.asarray(self.returns)
+        })
+
+
+def cache_dir_for(csv_path):
+    """Directory holding the binary cache of a benchmark CSV (next to the CSV)."""
+    return os.path.splitext(csv_path)[0] + '_cache'
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def csv_stat(csv_path):
+    """Size and modification time of the CSV, the cheap part of the cache key."""
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def array_paths(cache_dir, build):
+    """The .npy file of every cached array of a build."""
+    return {name: os.path.join(cache_dir, build, f'{name}.npy') for name in cache_arrays}
+
+
+def read_cache_meta(cache_dir):
+    """Return the cache metadata, or None when there is no complete cache."""
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get('version') != cache_version:
+        return None
+    if not all(os.path.exists(path) for path in array_paths(cache_dir, meta['build']).values()):
+        return None
+    return meta
+
+
+def write_cache_meta(cache_dir, meta):
+    """Atomically replace meta.json; the cache only counts as valid once this is written."""
+    with atomic_write(os.path.join(cache_dir, 'meta.json')) as f:
+        json.dump(meta, f)
+
+
+def build_benchmark_cache(csv_path):
+    """
+    Parse the benchmark CSV once and store it as memory-mappable .npy arrays.
+
+    Returns are computed in file order exactly like the metrics engine always did
+    (Close.pct_change()), then all columns are sorted by date.
+
+    :return: The cache metadata.
+    """
+    cache_dir = cache_dir_for(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Read the key before parsing so a file replaced mid-build is detected next time
+    key = csv_stat(csv_path)
+    key['sha256'] = file_hash(csv_path)
+
+    spy_data = pd.read_csv(csv_path)
+    dates = pd.to_datetime(spy_data['Date']).to_numpy(dtype='datetime64[ns]')
+    close = spy_data['Close'].to_numpy(dtype=float)
+    returns = spy_data['Close'].pct_change().to_numpy(dtype=float)
+
+    order = np.argsort(dates, kind='stable')
+    arrays = {
+        'dates': dates[order].view('int64'),
+        'close': close[order],
+        'returns': returns[order]
+    }
+
+    # Write a new build next to the current one, then switch meta.json over to it
+    previous = read_cache_meta(cache_dir)
+    build = f'{time.time_ns():020d}-{os.getpid()}'
+    os.makedirs(os.path.join(cache_dir, build))
+    for name, path in array_paths(cache_dir, build).items():
+        np.save(path, arrays[name])
+
+    meta = dict(key, version=cache_version, rows=len(dates), build=build)
+    write_cache_meta(cache_dir, meta)
+    prune_builds(cache_dir, keep=(build, previous['build'] if previous else None))
+    print(f"Benchmark cache built for {csv_path} ({len(dates)} rows)")
+    return meta
+
+
+def prune_builds(cache_dir, keep):
+    """
+    Delete the builds (and files of older cache layouts) other than keep.
+
+    A reader that read the previous meta.json may still be about to open the previous build, so
+    the caller keeps it. Build names start with their start time, and only builds started before
+    every kept one are deleted, so a rebuild running concurrently in another process keeps its own.
+    Files still memory-mapped cannot be deleted on Windows; they are skipped and removed by a
+    later rebuild.
+
+    :return: Number of entries removed.
+    """
+    oldest = min(name for name in keep if name)
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and name >= oldest or name == 'meta.json' or name.endswith('.tmp'):
+            continue
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def ensure_benchmark_cache(csv_path):
+    """
+    Make sure the cache matches the CSV, rebuilding it only when the CSV content changed.
+
+    Size and mtime are compared first; when they differ the SHA-256 decides, so a file
+    that was only touched just gets its key refreshed.
+
+    :return: The cache metadata.
+    """
+    cache_dir = cache_dir_for(csv_path)
+    meta = read_cache_meta(cache_dir)
+    if meta is None:
+        return build_benchmark_cache(csv_path)
+
+    stat = csv_stat(csv_path)
+    if stat['size'] == meta['size'] and stat['mtime_ns'] == meta['mtime_ns']:
+        return meta
+
+    if stat['size'] == meta['size'] and file_hash(csv_path) == meta['sha256']:
+        meta.update(stat)
+        write_cache_meta(cache_dir, meta)
+        return meta
+
+    return build_benchmark_cache(csv_path)
+
+
+def load_benchmark(csv_path='spy_data.csv'):
+    """Open the benchmark cache for csv_path zero-copy (memory-mapped), building it if needed."""
+    cache_dir = cache_dir_for(csv_path)
+    for attempt in range(3):
+        meta = ensure_benchmark_cache(csv_path)
+        paths = array_paths(cache_dir, meta['build'])
+        try:
+            arrays = {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+            break
+        except FileNotFoundError:
+            # Pruned by two rebuilds in another process since meta.json was read: read it again
+            if attempt == 2:
+                raise
+    return Benchmark(
+        arrays['dates'].view('datetime64[ns]'),
+        arrays['close'],
+        arrays['returns'],
+        paths=paths,
+        key={k: meta[k] for k in ('size', 'mtime_ns', 'sha256')}
+    )
@@ -0,0 +1,123 @@
+import warnings
+import numpy as np
+import pandas as pd
+from risktide_metrics import return_rows, metric_arrays, prepare_portfolio_data, summary_columns
+
+# Bootstrap confidence intervals for the summary metrics.
+#
+# A resample draws, for every ticker, as many return rows as it has (with replacement) and runs the
+# unchanged metrics kernel on them. All resamples of all tickers in a batch are one index matrix:
+# resample b of ticker t becomes group b * tickers + t of metric_arrays, so its grouped bincounts do
+# the work and there is no Python loop over tickers or resamples. The number of resamples per batch
+# follows from a memory cap; the random stream does not depend on it, so neither do the intervals.
+#
+# 'iid' draws single rows. 'block' draws circular blocks of consecutive rows (moving-block bootstrap),
+# keeping short-range dependence such as volatility clusters inside each block.
+
+# Resampling methods
+methods = ('iid', 'block')
+
+# Defaults: resamples, two-sided confidence level, rows per block and memory cap of a batch
+default_resamples = 1000
+default_level = 0.90
+default_block_length = 5
+default_max_bytes = 256 * 2**20
+
+# Peak bytes per resampled row inside metric_arrays (indices plus its temporaries), measured at
+# about 130 and rounded up
+bytes_per_row = 192
+
+# Metrics that get intervals
+interval_metrics = summary_columns[1:]
+
+
+def resample_rows(rng, codes, starts, sizes, batch, method='iid', block_length=default_block_length):
+    """
+    Row indices of batch resamples, shape (batch, rows).
+
+    :param codes: Ticker of every row; rows are grouped by ticker, in order within each ticker.
+    :param starts: First row of every ticker.
+    :param sizes: Rows of every ticker.
+    """
+    n = sizes[codes]
+    position = np.arange(len(codes)) - starts[codes]
+    if method == 'iid':
+        offset = (rng.random((batch, len(codes))) * n).astype(np.int64)
+    elif method == 'block':
+        # One random start per block of block_length rows, then consecutive rows (wrapping around)
+        blocks = -(-sizes // block_length)
+        block_ids = np.concatenate(([0], np.cumsum(blocks)[:-1]))[codes] + position // block_length
+        block_starts = (rng.random((batch, blocks.sum())) * sizes[np.repeat(np.arange(len(sizes)), blocks)]).astype(np.int64)
+        offset = (block_starts[:, block_ids] + position % block_length) % n
+    else:
+        raise ValueError(f"Unknown bootstrap method {method!r}, expected one of {', '.join(methods)}")
+    return starts[codes] + offset
+
+
+def bootstrap_metrics(tickers, codes, y, x, resamples=default_resamples, method='iid', block_length=default_block_length,
+                      seed=None, max_bytes=default_max_bytes):
+    """
+    Metric values of every resample of every ticker.
+
+    :param codes: Ticker index of each row (as returned by return_rows).
+    :param max_bytes: Memory cap of one batch of resamples; at least one resample is run at a time.
+    :return: dict metric -> float32 array (resamples, tickers).
+    """
+    if block_length < 1:
+        raise ValueError("block_length must be at least 1")
+
+    k = len(tickers)
+    # Group the rows by ticker, keeping their order
+    order = np.argsort(codes, kind='stable')
+    codes, y, x = codes[order], y[order], x[order]
+    sizes = np.bincount(codes, minlength=k)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    rng = np.random.default_rng(seed)
+    batch_size = max(1, min(resamples, max_bytes // max(len(codes) * bytes_per_row, 1)))
+    replicates = {metric: np.empty((resamples, k), dtype=np.float32) for metric in interval_metrics}
+
+    group_offsets = None
+    for start in range(0, resamples, batch_size):
+        batch = min(batch_size, resamples - start)
+        rows = resample_rows(rng, codes, starts, sizes, batch, method, block_length)
+        if group_offsets is None or len(group_offsets) != batch:
+            group_offsets = (np.arange(batch) * k)[:, None]
+        values = metric_arrays((group_offsets + codes).ravel(), y[rows].ravel(), x[rows].ravel(), batch * k)
+        for metric in interval_metrics:
+            replicates[metric][start:start + batch] = values[metric].reshape(batch, k)
+    return replicates
+
+
+def confidence_intervals(tickers, codes, y, x, level=default_level, **options):
+    """
+    Percentile bootstrap intervals of every metric.
+
+    :param level: Two-sided confidence level, e.g. 0.90 for the 5th and 95th percentiles.
+    :param options: Passed to bootstrap_metrics.
+    :return: DataFrame with Stock Ticker and '<metric> Lower' / '<metric> Upper' columns.
+    """
+    replicates = bootstrap_metrics(tickers, codes, y, x, **options)
+    tail = 100 * (1 - level) / 2
+    intervals = pd.DataFrame({'Stock Ticker': tickers})
+    with warnings.catch_warnings():
+        # Metrics undefined in every resample (e.g. Sortino without losses) give NaN bounds
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for metric in interval_metrics:
+            lower, upper = np.nanpercentile(replicates[metric], [tail, 100 - tail], axis=0)
+            intervals[f'{metric} Lower'] = lower
+            intervals[f'{metric} Upper'] = upper
+    return intervals
+
+
+def add_confidence_intervals(summary_df, portfolio_df, spy_data, prices=None, level=default_level, **options):
+    """
+    Add bootstrap bounds to a metrics summary, resampling the same returns compute_metrics used.
+
+    :param options: resamples, method, block_length, seed and max_bytes of bootstrap_metrics.
+    :return: The summary with a Lower and an Upper column per metric.
+    """
+    portfolio_data = prepare_portfolio_data(portfolio_df)
+    tickers, codes, y, x, _ = return_rows(portfolio_data, spy_data, prices=prices)
+    intervals = confidence_intervals(tickers, codes, y, x, level=level, **options)
+    return summary_df.merge(intervals, on='Stock Ticker', how='left')
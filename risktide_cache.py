@@ -0,0 +1,114 @@
+import pickle
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from risktide_benchmark import Benchmark
+from risktide_files import atomic_write
+
+# Default location of the persistent per-ticker metrics cache
+metrics_cache_file = 'metrics_cache.pkl'
+
+# Bump when the cached metrics change meaning so old caches are discarded
+cache_format = 1
+
+
+def lot_fingerprints(portfolio_data):
+    """
+    Fingerprint the lots of every ticker in a prepared portfolio.
+
+    Only what the metrics depend on is hashed: each lot's purchase date and price, in
+    portfolio order (returns are computed across consecutive lots).
+
+    :return: dict ticker -> hex digest
+    """
+    if portfolio_data.empty:
+        return {}
+
+    codes, tickers = pd.factorize(portfolio_data['Stock Ticker'])
+    row_hashes = pd.util.hash_pandas_object(portfolio_data[['Date Purchased', 'Purchase Price']], index=False).to_numpy()
+
+    valid = codes >= 0
+    codes = codes[valid]
+    row_hashes = row_hashes[valid]
+
+    # Group the row hashes per ticker, keeping portfolio order inside each group
+    order = np.argsort(codes, kind='stable')
+    bounds = np.cumsum(np.bincount(codes, minlength=len(tickers)))[:-1]
+    groups = np.split(row_hashes[order], bounds)
+
+    return {ticker: hashlib.blake2b(group.tobytes(), digest_size=16).hexdigest() for ticker, group in zip(tickers, groups)}
+
+
+def benchmark_version(spy_data):
+    """Identify the benchmark data the metrics were computed against."""
+    if isinstance(spy_data, Benchmark) and spy_data.key.get('sha256'):
+        return spy_data.key['sha256']
+    hashes = pd.util.hash_pandas_object(spy_data[['Date', 'SPY Return']], index=False).to_numpy()
+    return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+
+class MetricsCache:
+    """
+    Persistent per-ticker metrics, keyed by the fingerprint of the ticker's lots.
+
+    The whole cache belongs to one benchmark version and is cleared when the benchmark
+    changes. Entries are evicted least-recently-used beyond max_entries.
+    """
+
+    def __init__(self, path=metrics_cache_file, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self.benchmark_version = None
+        self.entries = OrderedDict()  # ticker -> (fingerprint, metrics dict or None)
+
+    def load(self):
+        """Load the cache from disk; a missing or unreadable file gives an empty cache."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('format') == cache_format:
+                self.benchmark_version = data['benchmark_version']
+                self.entries = OrderedDict(data['entries'])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable metrics cache {self.path}: {e}")
+        return self
+
+    def save(self):
+        """Write the cache to disk atomically."""
+        with atomic_write(self.path, 'wb') as f:
+            pickle.dump({'format': cache_format, 'benchmark_version': self.benchmark_version, 'entries': list(self.entries.items())}, f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def use_benchmark(self, version):
+        """Switch to a benchmark version, dropping every entry computed against another one."""
+        if version != self.benchmark_version:
+            self.entries.clear()
+            self.benchmark_version = version
+
+    def lookup(self, ticker, fingerprint):
+        """Return (hit, metrics); metrics is None for tickers that had too little data."""
+        entry = self.entries.get(ticker)
+        if entry is None or entry[0] != fingerprint:
+            return False, None
+        self.entries.move_to_end(ticker)
+        return True, entry[1]
+
+    def store(self, ticker, fingerprint, metrics):
+        """Remember the metrics of a ticker, evicting the least recently used entries if needed."""
+        self.entries[ticker] = (fingerprint, metrics)
+        self.entries.move_to_end(ticker)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, tickers=None):
+        """Forget the given tickers, or everything when tickers is None."""
+        if tickers is None:
+            self.entries.clear()
+            return
+        for ticker in tickers:
+            self.entries.pop(ticker, None)
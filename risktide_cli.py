@@ -0,0 +1,423 @@
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+# Command-line batch mode: no Tk, no display, nothing Windows-only. pandas, the metrics engine and
+# matplotlib are imported inside the subcommands that need them so `risktide --help` and the
+# benchmark freshness check stay fast.
+#
+#   python risktide_cli.py refresh-benchmark
+#   python risktide_cli.py compute --portfolio portfolio.db --output metrics.json
+#   python risktide_cli.py ingest-prices prices/ && python risktide_cli.py compute --prices price_history
+#   python risktide_cli.py rolling --windows 21,63,252
+#   python risktide_cli.py simulate --paths 1000000 --innovations t --seed 7
+#   python risktide_cli.py factors --factor QQQ.csv --factor XLF.csv --factor F-F_Research_Data_Factors_daily.csv --percent
+#   python risktide_cli.py workspace create "Client A" --from client_a.csv && python risktide_cli.py workspace compute
+#   python risktide_cli.py export --output lots.csv
+#   python risktide_cli.py report --summary stock_metrics_summary.csv --output report.pdf
+
+# Exit codes (cron treats anything but 0 as a failure)
+exit_ok = 0
+exit_error = 1  # the command ran but failed (missing input, refresh error, ...)
+exit_usage = 2  # bad arguments (argparse uses 2 as well)
+
+# Output formats by file extension
+output_formats = {'.csv': 'csv', '.json': 'json'}
+
+
+def output_format(path, fmt=None):
+    """Explicit format, or the one implied by the file extension (csv by default)."""
+    if fmt:
+        return fmt
+    return output_formats.get(os.path.splitext(path)[1].lower(), 'csv')
+
+
+def write_frame(df, path, fmt, stdout=None):
+    """Write a DataFrame as csv or json ('-' writes to stdout)."""
+    if fmt == 'json':
+        text = df.to_json(orient='records', indent=2, force_ascii=False)
+    else:
+        text = df.to_csv(index=False)
+
+    if path == '-':
+        (stdout or sys.stdout).write(text)
+        return
+    from risktide_files import write_text_atomically
+
+    write_text_atomically(path, text)
+
+
+def read_portfolio(path):
+    """Read lots from a portfolio store (.db) or a portfolio CSV in the GUI's column layout."""
+    import pandas as pd
+    from risktide_store import PortfolioStore
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Portfolio not found: {path}")
+    if path.endswith('.db'):
+        store = PortfolioStore(path)
+        try:
+            return store.to_frame()
+        finally:
+            store.close()
+    return pd.read_csv(path)
+
+
+def default_portfolio():
+    """The GUI's portfolio store if there is one, otherwise portfolio_data.csv."""
+    from risktide_store import portfolio_db_file, portfolio_csv_file
+
+    return portfolio_db_file if os.path.exists(portfolio_db_file) else portfolio_csv_file
+
+
+def cmd_refresh_benchmark(args):
+    import risktide_horizon
+    from datetime import timedelta
+
+    source = risktide_horizon.LocalSource(args.source) if args.source else None
+    max_age = timedelta(days=args.max_age_days) if args.max_age_days is not None else None
+    rows = risktide_horizon.main(source=source, max_age=max_age, csv_path=args.benchmark, last_run_path=args.last_run_file, force=args.force)
+    return exit_error if rows is None else exit_ok
+
+
+def open_prices(path):
+    """The price-history store in path, None without a path."""
+    if not path:
+        return None
+    from risktide_prices import PriceStore
+
+    prices = PriceStore.open_existing(path)
+    if prices is None:
+        raise FileNotFoundError(f"No price-history store in {path} (run 'risktide ingest-prices' first)")
+    return prices
+
+
+def cmd_compute(args):
+    import risktide_metrics
+    from risktide_benchmark import load_benchmark
+    from risktide_cache import MetricsCache
+
+    portfolio_path = args.portfolio or default_portfolio()
+    portfolio_df = read_portfolio(portfolio_path)
+    spy_data = load_benchmark(args.benchmark)
+    prices = open_prices(args.prices)
+
+    cache = None if args.no_cache else MetricsCache(args.cache).load()
+    start = time.perf_counter()
+    summary_df = risktide_metrics.compute_metrics(portfolio_df, spy_data, engine=args.engine, max_workers=args.workers, chunksize=args.chunksize, cache=cache, prices=prices)
+    if cache is not None:
+        cache.save()
+
+    if args.bootstrap:
+        import risktide_bootstrap
+
+        summary_df = risktide_bootstrap.add_confidence_intervals(
+            summary_df, portfolio_df, spy_data, prices=prices, level=args.ci_level, resamples=args.bootstrap,
+            method=args.bootstrap_method, block_length=args.block_length, seed=args.seed, max_bytes=args.max_memory_mb * 2**20)
+        print(f"Added {args.ci_level:.0%} bootstrap intervals ({args.bootstrap} {args.bootstrap_method} resamples)")
+
+    if not args.no_portfolio_risk:
+        import risktide_portfolio
+
+        summary_df, stats = risktide_portfolio.add_portfolio_risk(summary_df, portfolio_df, spy_data, prices=prices, block_size=args.block_size)
+        risktide_portfolio.save_portfolio_risk(stats, args.portfolio_risk_output)
+        for name, value in stats.items():
+            print(f"  {name}: {value:.6g}" if isinstance(value, float) else f"  {name}: {value}", file=sys.stderr)
+
+    write_frame(summary_df, args.output, output_format(args.output, args.format), args.stdout)
+    print(f"Computed metrics for {len(summary_df)} tickers ({len(portfolio_df)} lots from {portfolio_path}) in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_ingest_prices(args):
+    from risktide_prices import PriceStore
+
+    store = PriceStore(args.store)
+    start = time.perf_counter()
+    if os.path.isdir(args.source):
+        added = store.ingest_directory(args.source, pattern=args.pattern)
+    elif os.path.exists(args.source):
+        added = store.ingest_csv(args.source, ticker=args.ticker)
+    else:
+        raise FileNotFoundError(f"Price data not found: {args.source}")
+    print(f"Added {sum(added.values())} rows for {len(added)} tickers to {args.store} in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_rolling(args):
+    import risktide_metrics
+    import risktide_rolling
+    from risktide_benchmark import load_benchmark
+
+    portfolio_path = args.portfolio or default_portfolio()
+    portfolio_data = risktide_metrics.prepare_portfolio_data(read_portfolio(portfolio_path))
+    spy_data = load_benchmark(args.benchmark)
+    prices = open_prices(args.prices)
+
+    start = time.perf_counter()
+    rolling_df = risktide_rolling.rolling_metrics(portfolio_data, spy_data, risktide_rolling.parse_windows(args.windows), prices=prices)
+    write_frame(rolling_df, args.output, output_format(args.output, args.format), args.stdout)
+    print(f"Computed {len(rolling_df)} rolling rows (windows {args.windows}) in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_simulate(args):
+    import risktide_montecarlo
+    from risktide_benchmark import load_benchmark
+
+    portfolio_path = args.portfolio or default_portfolio()
+    portfolio_df = read_portfolio(portfolio_path)
+    spy_data = load_benchmark(args.benchmark)
+    prices = open_prices(args.prices)
+
+    start = time.perf_counter()
+    simulation_df = risktide_montecarlo.monte_carlo_var(
+        portfolio_df, spy_data, prices=prices, model=args.model, innovations=args.innovations, paths=args.paths,
+        horizons=risktide_montecarlo.parse_horizons(args.horizons), confidence=args.confidence, df=args.df,
+        batch_size=args.batch_size, seed=args.seed, workers=args.workers, per_ticker=args.per_ticker)
+    write_frame(simulation_df, args.output, output_format(args.output, args.format), args.stdout)
+    print(f"Simulated {args.paths} paths ({args.model} model, {args.innovations} innovations) in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_factors(args):
+    import risktide_factors
+    from risktide_benchmark import load_benchmark
+
+    portfolio_path = args.portfolio or default_portfolio()
+    portfolio_df = read_portfolio(portfolio_path)
+    spy_data = load_benchmark(args.benchmark)
+    prices = open_prices(args.prices)
+
+    start = time.perf_counter()
+    regression_df = risktide_factors.regress_portfolio(portfolio_df, spy_data, factor_paths=args.factor or (), prices=prices,
+                                                       percent=args.percent, include_benchmark=not args.no_benchmark)
+    write_frame(regression_df, args.output, output_format(args.output, args.format), args.stdout)
+    print(f"Regressed {len(regression_df)} tickers on {regression_df.columns.str.startswith('Factor Beta').sum()} factors in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_quantiles(args):
+    import risktide_sketch
+
+    prices = open_prices(args.prices)
+    levels = risktide_sketch.parse_levels(args.levels)
+    tickers = args.ticker or None
+
+    start = time.perf_counter()
+    if args.exact:
+        quantile_df = risktide_sketch.exact_summary(prices, tickers=tickers, start=args.start, end=args.end, levels=levels, pooled=args.pooled, period=args.period)
+    else:
+        store = risktide_sketch.SketchStore(args.sketches, alpha=args.accuracy, period=args.period).load()
+        folded = store.update(prices)
+        store.save()
+        print(f"Folded {folded} new returns into {args.sketches}")
+        quantile_df = store.sketch.select(tickers=tickers, start=args.start, end=args.end).summary(levels=levels, pooled=args.pooled)
+    write_frame(quantile_df, args.output, output_format(args.output, args.format), args.stdout)
+    print(f"Summarised {len(quantile_df)} rows ({'exact' if args.exact else 'sketch'}) in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_workspace(args):
+    import risktide_workspace
+
+    workspace = risktide_workspace.Workspace(args.root, benchmark_path=args.benchmark)
+    try:
+        if args.action == 'list':
+            for name in workspace.names():
+                portfolio = workspace.portfolio(name)
+                print(f"{name}\t{portfolio.store.count()} lots\t{portfolio.directory}", file=args.stdout)
+            return exit_ok
+
+        if args.action == 'create':
+            if not args.name:
+                print("risktide workspace create: a portfolio name is required", file=sys.stderr)
+                return exit_usage
+            lots = read_portfolio(args.source) if args.source else None
+            portfolio = workspace.create(args.name, lots=lots)
+            print(f"Created portfolio {args.name!r} with {portfolio.store.count()} lots in {portfolio.directory}", file=sys.stderr)
+            return exit_ok
+
+        prices = open_prices(args.prices)
+        start = time.perf_counter()
+        outcome = workspace.compute_all(args.name and [args.name], max_workers=args.workers, prices=prices, force=args.force)
+        failed = [name for name, error in outcome.items() if error is not None]
+        print(f"Computed {len(outcome)} portfolios ({len(failed)} failed) in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+        return exit_error if failed else exit_ok
+    finally:
+        workspace.close()
+
+
+def cmd_export(args):
+    from risktide_store import PortfolioStore
+
+    if not os.path.exists(args.db):
+        raise FileNotFoundError(f"Portfolio store not found: {args.db}")
+    store = PortfolioStore(args.db)
+    try:
+        portfolio_df = store.to_frame()
+    finally:
+        store.close()
+    write_frame(portfolio_df, args.output, output_format(args.output, args.format), args.stdout)
+    print(f"Exported {len(portfolio_df)} lots from {args.db}", file=sys.stderr)
+    return exit_ok
+
+
+def cmd_report(args):
+    # Never pick an interactive backend on a server
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    import pandas as pd
+    import risktide_report
+
+    if not os.path.exists(args.summary):
+        raise FileNotFoundError(f"Metrics summary not found: {args.summary} (run 'risktide compute' first)")
+    summary_df = pd.read_json(args.summary, orient='records') if output_format(args.summary) == 'json' else pd.read_csv(args.summary)
+
+    skipped = risktide_report.write_report(summary_df, args.output, title=args.title, graphs=not args.no_graphs, table=not args.no_table)
+    for plot in skipped:
+        print(f"Skipped graph '{plot}': not enough data", file=sys.stderr)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return exit_ok
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='risktide', description="RiskTide batch mode: refresh the benchmark, compute risk metrics and write reports without the GUI.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    refresh = subparsers.add_parser('refresh-benchmark', help="Bring the SPY benchmark up to date")
+    refresh.add_argument('--benchmark', default='spy_data.csv', help="Benchmark CSV to update (default: %(default)s)")
+    refresh.add_argument('--source', help="Local CSV file or directory to read from instead of Kaggle")
+    refresh.add_argument('--max-age-days', type=float, help="Refresh only when older than this (default: RISKTIDE_REFRESH_DAYS or 30)")
+    refresh.add_argument('--last-run-file', default='last_run.txt', help="Where the last refresh time is kept (default: %(default)s)")
+    refresh.add_argument('--force', action='store_true', help="Refresh even if the benchmark is fresh")
+    refresh.set_defaults(func=cmd_refresh_benchmark)
+
+    compute = subparsers.add_parser('compute', help="Compute the risk metrics of a portfolio")
+    compute.add_argument('--portfolio', help="Portfolio store (.db) or portfolio CSV (default: portfolio.db, else portfolio_data.csv)")
+    compute.add_argument('--benchmark', default='spy_data.csv', help="Benchmark CSV (default: %(default)s)")
+    compute.add_argument('--output', '-o', default='stock_metrics_summary.csv', help="Metrics summary to write, '-' for stdout (default: %(default)s)")
+    compute.add_argument('--format', choices=sorted(set(output_formats.values())), help="Output format (default: from the output extension)")
+    compute.add_argument('--engine', default='vectorized', choices=('vectorized', 'threads', 'processes'), help="Metrics engine (default: %(default)s)")
+    compute.add_argument('--workers', type=int, help="Worker count for the threads/processes engines")
+    compute.add_argument('--chunksize', type=int, default=64, help="Tickers per task of the processes engine (default: %(default)s)")
+    compute.add_argument('--prices', help="Price-history store; returns then come from daily closes instead of lot prices")
+    compute.add_argument('--cache', default='metrics_cache.pkl', help="Per-ticker metrics cache (default: %(default)s)")
+    compute.add_argument('--no-cache', action='store_true', help="Recompute every ticker and leave the cache alone")
+    compute.add_argument('--portfolio-risk-output', default='portfolio_risk.csv', help="Portfolio-level VaR/CVaR and volatility (default: %(default)s)")
+    compute.add_argument('--no-portfolio-risk', action='store_true', help="Only compute the per-ticker metrics")
+    compute.add_argument('--block-size', type=int, default=256, help="Tickers per covariance block (default: %(default)s)")
+    compute.add_argument('--bootstrap', type=int, default=0, metavar='RESAMPLES', help="Add bootstrap confidence bounds from this many resamples, e.g. 1000 (default: off)")
+    compute.add_argument('--bootstrap-method', default='iid', choices=('iid', 'block'), help="Resample single rows or blocks of consecutive rows (default: %(default)s)")
+    compute.add_argument('--block-length', type=int, default=5, help="Rows per block of the block bootstrap (default: %(default)s)")
+    compute.add_argument('--ci-level', type=float, default=0.90, help="Two-sided confidence level of the bounds (default: %(default)s)")
+    compute.add_argument('--seed', type=int, help="Random seed of the bootstrap")
+    compute.add_argument('--max-memory-mb', type=int, default=256, help="Memory cap of one batch of resamples (default: %(default)s)")
+    compute.set_defaults(func=cmd_compute)
+
+    ingest = subparsers.add_parser('ingest-prices', help="Add daily price CSV files to the local price-history store")
+    ingest.add_argument('source', help="CSV file, or directory of CSV files (one per ticker, named after it, or with a Ticker column)")
+    ingest.add_argument('--store', default='price_history', help="Price-history store directory (default: %(default)s)")
+    ingest.add_argument('--ticker', help="Ticker of a single CSV file without a Ticker column (default: the file name)")
+    ingest.add_argument('--pattern', default='*.csv', help="Files to read from a directory (default: %(default)s)")
+    ingest.set_defaults(func=cmd_ingest_prices)
+
+    rolling = subparsers.add_parser('rolling', help="Compute rolling-window metrics per ticker")
+    rolling.add_argument('--portfolio', help="Portfolio store (.db) or portfolio CSV (default: portfolio.db, else portfolio_data.csv)")
+    rolling.add_argument('--benchmark', default='spy_data.csv', help="Benchmark CSV (default: %(default)s)")
+    rolling.add_argument('--windows', default='21,63,252', help="Comma-separated window lengths in return rows: trading days with --prices, lots without (default: %(default)s)")
+    rolling.add_argument('--prices', help="Price-history store; returns then come from daily closes instead of lot prices")
+    rolling.add_argument('--output', '-o', default='stock_metrics_rolling.csv', help="File to write, '-' for stdout (default: %(default)s)")
+    rolling.add_argument('--format', choices=sorted(set(output_formats.values())), help="Output format (default: from the output extension)")
+    rolling.set_defaults(func=cmd_rolling)
+
+    simulate = subparsers.add_parser('simulate', help="Monte Carlo VaR/CVaR of the portfolio and its tickers")
+    simulate.add_argument('--portfolio', help="Portfolio store (.db) or portfolio CSV (default: portfolio.db, else portfolio_data.csv)")
+    simulate.add_argument('--benchmark', default='spy_data.csv', help="Benchmark CSV (default: %(default)s)")
+    simulate.add_argument('--prices', help="Price-history store; returns then come from daily closes instead of lot prices")
+    simulate.add_argument('--model', default='covariance', choices=('covariance', 'factor'), help="Return model (default: %(default)s)")
+    simulate.add_argument('--innovations', default='normal', choices=('normal', 't', 'bootstrap'), help="Shock distribution (default: %(default)s)")
+    simulate.add_argument('--df', type=float, default=5, help="Degrees of freedom of Student-t shocks (default: %(default)s)")
+    simulate.add_argument('--paths', type=int, default=100_000, help="Number of simulated paths (default: %(default)s)")
+    simulate.add_argument('--horizons', default='1,10', help="Comma-separated horizons in trading days (default: %(default)s)")
+    simulate.add_argument('--confidence', type=float, default=0.95, help="VaR/CVaR confidence level (default: %(default)s)")
+    simulate.add_argument('--batch-size', type=int, default=10_000, help="Paths per batch; bounds the memory (default: %(default)s)")
+    simulate.add_argument('--seed', type=int, help="Random seed; the same seed and batch size give the same results")
+    simulate.add_argument('--workers', type=int, help="Worker processes to spread the batches over (default: none)")
+    simulate.add_argument('--per-ticker', action='store_true', help="Also estimate every ticker's VaR/CVaR (slower)")
+    simulate.add_argument('--output', '-o', default='monte_carlo_var.csv', help="File to write, '-' for stdout (default: %(default)s)")
+    simulate.add_argument('--format', choices=sorted(set(output_formats.values())), help="Output format (default: from the output extension)")
+    simulate.set_defaults(func=cmd_simulate)
+
+    factors = subparsers.add_parser('factors', help="Univariate and multi-factor regressions on benchmark and factor CSVs")
+    factors.add_argument('--portfolio', help="Portfolio store (.db) or portfolio CSV (default: portfolio.db, else portfolio_data.csv)")
+    factors.add_argument('--benchmark', default='spy_data.csv', help="Benchmark CSV (default: %(default)s)")
+    factors.add_argument('--factor', action='append', metavar='CSV', help="Index/ETF prices (Date, Close) or a factor returns table; repeat for more")
+    factors.add_argument('--percent', action='store_true', help="Factor tables hold percent returns (Fama-French files)")
+    factors.add_argument('--no-benchmark', action='store_true', help="Leave the main benchmark out of the factors")
+    factors.add_argument('--prices', help="Price-history store; returns then come from daily closes instead of lot prices")
+    factors.add_argument('--output', '-o', default='factor_regression.csv', help="File to write, '-' for stdout (default: %(default)s)")
+    factors.add_argument('--format', choices=sorted(set(output_formats.values())), help="Output format (default: from the output extension)")
+    factors.set_defaults(func=cmd_factors)
+
+    quantiles = subparsers.add_parser('quantiles', help="VaR and Expected Shortfall from incrementally updated return sketches")
+    quantiles.add_argument('--prices', default='price_history', help="Price-history store (default: %(default)s)")
+    quantiles.add_argument('--sketches', default='return_sketches.npz', help="Persisted sketches, updated on every run (default: %(default)s)")
+    quantiles.add_argument('--levels', default='0.95,0.99', help="Comma-separated confidence levels (default: %(default)s)")
+    quantiles.add_argument('--ticker', action='append', help="Only this ticker (repeatable; default: all)")
+    quantiles.add_argument('--start', help="First month or year included, e.g. 2020-01 (default: all)")
+    quantiles.add_argument('--end', help="Last month or year included (default: all)")
+    quantiles.add_argument('--pooled', action='store_true', help="One row for all selected tickers together")
+    quantiles.add_argument('--period', default='M', choices=('M', 'Y'), help="Time partition of the sketches, month or year (default: %(default)s)")
+    quantiles.add_argument('--accuracy', type=float, default=0.005, help="Relative accuracy of the sketches (default: %(default)s)")
+    quantiles.add_argument('--exact', action='store_true', help="Compute from the raw returns instead, for validation")
+    quantiles.add_argument('--output', '-o', default='return_quantiles.csv', help="File to write, '-' for stdout (default: %(default)s)")
+    quantiles.add_argument('--format', choices=sorted(set(output_formats.values())), help="Output format (default: from the output extension)")
+    quantiles.set_defaults(func=cmd_quantiles)
+
+    workspace = subparsers.add_parser('workspace', help="List, create and compute the named portfolios of a workspace")
+    workspace.add_argument('action', choices=('list', 'create', 'compute'), help="list the portfolios, create one, or bring their metrics up to date")
+    workspace.add_argument('name', nargs='?', help="Portfolio to create, or the only one to compute (default: all)")
+    workspace.add_argument('--root', default='portfolios', help="Directory of the named portfolios (default: %(default)s)")
+    workspace.add_argument('--benchmark', default='spy_data.csv', help="Benchmark CSV shared by every portfolio (default: %(default)s)")
+    workspace.add_argument('--from', dest='source', help="Portfolio store (.db) or portfolio CSV to copy the lots of a new portfolio from")
+    workspace.add_argument('--workers', type=int, default=4, help="Portfolios computed at the same time (default: %(default)s)")
+    workspace.add_argument('--force', action='store_true', help="Recompute portfolios whose results are still current")
+    workspace.add_argument('--prices', help="Price-history store; returns then come from daily closes instead of lot prices")
+    workspace.set_defaults(func=cmd_workspace)
+
+    export = subparsers.add_parser('export', help="Export the lots of a portfolio store")
+    export.add_argument('--db', default='portfolio.db', help="Portfolio store (default: %(default)s)")
+    export.add_argument('--output', '-o', default='portfolio_data.csv', help="File to write, '-' for stdout (default: %(default)s)")
+    export.add_argument('--format', choices=sorted(set(output_formats.values())), help="Output format (default: from the output extension)")
+    export.set_defaults(func=cmd_export)
+
+    report = subparsers.add_parser('report', help="Write a PDF report from a metrics summary")
+    report.add_argument('--summary', default='stock_metrics_summary.csv', help="Metrics summary, csv or json (default: %(default)s)")
+    report.add_argument('--output', '-o', default='risk_report.pdf', help="PDF to write (default: %(default)s)")
+    report.add_argument('--title', default="RiskTide Risk Report", help="Report title")
+    report.add_argument('--no-graphs', action='store_true', help="Leave out the graphs")
+    report.add_argument('--no-table', action='store_true', help="Leave out the metrics table")
+    report.set_defaults(func=cmd_report)
+
+    return parser
+
+
+def main(argv=None):
+    """Run one subcommand and return its exit code."""
+    args = build_parser().parse_args(argv)
+    # Progress messages go to stderr; stdout only carries data written with '-o -'
+    args.stdout = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return args.func(args)
+    except KeyboardInterrupt:
+        return exit_error
+    except Exception as e:
+        print(f"risktide {args.command}: error: {e}", file=sys.stderr)
+        return exit_error
+
+
+if __name__ == '__main__':
+    sys.exit(main())
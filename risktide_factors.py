@@ -0,0 +1,252 @@
+import os
+import numpy as np
+import pandas as pd
+import risktide_trace
+from risktide_metrics import return_rows, prepare_portfolio_data, spy_arrays
+
+# Regression of every ticker on several benchmark and factor series: other indices, sector ETFs or
+# Fama-French style factor files, read from local CSVs.
+#
+# The series are aligned once on a shared date index (the union of their dates, NaN where a series
+# has no value) and looked up for every return row in one searchsorted. Each ticker then gets a
+# univariate alpha, beta and R² against every series, on the rows where that series has a value,
+# and one multivariate regression on all series together, on the rows where every series has a
+# value. Both are solved for all tickers at once: the per-ticker sums are grouped bincounts, and the
+# multivariate normal equations of the centered data form one stacked (tickers, factors, factors)
+# system for np.linalg.solve. There is no fit per ticker or per factor.
+#
+# A factor file is either a price series with a 'Close' column (its name is the file name, its
+# returns Close.pct_change()) or a table of returns with one column per factor, like the daily
+# Fama-French files (YYYYMMDD dates, values in percent: pass percent=True).
+
+# Name of the main benchmark among the factors
+benchmark_label = 'SPY'
+
+# Columns of a factor table that are not factors (the risk-free rate of the Fama-French files)
+skip_columns = ('RF',)
+
+
+class FactorSet:
+    """Factor returns on a shared date index: dates sorted and unique, values (dates x factors) with NaN gaps."""
+
+    def __init__(self, names, dates, values):
+        self.names = list(names)
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.values = np.asarray(values, dtype=float)
+
+    def __len__(self):
+        return len(self.names)
+
+    def rows(self, dates):
+        """Factor returns on the given dates, one row per date, NaN for dates outside the index."""
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        pos = np.searchsorted(self.dates, dates)
+        pos_clipped = np.minimum(pos, len(self.dates) - 1)
+        found = (pos < len(self.dates)) & (self.dates[pos_clipped] == dates) if len(self.dates) else np.zeros(len(dates), dtype=bool)
+        values = np.full((len(dates), len(self)), np.nan)
+        values[found] = self.values[pos_clipped[found]]
+        return values
+
+
+def parse_dates(column):
+    """Dates of a factor file: YYYYMMDD integers (Fama-French) or any format pandas recognises."""
+    if pd.api.types.is_integer_dtype(column):
+        return pd.to_datetime(column.astype(str), format='%Y%m%d')
+    return pd.to_datetime(column)
+
+
+def load_factor_file(path, percent=False):
+    """
+    Read one factor CSV as daily returns.
+
+    :param percent: Values of a returns table are in percent (as in the Fama-French files).
+    :return: DataFrame indexed by date, one column per factor.
+    """
+    frame = pd.read_csv(path)
+    date_column = 'Date' if 'Date' in frame.columns else frame.columns[0]
+    dates = parse_dates(frame[date_column])
+
+    if 'Close' in frame.columns:
+        name = os.path.splitext(os.path.basename(path))[0]
+        close = pd.Series(frame['Close'].to_numpy(dtype=float), index=dates)
+        close = close[~close.index.duplicated(keep='last')].sort_index()
+        factors = close.pct_change().to_frame(name)
+    else:
+        columns = [c for c in frame.columns if c != date_column and c not in skip_columns]
+        factors = frame[columns].apply(pd.to_numeric, errors='coerce').set_axis(dates)
+        if percent:
+            factors = factors / 100.0
+
+    factors = factors[~factors.index.duplicated(keep='last')].sort_index()
+    if factors.shape[1] == 0:
+        raise ValueError(f"No factor columns found in {path}")
+    return factors
+
+
+def build_factor_set(spy_data=None, paths=(), percent=False):
+    """
+    Align the benchmark and the factor files on one date index.
+
+    :param spy_data: The main benchmark (frame or cached Benchmark), included first as 'SPY'; None to leave it out.
+    :param paths: Factor CSV files (see load_factor_file).
+    """
+    frames = []
+    if spy_data is not None:
+        spy_dates, spy_return = spy_arrays(spy_data)
+        frames.append(pd.DataFrame({benchmark_label: np.asarray(spy_return)}, index=pd.DatetimeIndex(np.asarray(spy_dates))))
+    for path in paths:
+        frames.append(load_factor_file(path, percent=percent))
+    if not frames:
+        raise ValueError("No benchmark or factor series to regress on")
+
+    names = [name for frame in frames for name in frame.columns]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Factor names must be unique, found {', '.join(map(str, duplicates))} more than once")
+
+    aligned = pd.concat(frames, axis=1, join='outer').sort_index()
+    return FactorSet(names, aligned.index.to_numpy(dtype='datetime64[ns]'), aligned.to_numpy(dtype=float))
+
+
+def group_sums(codes, values, k):
+    """Column sums of a (rows, columns) array per group, shape (k, columns)."""
+    return np.stack([np.bincount(codes, weights=values[:, j], minlength=k) for j in range(values.shape[1])], axis=1)
+
+
+def univariate_regressions(codes, y, factors, k):
+    """
+    Alpha, beta and R² of every group against every factor column separately.
+
+    Same closed form as metric_arrays, so the regression on the main benchmark matches the summary's
+    Alpha, Beta and R².
+
+    :param factors: Factor returns of every row (rows, m); NaN rows are left out of that factor's fit.
+    :return: dict with 'n', 'alpha', 'beta' and 'r_squared', each of shape (k, m).
+    """
+    present = ~np.isnan(factors)
+    n = group_sums(codes, present.astype(float), k)
+    stock = np.where(present, y[:, None], 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = group_sums(codes, np.where(present, factors, 0.0), k) / n
+        y_mean = group_sums(codes, stock, k) / n
+        dx = np.where(present, factors - x_mean[codes], 0.0)
+        dy = np.where(present, stock - y_mean[codes], 0.0)
+        sxx = group_sums(codes, dx * dx, k)
+        sxy = group_sums(codes, dx * dy, k)
+        syy = group_sums(codes, dy * dy, k)
+
+        beta = np.where(sxx > 0, sxy / sxx, 0.0)
+        alpha = y_mean - beta * x_mean
+        r_squared = np.where(syy > 0, beta * sxy / syy, 1.0)
+
+    undefined = n < 2
+    return {
+        'n': n,
+        'alpha': np.where(undefined, np.nan, alpha),
+        'beta': np.where(undefined, np.nan, beta),
+        'r_squared': np.where(undefined, np.nan, r_squared),
+    }
+
+
+def multivariate_regression(codes, y, factors, k):
+    """
+    Least squares of every group on all factor columns at once, on the rows where every factor has a value.
+
+    The normal equations of the centered data (X'X) b = X'y are built with one bincount per entry
+    and solved for all groups in one stacked call. Groups with no more rows than coefficients, or
+    whose factors are collinear, get NaN.
+
+    :return: dict with 'n', 'alpha' (k), 'beta' (k, m), 'r_squared', 'adj_r_squared' and 'residual_std' (k).
+    """
+    m = factors.shape[1]
+    complete = ~np.isnan(factors).any(axis=1)
+    codes, y, factors = codes[complete], y[complete], factors[complete]
+    n = np.bincount(codes, minlength=k).astype(float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = group_sums(codes, factors, k) / n[:, None]
+        y_mean = np.bincount(codes, weights=y, minlength=k) / n
+    dx = factors - x_mean[codes]
+    dy = y - y_mean[codes]
+
+    xtx = np.empty((k, m, m))
+    for a in range(m):
+        for b in range(a, m):
+            xtx[:, a, b] = xtx[:, b, a] = np.bincount(codes, weights=dx[:, a] * dx[:, b], minlength=k)
+    xty = group_sums(codes, dx * dy[:, None], k)
+    syy = np.bincount(codes, weights=dy * dy, minlength=k)
+
+    solvable = n > m + 1
+    if solvable.any():
+        solvable[solvable] = np.linalg.matrix_rank(xtx[solvable]) == m
+    beta = np.full((k, m), np.nan)
+    if solvable.any():
+        beta[solvable] = np.linalg.solve(xtx[solvable], xty[solvable][..., None])[..., 0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha = y_mean - (beta * x_mean).sum(axis=1)
+        explained = (beta * xty).sum(axis=1)
+        r_squared = np.where(syy > 0, explained / syy, 1.0)
+        adj_r_squared = 1 - (1 - r_squared) * (n - 1) / (n - m - 1)
+        residual_std = np.sqrt(np.maximum(syy - explained, 0.0) / (n - m - 1))
+
+    undefined = ~solvable
+    return {
+        'n': n,
+        'alpha': np.where(undefined, np.nan, alpha),
+        'beta': beta,
+        'r_squared': np.where(undefined, np.nan, r_squared),
+        'adj_r_squared': np.where(undefined, np.nan, adj_r_squared),
+        'residual_std': np.where(undefined, np.nan, residual_std),
+    }
+
+
+def factor_regression(tickers, codes, y, dates, factors):
+    """
+    Univariate and multivariate regressions of every ticker on a FactorSet.
+
+    :param codes: Ticker index of each return row (as returned by return_rows).
+    :param dates: Date of each row.
+    :return: DataFrame with Stock Ticker, 'Alpha/Beta/R² (<factor>)' per factor and the 'Factor ...'
+             columns of the multivariate fit; tickers with fewer than two rows are left out.
+    """
+    k = len(tickers)
+    with risktide_trace.span('factor_align', rows=len(codes), factors=len(factors)):
+        rows = factors.rows(dates)
+    with risktide_trace.span('factor_regression', rows=len(codes), factors=len(factors)):
+        single = univariate_regressions(codes, y, rows, k)
+        joint = multivariate_regression(codes, y, rows, k)
+
+    result = {'Stock Ticker': tickers}
+    for j, name in enumerate(factors.names):
+        result[f'Alpha ({name})'] = single['alpha'][:, j]
+        result[f'Beta ({name})'] = single['beta'][:, j]
+        result[f'R² ({name})'] = single['r_squared'][:, j]
+    result['Factor Alpha'] = joint['alpha']
+    for j, name in enumerate(factors.names):
+        result[f'Factor Beta ({name})'] = joint['beta'][:, j]
+    result['Factor R²'] = joint['r_squared']
+    result['Factor Adj. R²'] = joint['adj_r_squared']
+    result['Factor Residual Std'] = joint['residual_std']
+    result['Factor Rows'] = joint['n'].astype(int)
+
+    regression_df = pd.DataFrame(result)
+    keep = single['n'].max(axis=1, initial=0) >= 2
+    return regression_df[keep].reset_index(drop=True)
+
+
+def regress_portfolio(portfolio_df, spy_data, factor_paths=(), prices=None, percent=False, include_benchmark=True):
+    """
+    Factor regressions of the portfolio's tickers, on the same returns compute_metrics uses.
+
+    Return rows stay on the benchmark's trading days; factor dates outside them are not used.
+
+    :param factor_paths: Factor CSV files (see load_factor_file).
+    :param prices: Optional PriceStore; daily returns instead of returns between purchase lots.
+    :param include_benchmark: Regress on the main benchmark as well, as the 'SPY' factor.
+    """
+    portfolio_data = prepare_portfolio_data(portfolio_df)
+    factors = build_factor_set(spy_data if include_benchmark else None, factor_paths, percent=percent)
+    tickers, codes, y, _, _, dates = return_rows(portfolio_data, spy_data, prices=prices, with_dates=True)
+    return factor_regression(tickers, codes, y, dates, factors)
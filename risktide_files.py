@@ -0,0 +1,43 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Every file RiskTide writes (summaries, caches, stores, reports, images) goes through atomic_write:
+# the data is written to a temporary file next to the target and swapped in with os.replace, so a
+# reader (the GUI, a cron job, a second process) sees the old file or the new one, never a partial
+# one. The temporary name is unique per process and thread, so concurrent writers of the same file
+# do not trip over each other; the last one to finish wins.
+
+
+@contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    """
+    Open a temporary file for writing and move it over path once the block completes.
+
+    :param mode: 'w' or 'wb'; kwargs are passed on to open (encoding, newline, ...).
+    :return: The open file; if the block raises, path is left untouched and the temporary file removed.
+    """
+    tmp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_text_atomically(path, text):
+    """Write text (e.g. CSV or JSON) to path as UTF-8, keeping its line endings as given."""
+    with atomic_write(path, 'w', newline='', encoding='utf-8') as f:
+        f.write(text)
+
+
+def write_frame_atomically(df, path, **to_csv_kwargs):
+    """Write a DataFrame to path as CSV (without the index unless asked for)."""
+    to_csv_kwargs.setdefault('index', False)
+    with atomic_write(path, 'w', newline='', encoding='utf-8') as f:
+        df.to_csv(f, **to_csv_kwargs)
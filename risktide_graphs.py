@@ -0,0 +1,258 @@
+import os
+import glob
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import risktide_trace
+from risktide_files import atomic_write
+
+# matplotlib and seaborn are imported inside the drawing functions so opening the GUI stays fast.
+# Figures are built with the object-oriented Figure API and the Agg canvas: they never enter the
+# pyplot figure registry, so nothing piles up between invocations and no Tk backend is involved.
+
+# Where rendered graphs are kept, one PNG per (summary hash, plot type); each workspace portfolio has its own
+graph_cache_dir = 'graph_cache'
+
+# Upper bound on matplotlib figures alive at the same time, across every caller
+max_live_figures = 2
+live_figures = threading.BoundedSemaphore(max_live_figures)
+
+# Resolution of the cached images
+graph_dpi = 100
+
+# Bump when the plots change so old images are not reused
+graphs_format = 1
+
+
+class NotEnoughData(ValueError):
+    """Raised when a plot cannot be drawn from the current summary."""
+
+
+def draw_sharpe_bar(fig, df):
+    import seaborn as sns
+
+    ax = fig.subplots()
+    sns.barplot(x="Stock Ticker", y="Sharpe Ratio", data=df, ax=ax)
+    ax.set_title("Sharpe Ratio by Stock")
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+
+def draw_drawdown_pie(fig, df):
+    import seaborn as sns
+
+    ax = fig.subplots()
+    ax.pie(
+        df["Max Drawdown"].abs(),
+        labels=df["Stock Ticker"],
+        autopct='%1.1f%%',
+        startangle=140,
+        colors=sns.color_palette("pastel"),
+    )
+    ax.set_title("Proportion of Max Drawdown")
+
+
+def draw_alpha_beta(fig, df):
+    import seaborn as sns
+
+    ax = fig.subplots()
+    sns.scatterplot(x="Alpha", y="Beta", data=df, hue="Stock Ticker", s=100, palette="viridis", ax=ax)
+    ax.set_title("Alpha vs. Beta")
+    fig.tight_layout()
+
+
+def draw_sharpe_box(fig, df):
+    import seaborn as sns
+
+    ax = fig.subplots()
+    sns.boxplot(y="Sharpe Ratio", data=df, color=sns.color_palette("Set2")[0], ax=ax)
+    ax.set_title("Distribution of Sharpe Ratios")
+    fig.tight_layout()
+
+
+def draw_cumulative_alpha(fig, df):
+    # Sample Trend - Simulate Cumulative Returns
+    cumulative_returns = (1 + df["Alpha"].fillna(0)).cumprod()
+    ax = fig.subplots()
+    ax.plot(df["Stock Ticker"], cumulative_returns, marker="o", linestyle="-", color="green")
+    ax.set_title("Cumulative Returns (Simulated using Alpha)")
+    ax.set_xlabel("Stock Ticker")
+    ax.set_ylabel("Cumulative Returns")
+    fig.tight_layout()
+
+
+def draw_correlation(fig, df):
+    import seaborn as sns
+
+    metrics = ["Alpha", "Beta", "Sharpe Ratio", "Sortino Ratio", "Omega Ratio"]
+    # Check if there is enough data for correlation matrix
+    if df.shape[0] <= 1:
+        raise NotEnoughData("Not enough rows in the dataset for meaningful correlation. Please add enough Portfolio data first or import.")
+    # Drop rows with NaN values in the selected columns
+    df_clean = df.dropna(subset=metrics)
+    if df_clean.shape[0] <= 1:
+        raise NotEnoughData("Not enough data for correlation matrix. Please add enough Portfolio data first or import.")
+
+    ax = fig.subplots()
+    sns.heatmap(df_clean[metrics].corr(), annot=True, cmap="coolwarm", fmt=".2f", cbar=True, ax=ax)
+    ax.set_title("Correlation Matrix of Metrics")
+    fig.tight_layout()
+
+
+def draw_skewness_hist(fig, df):
+    import seaborn as sns
+
+    ax = fig.subplots()
+    sns.histplot(df["Skewness"], kde=True, bins=10, color="purple", ax=ax)
+    ax.set_title("Distribution of Skewness")
+    fig.tight_layout()
+
+
+def draw_component_var(fig, df):
+    column = "Component VaR (95%)"
+    if column not in df.columns or df[column].isna().all():
+        raise NotEnoughData("No portfolio VaR breakdown yet. Position sizes ('Total Purchase Price') and return history are needed.")
+
+    import seaborn as sns
+
+    data = df.dropna(subset=[column]).sort_values(column)
+    ax = fig.subplots()
+    sns.barplot(x="Stock Ticker", y=column, data=data, color=sns.color_palette("Set2")[1], ax=ax)
+    # Component VaRs add up to the portfolio's parametric VaR
+    ax.set_title(f"Contribution to Portfolio VaR (95%): {data[column].sum():.2%} per day")
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+
+# Plot type -> (figure size in inches, drawing function), in display order
+plots = {
+    'sharpe_bar': ((8, 4), draw_sharpe_bar),
+    'drawdown_pie': ((6, 6), draw_drawdown_pie),
+    'alpha_beta': ((8, 5), draw_alpha_beta),
+    'sharpe_box': ((6, 4), draw_sharpe_box),
+    'cumulative_alpha': ((8, 4), draw_cumulative_alpha),
+    'correlation': ((8, 6), draw_correlation),
+    'skewness_hist': ((8, 4), draw_skewness_hist),
+    'component_var': ((8, 4), draw_component_var),
+}
+
+
+def image_size(plot):
+    """Pixel size (width, height) of a cached image, known before it is rendered."""
+    width, height = plots[plot][0]
+    return int(width * graph_dpi), int(height * graph_dpi)
+
+
+def summary_hash(df):
+    """Content hash of a metrics summary, i.e. of the stock_metrics_summary.csv it is saved as."""
+    text = df.to_csv(index=False)
+    return hashlib.blake2b(f'{graphs_format}\n{text}'.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def cached_path(digest, plot, cache_dir=graph_cache_dir):
+    return os.path.join(cache_dir, f'{digest}_{plot}.png')
+
+
+def build_figure(df, plot):
+    """
+    Draw one plot on a new Agg figure.
+
+    Callers must hold live_figures while the figure exists (see with_figure).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figsize, draw = plots[plot]
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    draw(fig, df)
+    return fig
+
+
+def with_figure(df, plot, func):
+    """Build a figure, hand it to func and release it, keeping at most max_live_figures alive."""
+    with live_figures:
+        fig = build_figure(df, plot)
+        try:
+            return func(fig)
+        finally:
+            fig.clear()
+
+
+def render_graph(df, plot, digest=None, cache_dir=graph_cache_dir):
+    """
+    Render a plot to its cached PNG unless it is already there.
+
+    :return: Path of the image.
+    :raises NotEnoughData: when the plot cannot be drawn from df.
+    """
+    path = cached_path(digest or summary_hash(df), plot, cache_dir)
+    if os.path.exists(path):
+        return path
+
+    with risktide_trace.span('graph_render', rows=len(df), plot=plot):
+        os.makedirs(cache_dir, exist_ok=True)
+        with atomic_write(path, 'wb') as f:
+            with_figure(df, plot, lambda fig: fig.savefig(f, format='png', dpi=graph_dpi))
+    return path
+
+
+def prune_graph_cache(keep_digest, cache_dir=graph_cache_dir):
+    """Delete images rendered from other summaries; returns the number of files removed."""
+    removed = 0
+    for path in glob.glob(os.path.join(cache_dir, '*.png')):
+        if not os.path.basename(path).startswith(f'{keep_digest}_'):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class GraphRenderer:
+    """
+    Renders graphs in a background thread.
+
+    A single worker renders one figure at a time (matplotlib is not thread-safe across
+    figures that share global state such as rcParams); requests for an image that is
+    already queued are not submitted twice.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='graphs')
+        self.pending = {}  # (cache_dir, digest, plot) -> Future
+        self.lock = threading.Lock()
+
+    def submit(self, df, digest, plot, callback, cache_dir=graph_cache_dir):
+        """
+        Render a plot in the background and call callback(plot, path, error) from the worker thread.
+
+        The GUI forwards the callback to the Tk thread itself.
+        """
+        key = (cache_dir, digest, plot)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.executor.submit(render_graph, df, plot, digest, cache_dir)
+                self.pending[key] = future
+
+        def done(future):
+            with self.lock:
+                self.pending.pop(key, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            callback(plot, None if error else future.result(), error)
+
+        future.add_done_callback(done)
+        return future
+
+    def run(self, fn, *args):
+        """
+        Run other matplotlib work (e.g. risktide_report.write_report) on the render thread, after
+        the graphs already queued, so it never draws at the same time as a graph.
+
+        :return: The Future of fn(*args).
+        """
+        return self.executor.submit(fn, *args)
@@ -0,0 +1,295 @@
+import os
+import io
+import glob
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+import risktide_trace
+from risktide_files import write_text_atomically
+
+# Only the standard library is imported here so the freshness check stays fast. pandas/numpy,
+# the benchmark cache and the Kaggle client are imported inside the functions that fetch data.
+
+# Define the dataset to download (the dataset URL can be found on Kaggle)
+dataset = 'gkitchen/s-and-p-500-spy'
+
+# Define the download location (relative or absolute path)
+download_location = './SPY_data'
+
+# Define the path for the last run timestamp file
+last_run_file = 'last_run.txt'
+
+# Define the path for the spy_data.csv file
+spy_data_file = 'spy_data.csv'
+
+# How old the benchmark may get before it is refreshed
+default_max_age = timedelta(days=30)
+
+# Number of already stored rows re-fetched to validate that the source still agrees with the store
+overlap_rows = 5
+
+
+class BenchmarkSource(ABC):
+    """
+    Where benchmark rows come from.
+
+    Subclasses implement fetch; one that does not cannot be instantiated.
+    """
+
+    name = 'source'
+
+    @abstractmethod
+    def fetch(self, since=None):
+        """
+        Rows dated on or after since (all rows when since is None), sorted by date.
+
+        :return: DataFrame of raw CSV text (dtype=str) with at least 'Date' and 'Close'.
+        """
+
+    @staticmethod
+    def select_since(frame, since):
+        """Sort raw rows by date and keep those dated on or after since."""
+        import numpy as np
+        import pandas as pd
+
+        dates = pd.to_datetime(frame['Date'])
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        frame = frame.iloc[order].reset_index(drop=True)
+        dates = dates.iloc[order].reset_index(drop=True)
+        if since is not None:
+            frame = frame[dates >= pd.Timestamp(since)].reset_index(drop=True)
+        return frame
+
+
+class LocalSource(BenchmarkSource):
+    """Reads benchmark rows from a CSV file, or every CSV in a directory (offline testing, manual drops)."""
+
+    name = 'local'
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, since=None):
+        import pandas as pd
+
+        if os.path.isdir(self.path):
+            files = sorted(glob.glob(os.path.join(self.path, '*.csv')))
+        else:
+            files = [self.path]
+        if not files:
+            raise FileNotFoundError(f"No CSV files found in {self.path}")
+
+        frame = pd.concat([pd.read_csv(f, dtype=str) for f in files], ignore_index=True)
+        # Later files win when the same date appears twice
+        frame = frame.drop_duplicates(subset='Date', keep='last')
+        return self.select_since(frame, since)
+
+
+class KaggleSource(BenchmarkSource):
+    """
+    Reads benchmark rows from the Kaggle dataset.
+
+    Kaggle only serves whole files, so the dataset zip is kept in download_location and
+    downloaded again only when the remote copy is newer; the delta is cut locally.
+    The Kaggle client is imported and authenticated on the first fetch, not on construction.
+    """
+
+    name = 'kaggle'
+
+    def __init__(self, dataset=dataset, download_location=download_location):
+        self.dataset = dataset
+        self.download_location = download_location
+        self.api = None
+
+    def get_api(self):
+        """Import and authenticate the Kaggle client once."""
+        if self.api is None:
+            # Set the Kaggle API credentials (you only need to do this once)
+            os.environ.setdefault('KAGGLE_CONFIG_DIR', os.path.expanduser("~/.kaggle"))
+            from kaggle.api.kaggle_api_extended import KaggleApi
+
+            api = KaggleApi()
+            api.authenticate()
+            self.api = api
+        return self.api
+
+    def fetch(self, since=None):
+        import pandas as pd
+
+        api = self.get_api()
+        os.makedirs(self.download_location, exist_ok=True)
+
+        print(f"Checking {self.dataset} on Kaggle...")
+        # force=False skips the download when the local zip is already up to date
+        api.dataset_download_files(self.dataset, path=self.download_location, unzip=False, force=False)
+
+        archives = glob.glob(os.path.join(self.download_location, '*.zip'))
+        if not archives:
+            raise FileNotFoundError(f"No dataset archive found in {self.download_location}")
+        archive = max(archives, key=os.path.getmtime)
+
+        with zipfile.ZipFile(archive) as zf:
+            members = [m for m in zf.namelist() if m.endswith('.csv')]
+            if not members:
+                raise FileNotFoundError(f"No CSV file found in {archive}")
+            with zf.open(members[0]) as f:
+                frame = pd.read_csv(io.TextIOWrapper(f, encoding='utf-8'), dtype=str)
+        return self.select_since(frame, since)
+
+
+def read_last_run(path=last_run_file):
+    """Return the time of the last refresh, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return datetime.strptime(f.read().strip(), '%Y-%m-%d %H:%M:%S')
+
+
+# Function to check if the script should download the dataset
+def should_download(max_age=default_max_age, csv_path=spy_data_file, last_run_path=last_run_file):
+    # Check if the spy_data.csv file exists
+    if not os.path.exists(csv_path):
+        print(f"{csv_path} not found. Downloading dataset...")
+        return True
+
+    last_run_time = read_last_run(last_run_path)
+    if last_run_time is None:
+        print("No last run timestamp found. Downloading dataset...")
+        return True
+
+    if datetime.now() - last_run_time > max_age:
+        print(f"The benchmark is older than {max_age.total_seconds() / 86400:g} days. Refreshing dataset...")
+        return True
+
+    print(f"Benchmark refreshed less than {max_age.total_seconds() / 86400:g} days ago. Skipping download.")
+    return False
+
+
+# Function to record the current time as the last run time
+def record_last_run_time(path=last_run_file):
+    with open(path, 'w') as f:
+        f.write(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def fetch_rows(source, since=None):
+    """Fetch benchmark rows from source, timed as the benchmark_download stage."""
+    with risktide_trace.span('benchmark_download', source=source.name, since=since) as span:
+        frame = source.fetch(since=since)
+        span.rows = len(frame)
+    return frame
+
+
+def replace_store(frame, csv_path=spy_data_file):
+    """Replace the local benchmark with a full history from the source."""
+    from risktide_benchmark import build_benchmark_cache
+
+    write_text_atomically(csv_path, frame.to_csv(index=False))
+    build_benchmark_cache(csv_path)
+    print(f"Benchmark replaced with {len(frame)} rows from the source")
+    return len(frame)
+
+
+def refresh_benchmark(source, csv_path=spy_data_file):
+    """
+    Bring the local benchmark up to date by appending only rows newer than the last stored date.
+
+    The last overlap_rows stored rows are fetched again and their Close values compared with
+    the store. When they disagree (for example the source was re-adjusted) or the column
+    layout changed, the whole history is reloaded instead.
+
+    :return: Number of rows added (or written, on a full reload).
+    """
+    import numpy as np
+    import pandas as pd
+    from risktide_benchmark import build_benchmark_cache, load_benchmark
+
+    if not os.path.exists(csv_path):
+        return replace_store(fetch_rows(source), csv_path)
+
+    stored = load_benchmark(csv_path)
+    if len(stored) == 0:
+        return replace_store(fetch_rows(source), csv_path)
+
+    # Copy the tail out of the memory-mapped cache so it can be rebuilt below
+    overlap_start = max(len(stored) - overlap_rows, 0)
+    stored_dates = np.array(stored.dates[overlap_start:])
+    stored_close = np.array(stored.close[overlap_start:])
+    del stored
+    since = pd.Timestamp(stored_dates[0])
+    last_date = pd.Timestamp(stored_dates[-1])
+
+    fetched = fetch_rows(source, since=since)
+    fetched_dates = pd.to_datetime(fetched['Date']).to_numpy(dtype='datetime64[ns]')
+
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    if list(fetched.columns) != header:
+        print("Source columns differ from the stored benchmark. Reloading full history...")
+        return replace_store(fetch_rows(source), csv_path)
+
+    # Validate the overlap: every re-fetched stored date must still have the same close
+    pos = np.searchsorted(fetched_dates, stored_dates)
+    found = (pos < len(fetched_dates)) & (fetched_dates[np.minimum(pos, len(fetched_dates) - 1)] == stored_dates) if len(fetched_dates) else np.zeros(len(stored_dates), dtype=bool)
+    if not found.all() or not np.allclose(fetched['Close'].astype(float).to_numpy()[pos], stored_close, rtol=1e-6, equal_nan=True):
+        print("Source no longer matches the stored benchmark. Reloading full history...")
+        return replace_store(fetch_rows(source), csv_path)
+
+    new_rows = fetched[fetched_dates > last_date.to_datetime64()]
+    if new_rows.empty:
+        print("Benchmark already up to date.")
+        return 0
+
+    # Append atomically: copy the stored rows plus the delta to a temporary file, then swap it in
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        existing = f.read()
+    if existing and not existing.endswith('\n'):
+        existing += '\n'
+    write_text_atomically(csv_path, existing + new_rows.to_csv(index=False, header=False, lineterminator='\n'))
+    build_benchmark_cache(csv_path)
+    print(f"Appended {len(new_rows)} new benchmark rows (up to {new_rows['Date'].iloc[-1]})")
+    return len(new_rows)
+
+
+def source_from_environment():
+    """Pick the data source: RISKTIDE_BENCHMARK_SOURCE names a local file/directory, otherwise Kaggle."""
+    local_path = os.environ.get('RISKTIDE_BENCHMARK_SOURCE')
+    if local_path:
+        return LocalSource(local_path)
+    return KaggleSource()
+
+
+def max_age_from_environment():
+    """Freshness window in days from RISKTIDE_REFRESH_DAYS (fractions allowed), default 30."""
+    days = os.environ.get('RISKTIDE_REFRESH_DAYS')
+    if not days:
+        return default_max_age
+    return timedelta(days=float(days))
+
+
+# Main function
+def main(source=None, max_age=None, csv_path=spy_data_file, last_run_path=last_run_file, force=False):
+    """
+    Refresh the benchmark when it is stale (or always, with force).
+
+    :return: Rows added by the refresh, 0 when the benchmark was already fresh, None when the refresh failed.
+    """
+    start = time.perf_counter()
+
+    # Check if the dataset needs to be refreshed (standard library only, no credentials needed)
+    with risktide_trace.span('benchmark_freshness'):
+        stale = force or should_download(max_age or max_age_from_environment(), csv_path, last_run_path)
+    if not stale:
+        print(f"Benchmark freshness check took {(time.perf_counter() - start) * 1000:.1f} ms")
+        return 0
+
+    try:
+        with risktide_trace.span('benchmark_refresh') as span:
+            rows = span.rows = refresh_benchmark(source or source_from_environment(), csv_path)
+    except Exception as e:
+        print(f"Error refreshing benchmark: {e}")
+        return None
+
+    # Record the current time as the last run time, only after a successful refresh
+    record_last_run_time(last_run_path)
+    print(f"Benchmark refresh took {time.perf_counter() - start:.1f} s")
+    return rows
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+from risktide_files import write_frame_atomically
+
+# Default JStock export read by the "Jstock Import" button
+jstock_file = "Buy Portfolio Management.csv"
+
+# Where rows that could not be imported are reported
+rejections_file = "import_rejections.csv"
+
+# JStock columns needed for a lot
+required_columns = ["Code", "Date", "Units", "Purchase Price"]
+
+
+def parse_dates(values):
+    """
+    Parse a column of dates in one vectorized call.
+
+    The format is inferred from the data; values that do not fit it (exports mixing
+    formats) are retried one by one, and anything still unparseable becomes NaT.
+    """
+    dates = pd.to_datetime(values, errors='coerce')
+    failed = dates.isna() & values.notna()
+    if failed.any():
+        try:
+            dates[failed] = pd.to_datetime(values[failed], errors='coerce', format='mixed')
+        except (TypeError, ValueError):
+            dates[failed] = [pd.to_datetime(value, errors='coerce') for value in values[failed]]
+    return dates
+
+
+def format_dates(dates):
+    """Format datetimes as DD-MM-YYYY by rearranging ISO characters instead of a per-row strftime."""
+    iso = np.datetime_as_string(dates.to_numpy(dtype='datetime64[D]'), unit='D').astype('U10')
+    chars = iso.view('U1').reshape(-1, 10)
+    # YYYY-MM-DD -> DD-MM-YYYY
+    return chars[:, [8, 9, 7, 5, 6, 4, 0, 1, 2, 3]].copy().view('U10').ravel()
+
+
+def convert_chunk(chunk):
+    """
+    Turn a chunk of JStock rows into portfolio lots.
+
+    :return: (lots, rejected) where lots has the portfolio columns and rejected holds the
+             original rows plus 'Line' and 'Reason' columns.
+    """
+    dates = parse_dates(chunk["Date"])
+    units = pd.to_numeric(chunk["Units"], errors='coerce')
+    prices = pd.to_numeric(chunk["Purchase Price"], errors='coerce')
+    codes = chunk["Code"]
+
+    reasons = pd.Series('', index=chunk.index)
+    reasons[prices.isna()] = 'invalid purchase price'
+    reasons[units.isna()] = 'invalid units'
+    reasons[dates.isna()] = 'invalid date'
+    reasons[codes.isna() | (codes.astype(str).str.strip() == '')] = 'missing code'
+    valid = reasons == ''
+
+    lots = pd.DataFrame({
+        "Stock Ticker": codes[valid].astype(str),
+        "Date Purchased": format_dates(dates[valid]),  # Convert to DD-MM-YYYY
+        "Units Purchased": units[valid],
+        "Purchase Price": prices[valid],
+        "Total Purchase Price": units[valid] * prices[valid]
+    })
+    # Line numbers in the CSV file (the header is line 1; read_csv keeps counting across chunks)
+    rejected = chunk[~valid].assign(Line=chunk.index[~valid] + 2, Reason=reasons[~valid])
+    return lots, rejected
+
+
+def read_jstock_csv(path=jstock_file, chunksize=50000):
+    """
+    Stream a JStock "Buy Portfolio Management.csv" export in chunks.
+
+    Yields (lots, rejected) per chunk, see convert_chunk.
+
+    :raises ValueError: when a required column is missing.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [col for col in required_columns if col not in header]
+    if missing:
+        raise ValueError(f"Missing required columns in CSV: {', '.join(missing)}")
+
+    for chunk in pd.read_csv(path, usecols=required_columns, dtype=str, chunksize=chunksize):
+        yield convert_chunk(chunk)
+
+
+def write_rejections(rejected_chunks, path=rejections_file):
+    """
+    Write the rejected rows to a CSV report; returns the number of rows written.
+
+    A clean import deletes the report of an earlier one, so the file only ever describes the last import.
+    """
+    rejected = [chunk for chunk in rejected_chunks if not chunk.empty]
+    if not rejected:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return 0
+    report = pd.concat(rejected)
+    write_frame_atomically(report, path)
+    return len(report)
@@ -0,0 +1,605 @@
+import pandas as pd
+import numpy as np
+from scipy.stats import kurtosis, skew
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from risktide_benchmark import Benchmark, load_benchmark
+from risktide_cache import MetricsCache, lot_fingerprints, benchmark_version
+from risktide_store import PortfolioStore, portfolio_db_file
+from risktide_prices import price_returns
+import risktide_trace
+from risktide_files import write_frame_atomically
+
+# Default file locations used by the standalone script and the GUI
+spy_data_file = 'spy_data.csv'
+portfolio_data_file = 'portfolio_data.csv'
+summary_file = 'stock_metrics_summary.csv'
+
+# Available compute_metrics engines
+engines = ('vectorized', 'threads', 'processes')
+
+# Tickers per task for the 'processes' engine
+default_chunksize = 64
+
+# Column order of stock_metrics_summary.csv
+summary_columns = [
+    'Stock Ticker', 'Alpha', 'Beta', 'R²', 'Sharpe Ratio', 'Sortino Ratio',
+    'Treynor Ratio', 'Omega Ratio', 'Kurtosis', 'Skewness', 'Max Drawdown', 'VaR (95%)'
+]
+
+
+def load_spy_data(path=spy_data_file):
+    """Load the SPY benchmark (through its binary cache) as a frame with the daily 'SPY Return' column."""
+    with risktide_trace.span('csv_load', path=path) as span:
+        spy_data = load_benchmark(path).to_frame()
+        span.rows = len(spy_data)
+    return spy_data
+
+
+def open_benchmark(path=spy_data_file):
+    """Open the SPY benchmark through its binary cache, timed as the benchmark_load stage."""
+    with risktide_trace.span('benchmark_load', path=path) as span:
+        spy_data = load_benchmark(path)
+        span.rows = len(spy_data)
+    return spy_data
+
+
+def spy_frame(spy_data):
+    """Return spy_data as a DataFrame, converting a cached Benchmark when needed."""
+    if isinstance(spy_data, Benchmark):
+        return spy_data.to_frame()
+    return spy_data
+
+
+def spy_arrays(spy_data):
+    """Return (dates, returns) sorted by date, without copying when spy_data is a cached Benchmark."""
+    if isinstance(spy_data, Benchmark):
+        return spy_data.dates, spy_data.returns
+
+    spy_dates = spy_data['Date'].to_numpy(dtype='datetime64[ns]')
+    spy_return = spy_data['SPY Return'].to_numpy(dtype=float)
+    order = np.argsort(spy_dates, kind='stable')
+    return spy_dates[order], spy_return[order]
+
+
+def load_portfolio_data(path=portfolio_data_file):
+    """Load the portfolio CSV written by the GUI."""
+    with risktide_trace.span('csv_load', path=path) as span:
+        portfolio_data = prepare_portfolio_data(pd.read_csv(path))
+        span.rows = len(portfolio_data)
+    return portfolio_data
+
+
+def prepare_portfolio_data(portfolio_data):
+    """Parse 'Date Purchased' (DD-MM-YYYY) and prices, dropping rows with invalid dates."""
+    portfolio_data = portfolio_data.copy()
+
+    # Specify the correct date format for 'Date Purchased'
+    portfolio_data['Date Purchased'] = pd.to_datetime(portfolio_data['Date Purchased'], format='%d-%m-%Y', errors='coerce')
+
+    # Values coming straight from the Treeview may still be strings
+    portfolio_data['Purchase Price'] = pd.to_numeric(portfolio_data['Purchase Price'], errors='coerce')
+
+    # Drop rows with invalid 'Date Purchased'
+    return portfolio_data.dropna(subset=['Date Purchased'])
+
+
+def clean_all_temp_files(temp_file_pattern="*_data_*.csv"):
+    """
+    Removes all files matching the specified pattern.
+
+    :param temp_file_pattern: The pattern used to identify files for deletion.
+    """
+    temp_files_removed = 0
+
+    for file_name in os.listdir('.'):
+        # Check if the file matches the pattern
+        if "_data_" in file_name and file_name.endswith('.csv'):
+            try:
+                # Delete the file
+                os.remove(file_name)
+                temp_files_removed += 1
+                print(f"Deleted temporary file: {file_name}")
+            except Exception as e:
+                print(f"Error deleting file {file_name}: {e}")
+
+    if temp_files_removed == 0:
+        print("No temporary files found.")
+    else:
+        print(f"Total temporary files removed: {temp_files_removed}")
+
+
+# Function to process each stock independently
+def process_stock(stock, portfolio_data, spy_data):
+    """Compute the summary metrics for one ticker, or None when there is not enough data."""
+    # Only the per-ticker reference path needs sklearn, so import it on first use
+    from sklearn.linear_model import LinearRegression
+
+    try:
+        # Filter matching rows from the portfolio data
+        stock_rows = portfolio_data[portfolio_data['Stock Ticker'] == stock]
+        if stock_rows.empty:
+            return None
+
+        with risktide_trace.span('merge', detailed=True, ticker=stock) as span:
+            stock_data = stock_rows.copy()
+            stock_data['Date'] = pd.to_datetime(stock_data['Date Purchased'])
+            stock_data['Stock Return'] = stock_data['Purchase Price'].pct_change()
+
+            # Merge with SPY benchmark data
+            merged_data = pd.merge(
+                stock_data[['Date', 'Stock Return']],
+                spy_data[['Date', 'SPY Return']],
+                on='Date',
+                how='inner'
+            )
+            span.rows = len(merged_data)
+
+        # Check for sufficient data after merging
+        if merged_data.empty or len(merged_data) < 2:
+            print(f"Insufficient data for stock: {stock}. Skipping.")
+            return None
+
+        # Drop rows with missing return data
+        merged_data = merged_data.dropna(subset=['Stock Return', 'SPY Return'])
+
+        # Calculate metrics
+        daily_stock_return = merged_data['Stock Return']
+        daily_spy_return = merged_data['SPY Return']
+
+        # Linear regression for Alpha & Beta
+        with risktide_trace.span('regression', rows=len(merged_data), detailed=True, ticker=stock):
+            X = daily_spy_return.values.reshape(-1, 1)
+            y = daily_stock_return.values
+            reg = LinearRegression().fit(X, y)
+            beta = reg.coef_[0]
+            alpha = reg.intercept_
+            r_squared = reg.score(X, y)
+
+        # Sharpe Ratio
+        sharpe_ratio = daily_stock_return.mean() / daily_stock_return.std()
+
+        # Sortino Ratio
+        downside_std = daily_stock_return[daily_stock_return < 0].std()
+        sortino_ratio = daily_stock_return.mean() / downside_std if downside_std > 0 else np.nan
+
+        # Treynor Ratio
+        treynor_ratio = daily_stock_return.mean() / beta if beta != 0 else np.nan
+
+        # Omega Ratio
+        threshold = 0
+        positive_returns = daily_stock_return[daily_stock_return > threshold].sum()
+        negative_returns = -daily_stock_return[daily_stock_return < threshold].sum()
+        omega_ratio = positive_returns / negative_returns if negative_returns > 0 else np.nan
+
+        # Kurtosis and Skewness
+        kurt = kurtosis(daily_stock_return, fisher=True)
+        skewness = skew(daily_stock_return)
+
+        # Max Drawdown
+        cumulative_return = (1 + daily_stock_return).cumprod()
+        peak = cumulative_return.cummax()
+        drawdown = (cumulative_return - peak) / peak
+        max_drawdown = drawdown.min()
+
+        # Value at Risk (VaR) at 95%
+        var_95 = np.percentile(daily_stock_return, 5)
+
+        # Return metrics for the stock
+        return {
+            'Stock Ticker': stock,
+            'Alpha': alpha,
+            'Beta': beta,
+            'R²': r_squared,
+            'Sharpe Ratio': sharpe_ratio,
+            'Sortino Ratio': sortino_ratio,
+            'Treynor Ratio': treynor_ratio,
+            'Omega Ratio': omega_ratio,
+            'Kurtosis': kurt,
+            'Skewness': skewness,
+            'Max Drawdown': max_drawdown,
+            'VaR (95%)': var_95
+        }
+
+    except Exception as e:
+        print(f"Error processing stock {stock}: {e}. Skipping.")
+        return None
+
+
+def align_returns(portfolio_data, spy_data, with_dates=False):
+    """
+    Build the per-lot return table for all tickers at once.
+
+    Mirrors what process_stock does per ticker: 'Purchase Price' returns across each
+    ticker's lots in portfolio order, inner-joined on date with the SPY returns.
+
+    :return: (tickers, codes, stock_returns, spy_returns, counts) where codes index into
+             tickers, the return arrays are the rows left after dropping missing values and
+             counts holds the number of rows per ticker before that drop. With with_dates,
+             the dates of the rows (datetime64[ns]) are appended.
+    """
+    with risktide_trace.span('merge', rows=len(portfolio_data)):
+        codes, tickers = pd.factorize(portfolio_data['Stock Ticker'])
+        stock_return = portfolio_data['Purchase Price'].groupby(codes).pct_change().to_numpy(dtype=float)
+
+        # Look the purchase dates up in the sorted SPY dates instead of merging per ticker
+        spy_dates, spy_return = spy_arrays(spy_data)
+
+        lot_dates = portfolio_data['Date Purchased'].to_numpy(dtype='datetime64[ns]')
+        pos = np.searchsorted(spy_dates, lot_dates)
+        pos_clipped = np.minimum(pos, len(spy_dates) - 1)
+        matched = (pos < len(spy_dates)) & (spy_dates[pos_clipped] == lot_dates) if len(spy_dates) else np.zeros(len(lot_dates), dtype=bool)
+
+        # Lots without a ticker never form a group
+        matched &= codes >= 0
+
+        codes = codes[matched]
+        stock_return = stock_return[matched]
+        benchmark_return = spy_return[pos_clipped[matched]]
+        counts = np.bincount(codes, minlength=len(tickers))
+
+        valid = ~(np.isnan(stock_return) | np.isnan(benchmark_return))
+    if with_dates:
+        return tickers, codes[valid], stock_return[valid], benchmark_return[valid], counts, lot_dates[matched][valid]
+    return tickers, codes[valid], stock_return[valid], benchmark_return[valid], counts
+
+
+def compute_metrics_vectorized(portfolio_data, spy_data):
+    """Compute every metric for every ticker in one grouped pass (no per-ticker Python loop)."""
+    return summarize_returns(*align_returns(portfolio_data, spy_data))
+
+
+def return_rows(portfolio_data, spy_data, prices=None, with_dates=False):
+    """
+    Aligned return rows of every ticker, in the layout of align_returns.
+
+    :param prices: Optional PriceStore; each ticker's daily closes instead of its lot prices.
+    """
+    if prices is None:
+        return align_returns(portfolio_data, spy_data, with_dates=with_dates)
+    spy_dates, spy_return = spy_arrays(spy_data)
+    tickers = pd.unique(portfolio_data['Stock Ticker'].dropna())
+    return price_returns(prices, tickers, spy_dates, spy_return, with_dates=with_dates)
+
+
+def compute_metrics_prices(portfolio_data, spy_data, prices):
+    """Vectorized engine on each ticker's daily closes from a PriceStore instead of its lot prices."""
+    return summarize_returns(*return_rows(portfolio_data, spy_data, prices=prices))
+
+
+def summarize_returns(tickers, codes, y, x, counts):
+    """
+    The metrics kernel: every summary metric for every ticker from aligned return rows.
+
+    :param codes: Ticker index of each row; rows of a ticker are in chronological order.
+    :param y: Stock returns.
+    :param x: Benchmark returns on the same dates.
+    :param counts: Rows per ticker before missing values were dropped (tickers need two).
+    """
+    n = np.bincount(codes, minlength=len(tickers))
+
+    # Same rule as process_stock: at least two merged rows, and something left after dropna
+    keep = (counts >= 2) & (n > 0)
+
+    summary_df = pd.DataFrame({'Stock Ticker': tickers, **metric_arrays(codes, y, x, len(tickers))}, columns=summary_columns)
+
+    for stock in tickers[~keep]:
+        print(f"Insufficient data for stock: {stock}. Skipping.")
+
+    return summary_df[keep].reset_index(drop=True)
+
+
+def metric_arrays(codes, y, x, k):
+    """
+    Every summary metric of k groups of return rows (a group is a ticker, or a resample of one).
+
+    :return: dict column name -> array of k values, NaN where a metric is undefined.
+    """
+    n = np.bincount(codes, minlength=k).astype(float)
+    rows = len(codes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Closed-form OLS of stock returns on SPY returns
+        with risktide_trace.span('regression', rows=rows):
+            x_mean = np.bincount(codes, weights=x, minlength=k) / n
+            y_mean = np.bincount(codes, weights=y, minlength=k) / n
+            dx = x - x_mean[codes]
+            dy = y - y_mean[codes]
+            sxx = np.bincount(codes, weights=dx * dx, minlength=k)
+            sxy = np.bincount(codes, weights=dx * dy, minlength=k)
+            syy = np.bincount(codes, weights=dy * dy, minlength=k)
+
+            beta = np.where(sxx > 0, sxy / sxx, 0.0)
+            alpha = y_mean - beta * x_mean
+            residual = y - alpha[codes] - beta[codes] * x
+            ss_res = np.bincount(codes, weights=residual * residual, minlength=k)
+            r_squared = np.where(syy > 0, 1 - ss_res / syy, np.where(ss_res == 0, 1.0, 0.0))
+            r_squared = np.where(n >= 2, r_squared, np.nan)
+
+        with risktide_trace.span('ratios', rows=rows):
+            # Sharpe Ratio (sample std, ddof=1)
+            std = np.sqrt(syy / (n - 1))
+            std = np.where(n >= 2, std, np.nan)
+            sharpe_ratio = y_mean / std
+
+            # Sortino Ratio
+            negative = y < 0
+            neg_codes = codes[negative]
+            neg_n = np.bincount(neg_codes, minlength=k).astype(float)
+            neg_mean = np.bincount(neg_codes, weights=y[negative], minlength=k) / neg_n
+            neg_dev = y[negative] - neg_mean[neg_codes]
+            downside_std = np.sqrt(np.bincount(neg_codes, weights=neg_dev * neg_dev, minlength=k) / (neg_n - 1))
+            downside_std = np.where(neg_n >= 2, downside_std, np.nan)
+            sortino_ratio = np.where(downside_std > 0, y_mean / downside_std, np.nan)
+
+            # Treynor Ratio
+            treynor_ratio = np.where(beta != 0, y_mean / beta, np.nan)
+
+            # Omega Ratio
+            positive_returns = np.bincount(codes, weights=np.where(y > 0, y, 0.0), minlength=k)
+            negative_returns = -np.bincount(codes, weights=np.where(y < 0, y, 0.0), minlength=k)
+            omega_ratio = np.where(negative_returns > 0, positive_returns / negative_returns, np.nan)
+
+        # Kurtosis and Skewness (biased, Fisher), NaN for constant returns like scipy
+        with risktide_trace.span('moments', rows=rows):
+            m2 = syy / n
+            dy2 = dy * dy  # products instead of float powers, which are several times slower
+            m3 = np.bincount(codes, weights=dy2 * dy, minlength=k) / n
+            m4 = np.bincount(codes, weights=dy2 * dy2, minlength=k) / n
+            constant = m2 <= (np.finfo(float).resolution * y_mean) ** 2
+            kurt = np.where(constant, np.nan, m4 / m2 ** 2 - 3.0)
+            skewness = np.where(constant, np.nan, m3 / m2 ** 1.5)
+
+    # Max Drawdown: segmented cumprod/cummax over each ticker's rows in order
+    with risktide_trace.span('drawdown', rows=rows):
+        cumulative = pd.Series(1 + y).groupby(codes).cumprod()
+        peak = cumulative.groupby(codes).cummax()
+        drawdown = ((cumulative - peak) / peak).to_numpy()
+        max_drawdown = np.full(k, np.nan)
+        np.fmin.at(max_drawdown, codes, drawdown)
+
+    # Value at Risk (VaR) at 95%: linear-interpolated 5% quantile on each sorted segment
+    with risktide_trace.span('var', rows=rows):
+        order = np.lexsort((y, codes))
+        sorted_y = y[order]
+        starts = np.concatenate(([0], np.cumsum(n)[:-1])).astype(int)
+        rank = 0.05 * np.maximum(n - 1, 0)
+        lower = np.floor(rank).astype(int)
+        upper = np.minimum(lower + 1, np.maximum(n.astype(int) - 1, 0))
+        fraction = rank - lower
+        var_95 = np.full(k, np.nan)
+        has_rows = n > 0
+        lo_values = sorted_y[(starts + lower)[has_rows]]
+        hi_values = sorted_y[(starts + upper)[has_rows]]
+        var_95[has_rows] = lo_values + (hi_values - lo_values) * fraction[has_rows]
+
+    return {
+        'Alpha': alpha,
+        'Beta': beta,
+        'R²': r_squared,
+        'Sharpe Ratio': sharpe_ratio,
+        'Sortino Ratio': sortino_ratio,
+        'Treynor Ratio': treynor_ratio,
+        'Omega Ratio': omega_ratio,
+        'Kurtosis': kurt,
+        'Skewness': skewness,
+        'Max Drawdown': max_drawdown,
+        'VaR (95%)': var_95
+    }
+
+
+def compute_metrics_threaded(portfolio_data, spy_data, max_workers=None):
+    """Per-ticker reference engine: process_stock for each ticker on a thread pool."""
+    summary_metrics = []
+
+    # Use ThreadPoolExecutor to parallelize the processing of each stock
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_stock, stock, portfolio_data, spy_data) for stock in portfolio_data['Stock Ticker'].unique()]
+
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                summary_metrics.append(result)
+
+    # Convert metrics list to DataFrame
+    return pd.DataFrame(summary_metrics, columns=summary_columns)
+
+
+def publish_benchmark(spy_data, directory):
+    """
+    Write the SPY dates (int64 ns) and returns as .npy files that worker processes can memory-map.
+
+    A Benchmark opened from the binary cache is already laid out that way, so its files are reused.
+
+    :return: (dates_path, returns_path)
+    """
+    if isinstance(spy_data, Benchmark) and spy_data.paths:
+        return spy_data.paths['dates'], spy_data.paths['returns']
+
+    dates_path = os.path.join(directory, 'spy_dates.npy')
+    returns_path = os.path.join(directory, 'spy_returns.npy')
+    np.save(dates_path, spy_data['Date'].to_numpy(dtype='datetime64[ns]').view('int64'))
+    np.save(returns_path, spy_data['SPY Return'].to_numpy(dtype=float))
+    return dates_path, returns_path
+
+
+# Benchmark frame of the current worker process, set once by init_worker
+worker_spy_data = None
+
+
+def init_worker(dates_path, returns_path):
+    """Process pool initializer: open the published benchmark arrays read-only."""
+    global worker_spy_data
+    # Several processes rotating one log would lose lines; the parent's metrics span covers the pool
+    risktide_trace.enable(False)
+    dates = np.load(dates_path, mmap_mode='r')
+    returns = np.load(returns_path, mmap_mode='r')
+    worker_spy_data = pd.DataFrame({
+        'Date': pd.to_datetime(np.asarray(dates).view('datetime64[ns]')),
+        'SPY Return': np.asarray(returns)
+    })
+
+
+def process_stock_batch(batch):
+    """Process pool task: run process_stock for each ticker of (tickers, lots)."""
+    tickers, lots = batch
+    return [process_stock(stock, lots, worker_spy_data) for stock in tickers]
+
+
+def iter_metrics_processes(portfolio_data, spy_data, max_workers=None, chunksize=default_chunksize):
+    """
+    Spread tickers over a process pool and yield their metrics dicts in portfolio order.
+
+    The benchmark is published once to memory-mapped files instead of being pickled to
+    every worker; each task only carries the lots of its own batch of tickers.
+
+    :param max_workers: Number of worker processes, None for the executor default.
+    :param chunksize: Number of tickers per task.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+
+    groups = [(stock, lots) for stock, lots in portfolio_data.groupby('Stock Ticker', sort=False)]
+    batches = []
+    for start in range(0, len(groups), chunksize):
+        chunk = groups[start:start + chunksize]
+        batches.append(([stock for stock, _ in chunk], pd.concat([lots for _, lots in chunk])))
+
+    if not batches:
+        return
+
+    directory = tempfile.mkdtemp(prefix='risktide_')
+    try:
+        dates_path, returns_path = publish_benchmark(spy_data, directory)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(dates_path, returns_path)) as executor:
+            # map() hands results back in submission order as they complete
+            for results in executor.map(process_stock_batch, batches):
+                for result in results:
+                    if result:
+                        yield result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def compute_metrics_processes(portfolio_data, spy_data, max_workers=None, chunksize=default_chunksize):
+    """Per-ticker engine on a process pool, for portfolios too irregular to vectorize."""
+    summary_metrics = list(iter_metrics_processes(portfolio_data, spy_data, max_workers=max_workers, chunksize=chunksize))
+    return pd.DataFrame(summary_metrics, columns=summary_columns)
+
+
+def run_engine(portfolio_data, spy_data, engine='vectorized', max_workers=None, chunksize=default_chunksize, prices=None):
+    """Dispatch a prepared portfolio to one of the metrics engines."""
+    if prices is not None:
+        return compute_metrics_prices(portfolio_data, spy_data, prices)
+    if engine == 'vectorized':
+        return compute_metrics_vectorized(portfolio_data, spy_data)
+    if engine == 'threads':
+        return compute_metrics_threaded(portfolio_data, spy_frame(spy_data), max_workers=max_workers)
+    if engine == 'processes':
+        return compute_metrics_processes(portfolio_data, spy_data, max_workers=max_workers, chunksize=chunksize)
+    raise ValueError(f"Unknown metrics engine '{engine}', expected one of {engines}")
+
+
+def compute_metrics_cached(portfolio_data, spy_data, cache, **engine_options):
+    """
+    Recompute only the tickers whose lots changed since they were cached, and reuse the rest.
+
+    :param cache: MetricsCache, updated in place (call cache.save() to persist it).
+    """
+    cache.use_benchmark(benchmark_version(spy_data))
+    prices = engine_options.get('prices')
+    if prices is not None:
+        # Metrics follow the stored price history, not the lots
+        fingerprints = {stock: f"prices:{prices.version(stock)}" for stock in pd.unique(portfolio_data['Stock Ticker'].dropna())}
+    else:
+        fingerprints = lot_fingerprints(portfolio_data)
+
+    results = {}
+    stale = []
+    for stock, fingerprint in fingerprints.items():
+        hit, metrics = cache.lookup(stock, fingerprint)
+        if hit:
+            results[stock] = metrics
+        else:
+            stale.append(stock)
+
+    if stale:
+        subset = portfolio_data[portfolio_data['Stock Ticker'].isin(stale)]
+        fresh = run_engine(subset, spy_data, **engine_options)
+        fresh_metrics = {row['Stock Ticker']: row for row in fresh.to_dict('records')}
+        for stock in stale:
+            # Tickers without enough data are cached as None so they are not retried either
+            results[stock] = fresh_metrics.get(stock)
+            cache.store(stock, fingerprints[stock], results[stock])
+
+    print(f"Metrics cache: {len(fingerprints) - len(stale)} tickers reused, {len(stale)} recomputed")
+    summary_metrics = [results[stock] for stock in fingerprints if results[stock] is not None]
+    return pd.DataFrame(summary_metrics, columns=summary_columns)
+
+
+def compute_metrics(portfolio_df, spy_df, engine='vectorized', max_workers=None, chunksize=default_chunksize, cache=None, prices=None):
+    """
+    Compute the risk metrics summary for every ticker in the portfolio.
+
+    :param portfolio_df: Portfolio lots (raw or already prepared with prepare_portfolio_data).
+    :param spy_df: SPY benchmark frame with 'Date' and 'SPY Return' (see load_spy_data), or a
+                   Benchmark opened from the binary cache (see risktide_benchmark.load_benchmark).
+    :param engine: 'vectorized' (all tickers in one batched pass), 'threads' or 'processes'
+                   (process_stock per ticker on a thread or process pool).
+    :param max_workers: Pool size for the 'threads' and 'processes' engines, None for the executor default.
+    :param chunksize: Tickers per task for the 'processes' engine.
+    :param cache: Optional MetricsCache; only tickers whose lots (or the benchmark) changed are recomputed.
+    :param prices: Optional PriceStore (see risktide_prices); returns then come from each ticker's daily
+                   closes instead of the purchase prices of its lots, always with the vectorized kernel.
+    :return: DataFrame with one row per ticker and the summary_columns.
+    """
+    portfolio_data = prepare_portfolio_data(portfolio_df)
+
+    if engine not in engines:
+        raise ValueError(f"Unknown metrics engine '{engine}', expected one of {engines}")
+    with risktide_trace.span('metrics', rows=len(portfolio_data), engine=engine):
+        if cache is not None:
+            return compute_metrics_cached(portfolio_data, spy_df, cache, engine=engine, max_workers=max_workers, chunksize=chunksize, prices=prices)
+        return run_engine(portfolio_data, spy_df, engine=engine, max_workers=max_workers, chunksize=chunksize, prices=prices)
+
+
+def save_summary(summary_df, path=summary_file):
+    """Write the metrics summary to CSV."""
+    with risktide_trace.span('summary_write', rows=len(summary_df), path=path):
+        write_frame_atomically(summary_df, path)
+
+
+def main(portfolio_path=portfolio_data_file, spy_path=spy_data_file, summary_path=summary_file, db_path=portfolio_db_file):
+    """Standalone entry point: read the CSV inputs, compute and write stock_metrics_summary.csv and portfolio_risk.csv."""
+    with risktide_trace.run('metrics_script'):
+        clean_all_temp_files()
+
+        spy_data = open_benchmark(spy_path)
+
+        # The GUI keeps the portfolio in portfolio.db; refresh the CSV export only if the lots changed
+        if db_path and os.path.exists(db_path):
+            store = PortfolioStore(db_path)
+            store.export_csv(portfolio_path)
+            store.close()
+        portfolio_data = load_portfolio_data(portfolio_path)
+        cache = MetricsCache().load()
+        summary_df = compute_metrics(portfolio_data, spy_data, cache=cache)
+        cache.save()
+
+        # Same columns as the GUI writes to this file, plus portfolio_risk.csv
+        from risktide_portfolio import add_portfolio_risk, save_portfolio_risk
+        summary_df, stats = add_portfolio_risk(summary_df, portfolio_data, spy_data)
+        save_portfolio_risk(stats)
+
+        # Display results
+        print("\nSummary Metrics for All Stocks:")
+        print(summary_df)
+
+        save_summary(summary_df, summary_path)
+    return summary_df
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from risktide_metrics import prepare_portfolio_data
+from risktide_portfolio import build_panel, blocked_covariance, position_weights, modelled_weights, default_block_size, default_confidence
+
+# Monte Carlo VaR/CVaR of the portfolio and of every ticker over one or more horizons (trading days).
+#
+# Daily returns are drawn from a model fitted to the ticker returns and compounded over the horizon:
+# - 'covariance': mean returns plus correlated shocks from the pairwise covariance matrix;
+# - 'factor': alpha + beta * benchmark + an independent residual per ticker (O(tickers) per draw).
+# Shocks are normal, Student-t (scaled to unit variance) or resampled from history ('bootstrap').
+#
+# Paths are simulated in fixed-size batches, each seeded from its own child of one SeedSequence, so
+# the results depend on the seed and the batch size but not on the number of worker processes.
+# Of every batch only the lowest returns are kept (as many as the VaR quantile needs), so memory is
+# bounded by batch_size x tickers plus that tail, however many paths are simulated. Historical days
+# for bootstrap shocks are gathered from the panel's long-form rows, so no dense dates x tickers
+# matrix is built either.
+#
+# The cost is dominated by the random draws: paths x tickers x the longest horizon of them. Per-ticker
+# VaR/CVaR adds a tail buffer per ticker and horizon on top, so it is off unless asked for.
+
+# Return models and shock distributions
+models = ('covariance', 'factor')
+innovation_types = ('normal', 't', 'bootstrap')
+
+# Defaults: paths, paths per batch (a batch holds a few batch_size x tickers arrays), horizons in
+# trading days and Student-t degrees of freedom
+default_paths = 100_000
+default_batch_size = 10_000
+default_horizons = (1, 10)
+default_df = 5
+
+# Label of the portfolio rows in the results
+portfolio_label = 'Portfolio'
+
+
+def parse_horizons(text):
+    """Parse '1,10' into (1, 10)."""
+    horizons = tuple(sorted({int(part) for part in str(text).split(',') if part.strip()}))
+    if not horizons or horizons[0] < 1:
+        raise ValueError(f"Horizons must be positive integers, got {text!r}")
+    return horizons
+
+
+class SimulationModel:
+    """Daily return model of the simulated tickers; plain arrays, so it pickles cheaply to worker processes."""
+
+    def __init__(self, model, innovations, df=default_df):
+        if model not in models:
+            raise ValueError(f"Unknown model {model!r}, expected one of {', '.join(models)}")
+        if innovations not in innovation_types:
+            raise ValueError(f"Unknown innovations {innovations!r}, expected one of {', '.join(innovation_types)}")
+        if innovations == 't' and df <= 2:
+            raise ValueError("Student-t innovations need more than 2 degrees of freedom")
+        self.model = model
+        self.innovations = innovations
+        self.df = df
+
+    def shocks(self, rng, shape):
+        """Shocks with mean 0 and variance 1, normal or Student-t."""
+        z = rng.standard_normal(shape)
+        if self.innovations == 't':
+            # One chi-square draw per path: the columns share their heavy-tailed days (multivariate t)
+            z *= np.sqrt((self.df - 2) / rng.chisquare(self.df, size=(shape[0], 1)))
+        return z
+
+    def draw(self, rng, n):
+        """One day of returns for n paths, shape (n, tickers)."""
+        if self.model == 'covariance':
+            if self.innovations == 'bootstrap':
+                return self.mean + self.historical_days(rng.integers(0, len(self.day_bounds) - 1, n))
+            return self.mean + self.shocks(rng, (n, self.loadings.shape[1])) @ self.loadings.T
+
+        if self.innovations == 'bootstrap':
+            market = self.market_history[rng.integers(0, len(self.market_history), n)]
+            # Each ticker resamples its own residuals: row = start of its residuals + a draw below its count
+            picks = self.residual_starts + (rng.random((n, len(self.beta))) * self.residual_counts).astype(np.int64)
+            residual = self.residuals[picks]
+        else:
+            market = self.market_mean + self.market_std * self.shocks(rng, (n, 1))[:, 0]
+            residual = self.residual_std * self.shocks(rng, (n, len(self.beta)))
+        return self.alpha + np.outer(market, self.beta) + residual
+
+    def historical_days(self, days):
+        """Deviations from the mean on the given panel dates, one row per draw; 0 where a ticker has no return."""
+        starts = self.day_bounds[days]
+        lengths = self.day_bounds[days + 1] - starts
+        # Rows of every drawn date, one date after the other
+        offsets = np.cumsum(lengths) - lengths
+        rows = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+        deviations = np.zeros((len(days), len(self.mean)))
+        deviations[np.repeat(np.arange(len(days)), lengths), self.day_columns[rows]] = self.day_deviations[rows]
+        return deviations
+
+
+def covariance_model(panel, simulated, innovations, df=default_df, block_size=default_block_size):
+    """Mean returns plus shocks correlated through the blocked pairwise covariance of the panel."""
+    model = SimulationModel('covariance', innovations, df)
+    model.mean = np.nan_to_num(panel.means())[simulated]
+    if innovations == 'bootstrap':
+        # Whole historical days keep the cross-section together; a missing return counts as the ticker's mean.
+        # The simulated rows are kept in long form, sorted by date, with the row range of every panel date
+        columns = np.cumsum(simulated) - 1
+        rows = simulated[panel.codes]
+        order = np.argsort(panel.date_index[rows], kind='stable')
+        model.day_columns = columns[panel.codes[rows]][order]
+        model.day_deviations = panel.values[rows][order] - model.mean[model.day_columns]
+        model.day_bounds = np.searchsorted(panel.date_index[rows][order], np.arange(len(panel.dates) + 1))
+    else:
+        # Only the simulated tickers' covariance is built; pairs without overlapping history count as 0
+        covariance = blocked_covariance(panel, block_size, tickers=np.flatnonzero(simulated), fill=0.0)
+        # Pairwise-complete covariances need not be positive semi-definite: drop the negative eigenvalues
+        values, vectors = np.linalg.eigh(covariance)
+        keep = values > values.max(initial=0.0) * 1e-12
+        model.loadings = vectors[:, keep] * np.sqrt(values[keep])
+    return model
+
+
+def factor_model(panel, simulated, innovations, df=default_df):
+    """Single-index model: least-squares alpha and beta on the benchmark, plus independent residuals."""
+    if panel.benchmark is None:
+        raise ValueError("The factor model needs the benchmark returns of the panel")
+
+    k = len(panel)
+    codes, y, x = panel.codes, panel.values, panel.benchmark
+    n = np.bincount(codes, minlength=k).astype(float)
+    sx = np.bincount(codes, weights=x, minlength=k)
+    sy = np.bincount(codes, weights=y, minlength=k)
+    sxx = np.bincount(codes, weights=x * x, minlength=k)
+    sxy = np.bincount(codes, weights=x * y, minlength=k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_x = sxx - sx * sx / n
+        beta = np.where(var_x > 0, (sxy - sx * sy / n) / var_x, 0.0)
+        alpha = np.nan_to_num((sy - beta * sx) / n)
+    residuals = y - alpha[codes] - beta[codes] * x
+    residual_var = np.bincount(codes, weights=residuals * residuals, minlength=k) / np.maximum(n - 2, 1)
+
+    # Benchmark return of every panel date (every date has at least one row)
+    market = np.zeros(len(panel.dates))
+    market[panel.date_index] = x
+
+    model = SimulationModel('factor', innovations, df)
+    model.alpha = alpha[simulated]
+    model.beta = beta[simulated]
+    if innovations == 'bootstrap':
+        model.market_history = market
+        model.residuals = residuals
+        model.residual_starts = panel.bounds[:-1][simulated]
+        model.residual_counts = n[simulated]
+    else:
+        model.market_mean = market.mean()
+        model.market_std = market.std(ddof=1) if len(market) > 1 else 0.0
+        model.residual_std = np.sqrt(residual_var[simulated])
+    return model
+
+
+def lowest(values, keep):
+    """The keep lowest values of every column (unordered)."""
+    if len(values) <= keep:
+        return values
+    return np.partition(values, keep - 1, axis=0)[:keep]
+
+
+class TailBuffer:
+    """The keep lowest values of every column seen so far; compacted once twice as many rows have arrived."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.parts = []
+        self.rows = 0
+
+    def add(self, values):
+        self.parts.append(values)
+        self.rows += len(values)
+        if self.rows >= 2 * self.keep:
+            self.values()
+
+    def values(self):
+        values = lowest(np.concatenate(self.parts), self.keep)
+        self.parts = [values]
+        self.rows = len(values)
+        return values
+
+
+def tail_estimates(tail, count, confidence):
+    """
+    VaR and CVaR of count values from the buffer holding the lowest of them (per column).
+
+    VaR is the linear-interpolated quantile, like np.percentile; CVaR the mean of the values at or below it.
+    """
+    position = (1 - confidence) * (count - 1)
+    lo = int(position)
+    hi = min(lo + 1, count - 1)
+    tail = np.sort(tail, axis=0)
+    var = tail[lo] + (position - lo) * (tail[hi] - tail[lo])
+    below = tail <= var
+    cvar = np.where(below, tail, 0.0).sum(axis=0) / below.sum(axis=0)
+    return var, cvar
+
+
+def run_batch(model, task):
+    """
+    Simulate one batch of paths.
+
+    :return: dict horizon -> (lowest portfolio returns, portfolio sum, lowest ticker returns or None, ticker sums)
+    """
+    seed, paths, horizons, weights, keep, per_ticker = task
+    rng = np.random.default_rng(seed)
+    growth = np.ones((paths, len(weights)))
+    results = {}
+    for day in range(1, horizons[-1] + 1):
+        # A position can lose at most everything in a day
+        growth *= 1.0 + np.maximum(model.draw(rng, paths), -1.0)
+        if day in horizons:
+            returns = growth - 1.0
+            portfolio = returns @ weights
+            results[day] = (lowest(portfolio, keep), portfolio.sum(), lowest(returns, keep) if per_ticker else None, returns.sum(axis=0))
+    return results
+
+
+# Model of the current worker process, set once by init_simulation
+worker_model = None
+
+
+def init_simulation(model):
+    """Process pool initializer: receive the fitted model once instead of with every batch."""
+    global worker_model
+    worker_model = model
+
+
+def simulate_batch(task):
+    """Process pool task: run_batch with the worker's model."""
+    return run_batch(worker_model, task)
+
+
+def iter_batches(model, tasks, workers=None):
+    """Batch results in task order, in this process or fanned out to worker processes."""
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_simulation, initargs=(model,)) as executor:
+            yield from executor.map(simulate_batch, tasks)
+    else:
+        for task in tasks:
+            yield run_batch(model, task)
+
+
+def simulate(model, tickers, weights, paths=default_paths, horizons=default_horizons, confidence=default_confidence,
+             batch_size=default_batch_size, seed=None, workers=None, per_ticker=False):
+    """
+    Simulate paths of a fitted model and estimate VaR/CVaR of the horizon returns.
+
+    :param tickers: Tickers simulated by the model, in its column order.
+    :param weights: Portfolio weights of those tickers (all 0: no portfolio figures).
+    :param seed: Any SeedSequence entropy; the same seed and batch_size give the same results.
+    :param workers: Worker processes to fan the batches out to; None or 1 runs in this process.
+    :param per_ticker: Also estimate every ticker's own VaR/CVaR (keeps a tail buffer per ticker and horizon).
+    :return: DataFrame, one row per horizon for the portfolio and (with per_ticker) every ticker.
+    """
+    if paths < 2 or batch_size < 1:
+        raise ValueError("Need at least 2 paths and a batch size of at least 1")
+
+    horizons = tuple(sorted(set(horizons)))
+    weights = np.asarray(weights, dtype=float)
+    # Order statistics the quantile interpolates between; everything below them is needed for CVaR
+    keep = min(int((1 - confidence) * (paths - 1)) + 2, paths)
+    sizes = [min(batch_size, paths - start) for start in range(0, paths, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(child, size, horizons, weights, keep, per_ticker) for child, size in zip(seeds, sizes)]
+
+    # Per horizon: portfolio tail, portfolio sum, ticker tails, ticker sums
+    state = {horizon: [TailBuffer(keep), 0.0, TailBuffer(keep), 0.0] for horizon in horizons}
+    for results in iter_batches(model, tasks, workers=workers):
+        for horizon, (portfolio_tail, portfolio_sum, ticker_tail, ticker_sum) in results.items():
+            merged = state[horizon]
+            merged[0].add(portfolio_tail)
+            merged[1] += portfolio_sum
+            if per_ticker:
+                merged[2].add(ticker_tail)
+            merged[3] = merged[3] + ticker_sum
+
+    level = f"{confidence:.0%}"
+    frames = []
+    for horizon in horizons:
+        portfolio_tail, portfolio_sum, ticker_tail, ticker_sum = state[horizon]
+        if weights.any():
+            var, cvar = tail_estimates(portfolio_tail.values(), paths, confidence)
+            row = {'Mean Return': portfolio_sum / paths, f'VaR ({level})': var, f'CVaR ({level})': cvar}
+        else:
+            row = {'Mean Return': np.nan, f'VaR ({level})': np.nan, f'CVaR ({level})': np.nan}
+        frames.append(pd.DataFrame({'Stock Ticker': [portfolio_label], 'Horizon': horizon, 'Paths': paths, **{c: [v] for c, v in row.items()}}))
+        if per_ticker and len(tickers):
+            var, cvar = tail_estimates(ticker_tail.values(), paths, confidence)
+            frames.append(pd.DataFrame({
+                'Stock Ticker': np.asarray(tickers, dtype=object),
+                'Horizon': horizon,
+                'Paths': paths,
+                'Mean Return': ticker_sum / paths,
+                f'VaR ({level})': var,
+                f'CVaR ({level})': cvar,
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def monte_carlo_var(portfolio_df, spy_data, prices=None, model='covariance', innovations='normal', paths=default_paths,
+                    horizons=default_horizons, confidence=default_confidence, df=default_df, batch_size=default_batch_size,
+                    seed=None, workers=None, per_ticker=False, block_size=default_block_size):
+    """
+    Fit a return model to the portfolio's tickers and simulate portfolio and per-ticker VaR/CVaR.
+
+    Returns come from the same source as compute_metrics (purchase lots, or the price store when
+    given) and the portfolio weights from 'Total Purchase Price', as in risktide_portfolio.
+    Tickers with fewer than two returns are left out. VaR and CVaR are horizon returns, so losses
+    are negative, like the 'VaR (95%)' column.
+
+    :param model: 'covariance' or 'factor' (see the module comment).
+    :param innovations: 'normal', 't' (df degrees of freedom) or 'bootstrap'.
+    :return: DataFrame with Stock Ticker ('Portfolio' for the portfolio), Horizon, Paths, Mean Return, VaR, CVaR.
+    """
+    portfolio_data = prepare_portfolio_data(portfolio_df)
+    panel = build_panel(portfolio_data, spy_data, prices=prices)
+    _, weights = modelled_weights(panel, position_weights(portfolio_data, panel.tickers))
+    simulated = panel.counts() >= 2
+
+    if model == 'covariance':
+        fitted = covariance_model(panel, simulated, innovations, df=df, block_size=block_size)
+    elif model == 'factor':
+        fitted = factor_model(panel, simulated, innovations, df=df)
+    else:
+        raise ValueError(f"Unknown model {model!r}, expected one of {', '.join(models)}")
+    return simulate(fitted, panel.tickers[simulated], weights[simulated], paths=paths, horizons=horizons, confidence=confidence,
+                    batch_size=batch_size, seed=seed, workers=workers, per_ticker=per_ticker)
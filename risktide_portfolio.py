@@ -0,0 +1,301 @@
+import warnings
+import numpy as np
+import pandas as pd
+from risktide_metrics import return_rows, prepare_portfolio_data
+from risktide_files import write_frame_atomically
+
+# Portfolio-level risk: positions weighted by their 'Total Purchase Price', a pairwise covariance of
+# the ticker returns computed block by block, portfolio volatility, parametric and historical
+# VaR/CVaR, and the marginal and component VaR of every position.
+#
+# VaR and CVaR follow the sign convention of the 'VaR (95%)' summary column: they are returns (the
+# 5% quantile and the mean beyond it), so losses are negative numbers.
+
+# Default output of the portfolio-level figures
+portfolio_risk_file = 'portfolio_risk.csv'
+
+# Tickers per covariance block; peak memory is a few (dates x block_size) float arrays
+default_block_size = 256
+
+# Confidence level of VaR and CVaR
+default_confidence = 0.95
+
+
+class ReturnPanel:
+    """
+    Ticker returns on a shared date axis, kept in long form (sorted by ticker, then date), at most
+    one per ticker and date.
+
+    The dense dates x tickers matrix is never built; columns() scatters a few tickers into a dense
+    array with NaN where a ticker has no return on a date.
+    """
+
+    def __init__(self, tickers, codes, dates, returns, benchmark=None):
+        self.tickers = pd.Index(tickers)
+        self.dates, date_index = np.unique(np.asarray(dates, dtype='datetime64[ns]'), return_inverse=True)
+        order = np.lexsort((date_index, codes))
+        codes = np.asarray(codes)[order]
+        date_index = date_index[order]
+        values = np.asarray(returns, dtype=float)[order]
+        # Benchmark return of every row (for beta fits), when known
+        benchmark = None if benchmark is None else np.asarray(benchmark, dtype=float)[order]
+
+        # Lots bought on the same day give a ticker several returns on one date: compound them into one
+        starts = np.flatnonzero(np.concatenate(([True], (codes[1:] != codes[:-1]) | (date_index[1:] != date_index[:-1]))))
+        if len(starts) < len(codes):
+            values = np.multiply.reduceat(1 + values, starts) - 1
+            if benchmark is not None:
+                benchmark = np.multiply.reduceat(1 + benchmark, starts) - 1
+            codes, date_index = codes[starts], date_index[starts]
+        self.codes = codes
+        self.date_index = date_index
+        self.values = values
+        self.benchmark = benchmark
+        self.bounds = np.searchsorted(self.codes, np.arange(len(self.tickers) + 1))
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def counts(self):
+        return np.bincount(self.codes, minlength=len(self.tickers))
+
+    def means(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.bincount(self.codes, weights=self.values, minlength=len(self.tickers)) / self.counts()
+
+    def variances(self):
+        """Sample variance (n - 1) of every ticker's returns, NaN below two returns."""
+        counts = self.counts()
+        deviations = self.values - self.means()[self.codes]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variances = np.bincount(self.codes, weights=deviations * deviations, minlength=len(self.tickers)) / (counts - 1)
+        return np.where(counts >= 2, variances, np.nan)
+
+    def block(self, start, stop):
+        """Dense returns of tickers start..stop-1, one row per date."""
+        return self.columns(np.arange(start, stop))
+
+    def columns(self, tickers):
+        """Dense returns of the given tickers (positions in self.tickers), one row per date."""
+        tickers = np.asarray(tickers, dtype=np.int64)
+        starts = self.bounds[tickers]
+        lengths = self.bounds[tickers + 1] - starts
+        rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+        dense = np.full((len(self.dates), len(tickers)), np.nan)
+        dense[self.date_index[rows], np.repeat(np.arange(len(tickers)), lengths)] = self.values[rows]
+        return dense
+
+    def weighted_series(self, weights):
+        """
+        Portfolio return on every date some weighted ticker has a return.
+
+        Most tickers have no return on most dates (returns between purchase lots especially), and a
+        missing return is not a 0% return: each date's weights are rescaled over the tickers present.
+        """
+        weight = weights[self.codes]
+        present = np.bincount(self.date_index, weights=weight, minlength=len(self.dates))
+        total = np.bincount(self.date_index, weights=weight * self.values, minlength=len(self.dates))
+        covered = present > 0
+        return total[covered] / present[covered]
+
+
+def build_panel(portfolio_data, spy_data, prices=None):
+    """
+    Ticker returns for the portfolio, from the same source as compute_metrics.
+
+    :param prices: Optional PriceStore; daily returns instead of returns between purchase lots.
+    """
+    tickers, codes, y, x, _, dates = return_rows(portfolio_data, spy_data, prices=prices, with_dates=True)
+    return ReturnPanel(tickers, codes, dates, y, benchmark=x)
+
+
+def block_moments(a, b, squares=False):
+    """Pairwise-complete sums between the columns of two dense blocks (NaN = missing)."""
+    mask_a = ~np.isnan(a)
+    mask_b = ~np.isnan(b)
+    xa = np.where(mask_a, a, 0.0)
+    xb = np.where(mask_b, b, 0.0)
+    ma = mask_a.astype(float)
+    mb = mask_b.astype(float)
+    n = ma.T @ mb
+    sa = xa.T @ mb
+    sb = ma.T @ xb
+    sab = xa.T @ xb
+    if not squares:
+        return n, sa, sb, sab, None, None
+    saa = (xa * xa).T @ mb
+    sbb = ma.T @ (xb * xb)
+    return n, sa, sb, sab, saa, sbb
+
+
+def covariance_blocks(panel, tickers=None, block_size=default_block_size, correlation=False, fill=np.nan):
+    """
+    Covariance (or correlation) of the panel's tickers, one pair of ticker blocks at a time.
+
+    Each entry uses the dates both tickers have returns on and the sample (n - 1) normalisation,
+    like pandas DataFrame.cov()/.corr(). Every block product is a matrix multiplication, so the work
+    runs in BLAS, and only two (dates x block_size) blocks and their product are held at once.
+
+    :param tickers: Positions of the tickers to include, all of them by default.
+    :param fill: Value of the pairs with fewer than two common dates (and undefined correlations).
+    :return: Iterator of (rows, columns, block) over the upper triangle: rows and columns are slices
+             into tickers; the blocks below the diagonal are the transposes.
+    """
+    tickers = np.arange(len(panel)) if tickers is None else np.asarray(tickers, dtype=np.int64)
+    k = len(tickers)
+    blocks = [slice(start, min(start + block_size, k)) for start in range(0, k, block_size)]
+
+    for i, rows in enumerate(blocks):
+        a = panel.columns(tickers[rows])
+        for columns in blocks[i:]:
+            b = a if columns is rows else panel.columns(tickers[columns])
+            n, sa, sb, sab, saa, sbb = block_moments(a, b, squares=correlation)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cov = (sab - sa * sb / n) / (n - 1)
+                if correlation:
+                    var_a = (saa - sa * sa / n) / (n - 1)
+                    var_b = (sbb - sb * sb / n) / (n - 1)
+                    cov = cov / np.sqrt(var_a * var_b)
+            cov[(n < 2) | np.isnan(cov)] = fill
+            yield rows, columns, cov
+
+
+def blocked_covariance(panel, block_size=default_block_size, correlation=False, tickers=None, fill=np.nan):
+    """
+    Dense covariance (or correlation) matrix of the panel's tickers, or of some of them, for export.
+
+    Built from covariance_blocks; pairs with fewer than two common dates get fill (NaN by default).
+    This is the only place a (tickers x tickers) matrix is held; portfolio_risk works on the blocks.
+    """
+    k = len(panel) if tickers is None else len(tickers)
+    result = np.empty((k, k))
+    for rows, columns, cov in covariance_blocks(panel, tickers, block_size, correlation, fill):
+        result[rows, columns] = cov
+        result[columns, rows] = cov.T
+    return result
+
+
+def weighted_covariance(panel, weights, tickers, block_size=default_block_size):
+    """
+    Covariance matrix times the weights (Σw) of the given tickers, accumulated block by block.
+
+    Pairs without overlapping history contribute no co-movement (their covariance counts as 0).
+
+    :param weights: Weight of every ticker in tickers.
+    """
+    sigma_w = np.zeros(len(tickers))
+    for rows, columns, cov in covariance_blocks(panel, tickers, block_size, fill=0.0):
+        sigma_w[rows] += cov @ weights[columns]
+        if columns is not rows:
+            sigma_w[columns] += cov.T @ weights[rows]
+    return sigma_w
+
+
+def position_weights(portfolio_data, tickers):
+    """Share of the invested capital ('Total Purchase Price' summed per ticker), aligned with tickers."""
+    totals = pd.to_numeric(portfolio_data['Total Purchase Price'], errors='coerce')
+    totals = totals.groupby(portfolio_data['Stock Ticker']).sum()
+    return totals.reindex(tickers).fillna(0.0).to_numpy(dtype=float)
+
+
+def modelled_weights(panel, capital):
+    """
+    Capital shares of the positions that can be modelled (at least two returns and some capital).
+
+    :return: (modelled mask, weights summing to 1 over the modelled positions, all 0 if there are none)
+    """
+    modelled = (panel.counts() >= 2) & np.isfinite(capital) & (capital != 0)
+    total = capital[modelled].sum()
+    weights = np.where(modelled, capital / total, 0.0) if total else np.zeros(len(panel))
+    return modelled, weights
+
+
+def portfolio_risk(panel, capital, confidence=default_confidence, block_size=default_block_size):
+    """
+    Portfolio volatility, VaR/CVaR and the VaR contribution of every position (daily returns).
+
+    Positions without at least two returns cannot be modelled and are left out; the weights are
+    the capital shares of the remaining positions.
+
+    :param capital: Capital per ticker of the panel (see position_weights).
+    :return: (stats dict, positions DataFrame)
+    """
+    from scipy.stats import norm
+
+    level = f"{confidence:.0%}"
+    modelled, weights = modelled_weights(panel, capital)
+
+    mean = np.nan_to_num(panel.means())
+    # Σw of the modelled positions only; the others have no weight
+    positions = np.flatnonzero(modelled)
+    sigma_w = np.zeros(len(panel))
+    sigma_w[positions] = weighted_covariance(panel, weights[positions], positions, block_size)
+
+    # A pairwise-complete covariance need not be positive semi-definite, so w'Σw can come out
+    # negative: it is reported as it is, with the figures that need a volatility left unknown
+    variance = float(weights @ sigma_w)
+    if variance < 0:
+        warnings.warn(f"Portfolio variance {variance:.3g} is negative: the pairwise covariance of positions with little "
+                      "overlapping history is not positive semi-definite; volatility and parametric VaR are left empty", RuntimeWarning)
+    volatility = np.sqrt(variance) if variance >= 0 else np.nan
+    mean_p = float(weights @ mean)
+
+    # Parametric (normal) VaR and CVaR of the daily portfolio return
+    z = norm.ppf(1 - confidence)
+    parametric_var = mean_p + z * volatility
+    parametric_cvar = mean_p - volatility * norm.pdf(z) / (1 - confidence)
+
+    # Historical VaR and CVaR from the weighted return series
+    series = panel.weighted_series(weights)
+    if len(series):
+        historical_var = float(np.percentile(series, 100 * (1 - confidence)))
+        historical_cvar = float(series[series <= historical_var].mean())
+    else:
+        historical_var = historical_cvar = np.nan
+
+    # Marginal VaR = dVaR/dw; the component VaRs (w * marginal) add up to the parametric VaR
+    with np.errstate(divide='ignore', invalid='ignore'):
+        marginal = np.where(modelled, mean + z * sigma_w / volatility, np.nan) if volatility > 0 else np.full(len(panel), np.nan)
+    component = weights * marginal
+
+    if not weights.any():
+        # Nothing to aggregate (no capital or no history): report unknowns, not a zero risk
+        variance = volatility = mean_p = parametric_var = parametric_cvar = historical_var = historical_cvar = np.nan
+
+    stats = {
+        'Positions': int(modelled.sum()),
+        'Observations': len(series),
+        'Mean Return': mean_p,
+        'Variance': variance,
+        'Volatility': float(volatility),
+        f'Parametric VaR ({level})': float(parametric_var),
+        f'Parametric CVaR ({level})': float(parametric_cvar),
+        f'Historical VaR ({level})': historical_var,
+        f'Historical CVaR ({level})': historical_cvar,
+    }
+    positions = pd.DataFrame({
+        'Stock Ticker': panel.tickers,
+        'Weight': np.where(modelled, weights, np.nan),
+        'Volatility': np.sqrt(panel.variances()),
+        f'Marginal VaR ({level})': marginal,
+        f'Component VaR ({level})': component,
+    })
+    return stats, positions
+
+
+def add_portfolio_risk(summary_df, portfolio_df, spy_data, prices=None, confidence=default_confidence, block_size=default_block_size):
+    """
+    Compute the portfolio-level risk and add the per-position columns to a metrics summary.
+
+    :return: (summary with Weight / Volatility / Marginal VaR / Component VaR columns, stats dict)
+    """
+    portfolio_data = prepare_portfolio_data(portfolio_df)
+    panel = build_panel(portfolio_data, spy_data, prices=prices)
+    stats, positions = portfolio_risk(panel, position_weights(portfolio_data, panel.tickers), confidence=confidence, block_size=block_size)
+    summary_df = summary_df.merge(positions, on='Stock Ticker', how='left')
+    return summary_df, stats
+
+
+def save_portfolio_risk(stats, path=portfolio_risk_file):
+    """Write the portfolio-level figures as Metric,Value rows."""
+    write_frame_atomically(pd.DataFrame({'Metric': list(stats), 'Value': list(stats.values())}), path)
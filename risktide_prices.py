@@ -0,0 +1,269 @@
+import os
+import re
+import glob
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from risktide_files import atomic_write
+
+# Local daily price histories for portfolio tickers.
+#
+# Each ticker has a directory with two raw column files, dates.i8 (int64 ns, ascending) and close.f8
+# (float64), plus one index.json for the whole store holding the row count of every ticker. New rows
+# are appended to the end of the column files in place; index.json is rewritten afterwards, so rows
+# past the recorded count (an interrupted append) are ignored and cut off by the next append.
+# Readers memory-map exactly the recorded rows.
+
+# Default location of the price-history store
+price_history_dir = 'price_history'
+
+# Bump when the layout changes so old stores are rejected instead of misread
+store_version = 1
+
+# Close column preference when ingesting CSV files
+close_columns = ('Adj Close', 'Close')
+
+# Columns naming the ticker in multi-ticker CSV files
+ticker_columns = ('Ticker', 'Symbol', 'Stock Ticker')
+
+
+def asof_positions(dates, index_dates, tolerance=None):
+    """
+    As-of join kernel: for each date, the position of the last index date on or before it.
+
+    :param dates: datetime64[ns] values to look up (any order).
+    :param index_dates: Sorted datetime64[ns] index, e.g. the benchmark dates.
+    :param tolerance: Maximum gap as a numpy/pandas timedelta; 0 keeps exact matches only, None any gap.
+    :return: int64 positions into index_dates, -1 where there is no match.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    index_dates = np.asarray(index_dates, dtype='datetime64[ns]')
+    pos = np.searchsorted(index_dates, dates, side='right') - 1
+    found = pos >= 0
+    if tolerance is not None and len(index_dates):
+        gap = dates - index_dates[np.maximum(pos, 0)]
+        found &= gap <= np.timedelta64(pd.Timedelta(tolerance).value, 'ns')
+    return np.where(found, pos, -1)
+
+
+def ticker_dirname(ticker):
+    """Directory name for a ticker: readable, filesystem-safe and unique even on case-insensitive disks."""
+    safe = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)[:40]
+    return f"{safe}_{hashlib.blake2b(ticker.encode('utf-8'), digest_size=4).hexdigest()}"
+
+
+class PriceStore:
+    """Per-ticker daily closes, appended in place and opened memory-mapped."""
+
+    def __init__(self, directory=price_history_dir):
+        self.directory = directory
+        self.index = {'version': store_version, 'tickers': {}}
+        index_path = os.path.join(directory, 'index.json')
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            if index.get('version') != store_version:
+                raise ValueError(f"{index_path} has layout version {index.get('version')}, expected {store_version}")
+            self.index = index
+
+    @classmethod
+    def open_existing(cls, directory=price_history_dir):
+        """The store in directory, or None when none has been created there."""
+        if not os.path.exists(os.path.join(directory, 'index.json')):
+            return None
+        return cls(directory)
+
+    def save_index(self):
+        """Atomically replace index.json; appended rows only become visible once this is written."""
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(os.path.join(self.directory, 'index.json')) as f:
+            json.dump(self.index, f)
+
+    def tickers(self):
+        return list(self.index['tickers'])
+
+    def __contains__(self, ticker):
+        return ticker in self.index['tickers']
+
+    def rows(self, ticker):
+        entry = self.index['tickers'].get(ticker)
+        return entry['rows'] if entry else 0
+
+    def version(self, ticker):
+        """Changes whenever the history of a ticker changes (for the metrics cache)."""
+        entry = self.index['tickers'].get(ticker)
+        if entry is None:
+            return None
+        return f"{entry['rows']}:{entry['last']}:{entry['generation']}"
+
+    def generation(self, ticker):
+        """Bumped whenever stored rows of a ticker are rewritten (backfill or correction) rather than appended to."""
+        entry = self.index['tickers'].get(ticker)
+        return entry['generation'] if entry else None
+
+    def paths(self, ticker):
+        directory = os.path.join(self.directory, self.index['tickers'][ticker]['dir'])
+        return os.path.join(directory, 'dates.i8'), os.path.join(directory, 'close.f8')
+
+    def load(self, ticker):
+        """
+        Open the history of a ticker without copying it.
+
+        :return: (dates datetime64[ns], close float64), both read-only and ascending by date.
+        """
+        rows = self.rows(ticker)
+        if rows == 0:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype=float)
+        dates_path, close_path = self.paths(ticker)
+        dates = np.memmap(dates_path, dtype=np.int64, mode='r', shape=(rows,))
+        close = np.memmap(close_path, dtype=np.float64, mode='r', shape=(rows,))
+        return dates.view('datetime64[ns]'), close
+
+    def append(self, ticker, dates, close, save=True):
+        """
+        Add rows to the history of a ticker.
+
+        Rows after the last stored date are appended in place. Rows on or before it
+        (backfills and corrections) are merged and the ticker's files rewritten; a later
+        value for the same date replaces the stored one.
+
+        :return: Number of rows the history grew by.
+        """
+        dates = np.asarray(pd.to_datetime(dates), dtype='datetime64[ns]').view(np.int64)
+        close = np.asarray(close, dtype=float)
+        valid = (dates != np.iinfo(np.int64).min) & ~np.isnan(close)
+        dates, close = dates[valid], close[valid]
+        if len(dates) == 0:
+            return 0
+
+        # Sort and keep the last value given for each date
+        order = np.argsort(dates, kind='stable')
+        dates, close = dates[order], close[order]
+        last = np.append(dates[1:] != dates[:-1], True)
+        dates, close = dates[last], close[last]
+
+        entry = self.index['tickers'].get(ticker)
+        if entry is None:
+            entry = {'dir': ticker_dirname(ticker), 'rows': 0, 'first': None, 'last': None, 'generation': 0}
+            self.index['tickers'][ticker] = entry
+        os.makedirs(os.path.join(self.directory, entry['dir']), exist_ok=True)
+        dates_path, close_path = self.paths(ticker)
+        before = entry['rows']
+
+        if before and dates[0] <= entry['last']:
+            # Backfill or correction: merge with the stored rows and rewrite this ticker
+            stored_dates, stored_close = self.load(ticker)
+            merged = pd.Series(np.concatenate([np.asarray(stored_close), close]), index=np.concatenate([np.asarray(stored_dates).view(np.int64), dates]))
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            del stored_dates, stored_close
+            for path, values in ((dates_path, merged.index.to_numpy(dtype=np.int64)), (close_path, merged.to_numpy(dtype=float))):
+                with atomic_write(path, 'wb') as f:
+                    values.tofile(f)
+            entry['rows'] = len(merged)
+            entry['first'] = int(merged.index[0])
+            entry['generation'] += 1
+        else:
+            # Plain append: drop any unrecorded tail of an interrupted append, then write the delta
+            for path, values, itemsize in ((dates_path, dates, 8), (close_path, close, 8)):
+                with open(path, 'ab') as f:
+                    f.truncate(before * itemsize)
+                    f.seek(0, os.SEEK_END)
+                    values.tofile(f)
+            entry['rows'] = before + len(dates)
+            if not before:
+                entry['first'] = int(dates[0])
+
+        entry['last'] = max(int(dates[-1]), entry['last'] or int(dates[-1]))
+        if save:
+            self.save_index()
+        return entry['rows'] - before
+
+    def ingest_frame(self, frame, ticker=None, save=True):
+        """
+        Add the rows of a price CSV frame: Date plus Adj Close or Close, and a Ticker/Symbol column
+        unless ticker is given.
+
+        :return: dict ticker -> rows added.
+        """
+        close_column = next((c for c in close_columns if c in frame.columns), None)
+        if 'Date' not in frame.columns or close_column is None:
+            raise ValueError(f"Price data needs a Date column and one of {', '.join(close_columns)}")
+
+        if ticker is None:
+            ticker_column = next((c for c in ticker_columns if c in frame.columns), None)
+            if ticker_column is None:
+                raise ValueError(f"No ticker given and none of {', '.join(ticker_columns)} in the data")
+            groups = frame.groupby(ticker_column, sort=False)
+        else:
+            groups = [(ticker, frame)]
+
+        added = {}
+        for name, rows in groups:
+            dates = pd.to_datetime(rows['Date'], errors='coerce')
+            close = pd.to_numeric(rows[close_column], errors='coerce')
+            added[str(name)] = self.append(str(name), dates, close, save=False)
+        if save:
+            self.save_index()
+        return added
+
+    def ingest_csv(self, path, ticker=None, save=True):
+        """Add a CSV of daily prices; single-ticker files without a ticker column are named after the file."""
+        frame = pd.read_csv(path)
+        if ticker is None and not any(c in frame.columns for c in ticker_columns):
+            ticker = os.path.splitext(os.path.basename(path))[0]
+        return self.ingest_frame(frame, ticker=ticker, save=save)
+
+    def ingest_directory(self, directory, pattern='*.csv'):
+        """
+        Add every CSV in a directory (e.g. one AAPL.csv per ticker), writing the index once at the end.
+
+        :return: dict ticker -> rows added.
+        """
+        added = {}
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            for name, rows in self.ingest_csv(path, save=False).items():
+                added[name] = added.get(name, 0) + rows
+        self.save_index()
+        return added
+
+
+def price_returns(store, tickers, spy_dates, spy_returns, with_dates=False):
+    """
+    Daily returns of each ticker aligned with the benchmark returns, in the layout of align_returns.
+
+    Returns are computed on each ticker's own consecutive closes, then joined on date with the
+    precomputed (sorted) benchmark date index.
+
+    :return: (tickers, codes, stock_returns, spy_returns, counts), plus the row dates with with_dates.
+    """
+    tickers = pd.Index(tickers)
+    codes, returns, dates = [], [], []
+    for code, ticker in enumerate(tickers):
+        ticker_dates, close = store.load(ticker)
+        if len(close) < 2:
+            continue
+        close = np.asarray(close)
+        codes.append(np.full(len(close) - 1, code))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns.append(close[1:] / close[:-1] - 1)
+        dates.append(np.asarray(ticker_dates[1:]))
+
+    if not codes:
+        empty = np.empty(0)
+        result = (tickers, empty.astype(int), empty, empty, np.zeros(len(tickers), dtype=int))
+        return result + (empty.astype('datetime64[ns]'),) if with_dates else result
+
+    codes = np.concatenate(codes)
+    stock_return = np.concatenate(returns)
+    dates = np.concatenate(dates)
+    pos = asof_positions(dates, spy_dates, tolerance=0)
+    matched = pos >= 0
+    codes, stock_return, dates = codes[matched], stock_return[matched], dates[matched]
+    benchmark_return = np.asarray(spy_returns)[pos[matched]]
+    counts = np.bincount(codes, minlength=len(tickers))
+
+    valid = np.isfinite(stock_return) & ~np.isnan(benchmark_return)
+    if with_dates:
+        return tickers, codes[valid], stock_return[valid], benchmark_return[valid], counts, dates[valid]
+    return tickers, codes[valid], stock_return[valid], benchmark_return[valid], counts
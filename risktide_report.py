@@ -0,0 +1,88 @@
+import math
+from datetime import datetime
+import risktide_graphs
+from risktide_files import atomic_write
+
+# Builds the PDF report without Tk: every page is an Agg figure that is written to the
+# PDF and cleared before the next one is drawn, so at most one figure is alive per report.
+
+# Default report location
+report_file = 'risk_report.pdf'
+
+# Page size in inches (A4 landscape) and metrics table rows per page
+page_size = (11.69, 8.27)
+table_rows_per_page = 30
+
+
+def format_cell(value):
+    """Short text for one table cell."""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        return f'{value:.4g}'
+    return str(value)
+
+
+def draw_title_page(fig, df, title):
+    ax = fig.subplots()
+    ax.axis('off')
+    ax.text(0.5, 0.6, title, ha='center', va='center', fontsize=24, fontweight='bold')
+    ax.text(0.5, 0.5, f"Generated {datetime.now().strftime('%Y-%m-%d %H:%M')}", ha='center', va='center', fontsize=12)
+    ax.text(0.5, 0.44, f"{len(df)} stocks", ha='center', va='center', fontsize=12)
+
+
+def draw_table_page(fig, page, title, page_number, page_count):
+    ax = fig.subplots()
+    ax.axis('off')
+    ax.set_title(f"{title} - metrics ({page_number}/{page_count})", fontsize=12)
+    cells = [[format_cell(value) for value in row] for row in page.itertuples(index=False, name=None)]
+    table = ax.table(cellText=cells, colLabels=list(page.columns), loc='upper center', cellLoc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(7)
+    table.scale(1, 1.2)
+
+
+def write_page(pdf, draw, *args):
+    """Draw one page on its own figure, append it to the PDF and release the figure."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with risktide_graphs.live_figures:
+        fig = Figure(figsize=page_size)
+        FigureCanvasAgg(fig)
+        try:
+            draw(fig, *args)
+            pdf.savefig(fig)
+        finally:
+            fig.clear()
+
+
+def write_report(df, path=report_file, title="RiskTide Risk Report", graphs=True, table=True, rows_per_page=table_rows_per_page):
+    """
+    Write a PDF report for a metrics summary, one page at a time.
+
+    :param df: Metrics summary (as in stock_metrics_summary.csv).
+    :param graphs: Include the risk metric graphs.
+    :param table: Include the metrics table, split over as many pages as needed.
+    :return: Names of the graphs skipped for lack of data.
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    skipped = []
+    # Readers (or a cron job's mail step) never see a half-written report
+    with atomic_write(path, 'wb') as f, PdfPages(f, metadata={'Title': title}) as pdf:
+        write_page(pdf, draw_title_page, df, title)
+
+        if graphs:
+            for plot in risktide_graphs.plots:
+                try:
+                    risktide_graphs.with_figure(df, plot, pdf.savefig)
+                except risktide_graphs.NotEnoughData:
+                    skipped.append(plot)
+
+        if table and not df.empty:
+            page_count = math.ceil(len(df) / rows_per_page)
+            for page_number in range(page_count):
+                page = df.iloc[page_number * rows_per_page:(page_number + 1) * rows_per_page]
+                write_page(pdf, draw_table_page, page, title, page_number + 1, page_count)
+    return skipped
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from risktide_metrics import return_rows
+
+# Rolling-window versions of Beta, Sharpe, Sortino, drawdown and VaR.
+#
+# Every ticker's rows are laid out contiguously and each statistic is computed for all tickers
+# and all window positions at once, in O(n) per window size:
+# - sums, sums of squares and cross products come from cumulative sums, so each window is the
+#   difference of two prefix sums (Beta, Sharpe, Sortino);
+# - the running peak for drawdown is a rolling max (pandas implements it with a monotonic deque);
+# - VaR is a rolling 5% quantile (pandas keeps an indexable skiplist, O(log w) per step).
+# Windows never cross tickers: a value is only reported once a ticker has `window` rows of its own.
+#
+# A window counts return rows. With a price-history store those are trading days (21/63/252 is about a
+# month, a quarter and a year); without one they are the returns between purchase lots, so a window
+# of 252 is 252 lots, however many days they span.
+
+# Default window lengths in rows (about one month, one quarter and one year of daily returns)
+default_windows = (21, 63, 252)
+
+# Column order of the rolling metrics
+rolling_columns = ['Stock Ticker', 'Date', 'Window', 'Beta', 'Sharpe Ratio', 'Sortino Ratio', 'Drawdown', 'VaR (95%)']
+
+
+def parse_windows(text):
+    """Parse '21,63,252' into (21, 63, 252)."""
+    windows = tuple(sorted({int(part) for part in str(text).split(',') if part.strip()}))
+    if not windows or windows[0] < 2:
+        raise ValueError(f"Rolling windows must be integers of at least 2, got {text!r}")
+    return windows
+
+
+def window_sums(values, ends, window):
+    """Sum of values over the window rows ending at each index in ends, from one prefix sum."""
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    return prefix[ends + 1] - prefix[ends + 1 - window]
+
+
+def rolling_window(tickers, codes, dates, y, x, log_wealth, window):
+    """Rolling metrics for one window length; inputs are grouped by ticker (see rolling_metrics)."""
+    sizes = np.bincount(codes, minlength=len(tickers))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    position = np.arange(len(codes)) - starts[codes]
+    ends = np.flatnonzero(position >= window - 1)
+    if len(ends) == 0:
+        return pd.DataFrame(columns=rolling_columns)
+
+    # Centre the returns on their ticker's mean so the prefix-sum differences stay accurate
+    x_mean = (np.bincount(codes, weights=x, minlength=len(tickers)) / np.maximum(sizes, 1))[codes]
+    y_mean = (np.bincount(codes, weights=y, minlength=len(tickers)) / np.maximum(sizes, 1))[codes]
+    xc = x - x_mean
+    yc = y - y_mean
+
+    w = float(window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Moments from prefix sums
+        sx = window_sums(xc, ends, window)
+        sy = window_sums(yc, ends, window)
+        sxx = window_sums(xc * xc, ends, window)
+        syy = window_sums(yc * yc, ends, window)
+        sxy = window_sums(xc * yc, ends, window)
+        var_x = np.maximum(sxx - sx * sx / w, 0.0) / (w - 1)
+        var_y = np.maximum(syy - sy * sy / w, 0.0) / (w - 1)
+        cov = (sxy - sx * sy / w) / (w - 1)
+
+        # Beta, 0 for a flat benchmark window like the full-history engine; the tolerance absorbs rounding
+        flat_x = var_x <= 64 * np.finfo(float).eps * (sxx / (w - 1))
+        beta = np.where(flat_x, 0.0, cov / var_x)
+
+        # Sharpe Ratio (sample std, ddof=1) on the raw returns
+        mean_y = sy / w + y_mean[ends]
+        std_y = np.sqrt(var_y)
+        flat_y = var_y <= 64 * np.finfo(float).eps * (syy / (w - 1))
+        sharpe_ratio = np.where(flat_y, np.nan, mean_y / std_y)
+
+        # Sortino Ratio: std of the negative returns in the window (needs two of them)
+        negative = y < 0
+        neg_n = window_sums(negative.astype(float), ends, window)
+        neg_s = window_sums(np.where(negative, y, 0.0), ends, window)
+        neg_ss = window_sums(np.where(negative, y * y, 0.0), ends, window)
+        downside_var = np.maximum(neg_ss - neg_s * neg_s / neg_n, 0.0) / (neg_n - 1)
+        downside_std = np.where(neg_n >= 2, np.sqrt(downside_var), np.nan)
+        sortino_ratio = np.where(downside_std > 0, mean_y / downside_std, np.nan)
+
+    # Drawdown from the highest wealth inside the window (rolling max of log wealth)
+    peak = pd.Series(log_wealth).rolling(window).max().to_numpy()[ends]
+    drawdown = np.expm1(log_wealth[ends] - peak)
+
+    # VaR (95%): linear-interpolated 5% quantile, same as np.percentile
+    var_95 = pd.Series(y).rolling(window).quantile(0.05, interpolation='linear').to_numpy()[ends]
+
+    # float32 keeps the series compact; the inputs are daily returns, so nothing is lost that matters
+    return pd.DataFrame({
+        'Stock Ticker': pd.Categorical.from_codes(codes[ends], categories=pd.Index(tickers, dtype=object)),
+        'Date': dates[ends],
+        'Window': np.full(len(ends), window, dtype=np.int16),
+        'Beta': beta.astype(np.float32),
+        'Sharpe Ratio': sharpe_ratio.astype(np.float32),
+        'Sortino Ratio': sortino_ratio.astype(np.float32),
+        'Drawdown': drawdown.astype(np.float32),
+        'VaR (95%)': var_95.astype(np.float32),
+    }, columns=rolling_columns)
+
+
+def rolling_metrics(portfolio_data, spy_data, windows=default_windows, prices=None):
+    """
+    Rolling-window metrics for every ticker.
+
+    Uses the same returns as compute_metrics: one row per matched lot, in portfolio order, or one per
+    trading day with prices.
+
+    :param portfolio_data: Prepared portfolio (see prepare_portfolio_data).
+    :param spy_data: Benchmark (Benchmark or DataFrame with Date and SPY Return).
+    :param windows: Window lengths in return rows (trading days with prices).
+    :param prices: Optional PriceStore; each ticker's daily closes instead of its lot prices.
+    :return: Long DataFrame with rolling_columns, one row per (ticker, window, window end).
+    """
+    tickers, codes, y, x, counts, dates = return_rows(portfolio_data, spy_data, prices=prices, with_dates=True)
+    k = len(tickers)
+
+    # Lay every ticker's rows out contiguously, keeping their order
+    order = np.argsort(codes, kind='stable')
+    codes, y, x, dates = codes[order], y[order], x[order], dates[order]
+
+    # Log wealth per ticker; a -100% return floors it instead of producing -inf
+    log_growth = np.log1p(np.maximum(y, -1.0 + 1e-12))
+    log_wealth = np.cumsum(log_growth)
+    sizes = np.bincount(codes, minlength=k)
+    before = np.concatenate(([0.0], log_wealth))[np.concatenate(([0], np.cumsum(sizes)[:-1]))]
+    log_wealth = log_wealth - before[codes]
+
+    frames = [rolling_window(tickers, codes, dates, y, x, log_wealth, window) for window in windows]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=rolling_columns)
+    return pd.concat(frames, ignore_index=True)
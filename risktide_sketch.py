@@ -0,0 +1,317 @@
+import os
+import numpy as np
+import pandas as pd
+from risktide_files import atomic_write
+
+# Mergeable quantile sketches of daily returns, for VaR and Expected Shortfall over long histories.
+#
+# A sketch counts returns in logarithmic buckets (as in DDSketch): bucket i holds the magnitudes in
+# (min_value * gamma^(i-1), min_value * gamma^i] with gamma = (1 + alpha) / (1 - alpha), signed like
+# the return. Reporting a bucket as 2 * min_value * gamma^i / (gamma + 1) is within a relative error
+# of alpha of every value in it, so:
+# - a VaR estimate is within alpha * |x| of the exact order statistic x of the same rank;
+# - Expected Shortfall (the mean of the returns up to that rank) is within alpha of the exact mean
+#   when those returns are all losses, which is the case at the usual confidence levels.
+# Magnitudes up to min_value share one zero bucket (absolute error min_value).
+#
+# Counts are kept sparse, one row per (ticker, period, bucket), a period being a month or a year.
+# Sketches merge by adding counts, so tickers, periods and newly folded-in days combine without going
+# back to the raw returns. A period holds at most a few hundred buckets per ticker however many
+# returns fall in it, so the sketches are far smaller than the returns once a period holds thousands
+# of them (intraday data); with daily closes they mainly save the rescans and sorts.
+
+# Default location of the persisted sketches
+sketch_file = 'return_sketches.npz'
+
+# Bump when the file layout changes so old sketches are rebuilt instead of misread
+sketch_format = 1
+
+# Relative accuracy of the bucket values, and the smallest magnitude told apart from zero
+default_alpha = 0.005
+min_value = 1e-8
+
+# Default confidence levels of the VaR/Expected Shortfall summary
+default_levels = (0.95, 0.99)
+
+# Time partitions of the counts: 'M' (month) or 'Y' (year)
+periods = ('M', 'Y')
+default_period = 'M'
+
+# Label of the row summarising all selected tickers together
+pooled_label = 'Pooled'
+
+
+def parse_levels(text):
+    """Parse '0.95,0.99' into (0.95, 0.99)."""
+    levels = tuple(sorted({float(part) for part in str(text).split(',') if part.strip()}))
+    if not levels or levels[0] <= 0 or levels[-1] >= 1:
+        raise ValueError(f"Confidence levels must be between 0 and 1, got {text!r}")
+    return levels
+
+
+def period_numbers(dates, period=default_period):
+    """Months (or years) since 1970 of datetime64 dates."""
+    return np.asarray(dates, dtype='datetime64[ns]').astype(f'datetime64[{period}]').astype(np.int32)
+
+
+def bucket_keys(values, alpha=default_alpha):
+    """Signed bucket of every return; the keys sort in the same order as the values."""
+    gamma = (1 + alpha) / (1 - alpha)
+    magnitude = np.abs(values)
+    with np.errstate(divide='ignore'):
+        index = np.ceil(np.log(magnitude / min_value) / np.log(gamma))
+    index = np.where(magnitude > min_value, np.maximum(index, 1), 0).astype(np.int32)
+    return np.sign(values).astype(np.int32) * index
+
+
+def bucket_values(keys, alpha=default_alpha):
+    """Representative return of every bucket."""
+    gamma = (1 + alpha) / (1 - alpha)
+    return np.sign(keys) * np.where(keys == 0, 0.0, 2 * min_value * gamma ** np.abs(keys).astype(float) / (gamma + 1))
+
+
+def tail_statistics(groups, values, counts, group_count, levels=default_levels):
+    """
+    VaR and Expected Shortfall of every group of weighted values.
+
+    VaR at confidence c is the order statistic of rank floor((1 - c) * (n - 1)), i.e.
+    np.percentile(..., method='lower'); Expected Shortfall is the mean of the values up to and
+    including that rank. Both are returns, so losses are negative.
+
+    :return: (counts per group, dict level -> (VaR, Expected Shortfall)), NaN for empty groups.
+    """
+    order = np.lexsort((values, groups))
+    groups, values, counts = groups[order], values[order], counts[order]
+    n = np.bincount(groups, weights=counts, minlength=group_count).astype(np.int64)
+    first = np.searchsorted(groups, np.arange(group_count))
+    # Running count and running sum, with a leading 0 so [first] is "before the group"
+    cum = np.concatenate(([0], np.cumsum(counts)))
+    total = np.concatenate(([0.0], np.cumsum(counts * values)))
+
+    results = {}
+    for level in levels:
+        rank = np.floor((1 - level) * np.maximum(n - 1, 0)).astype(np.int64)
+        row = np.searchsorted(cum[1:], cum[first] + rank, side='right')
+        row = np.minimum(row, max(len(values) - 1, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = np.where(n > 0, values[row] if len(values) else np.nan, np.nan)
+            below = cum[row] - cum[first]
+            es = (total[row] - total[first] + (rank + 1 - below) * var) / (rank + 1)
+        results[level] = (var, np.where(n > 0, es, np.nan))
+    return n, results
+
+
+def summary_frame(labels, n, results):
+    """Tabulate tail_statistics: Stock Ticker, Returns, then VaR and Expected Shortfall per level."""
+    frame = pd.DataFrame({'Stock Ticker': labels, 'Returns': n})
+    for level, (var, es) in results.items():
+        frame[f'VaR ({level:.0%})'] = var
+        frame[f'Expected Shortfall ({level:.0%})'] = es
+    return frame
+
+
+class ReturnSketch:
+    """Sparse bucket counts of returns per (ticker, period); see the module comment for the error bounds."""
+
+    def __init__(self, alpha=default_alpha, period=default_period):
+        if period not in periods:
+            raise ValueError(f"Unknown period {period!r}, expected one of {', '.join(periods)}")
+        self.alpha = alpha
+        self.period = period
+        self.tickers = []
+        self.codes = np.empty(0, dtype=np.int32)
+        self.periods = np.empty(0, dtype=np.int32)
+        self.keys = np.empty(0, dtype=np.int32)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def code_map(self, tickers):
+        """Own codes of tickers, registering the new ones."""
+        positions = {ticker: code for code, ticker in enumerate(self.tickers)}
+        for ticker in tickers:
+            if ticker not in positions:
+                positions[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+        return np.array([positions[ticker] for ticker in tickers], dtype=np.int32)
+
+    def append(self, codes, row_periods, keys, counts):
+        """Add count rows and fold rows of the same (ticker, period, bucket) together."""
+        codes = np.concatenate([self.codes, codes]).astype(np.int32)
+        row_periods = np.concatenate([self.periods, row_periods]).astype(np.int32)
+        keys = np.concatenate([self.keys, keys]).astype(np.int32)
+        counts = np.concatenate([self.counts, counts]).astype(np.int64)
+        if len(counts) == 0:
+            return self
+
+        order = np.lexsort((keys, row_periods, codes))
+        codes, row_periods, keys, counts = codes[order], row_periods[order], keys[order], counts[order]
+        starts = np.flatnonzero(np.concatenate(([True], (codes[1:] != codes[:-1]) | (row_periods[1:] != row_periods[:-1]) | (keys[1:] != keys[:-1]))))
+        self.codes, self.periods, self.keys = codes[starts], row_periods[starts], keys[starts]
+        self.counts = np.add.reduceat(counts, starts)
+        return self
+
+    def add(self, tickers, codes, dates, values):
+        """
+        Fold returns in.
+
+        :param tickers: Ticker names; codes index into them (as in align_returns).
+        :param dates: Date of every return.
+        """
+        values = np.asarray(values, dtype=float)
+        valid = np.isfinite(values)
+        codes = self.code_map(list(tickers))[np.asarray(codes)[valid]] if len(tickers) else np.empty(0, dtype=np.int32)
+        return self.append(codes, period_numbers(np.asarray(dates)[valid], self.period), bucket_keys(values[valid], self.alpha), np.ones(valid.sum(), dtype=np.int64))
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same accuracy and period."""
+        if (other.alpha, other.period) != (self.alpha, self.period):
+            raise ValueError(f"Cannot merge sketches of accuracy/period {other.alpha}/{other.period} and {self.alpha}/{self.period}")
+        mapping = self.code_map(other.tickers)
+        return self.append(mapping[other.codes] if len(other) else other.codes, other.periods, other.keys, other.counts)
+
+    def drop(self, tickers):
+        """Forget every row of tickers (before rebuilding them)."""
+        tickers = set(tickers)
+        keep = ~np.isin(self.codes, [code for code, ticker in enumerate(self.tickers) if ticker in tickers])
+        self.codes, self.periods, self.keys, self.counts = self.codes[keep], self.periods[keep], self.keys[keep], self.counts[keep]
+
+    def select(self, tickers=None, start=None, end=None):
+        """
+        Sub-sketch of some tickers and a range of periods.
+
+        :param start: Date in the first period included (e.g. '2020-01'), None for all.
+        :param end: Date in the last period included, None for all.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if tickers is not None:
+            tickers = set(tickers)
+            keep &= np.isin(self.codes, [code for code, ticker in enumerate(self.tickers) if ticker in tickers])
+        if start is not None:
+            keep &= self.periods >= period_numbers([np.datetime64(start)], self.period)[0]
+        if end is not None:
+            keep &= self.periods <= period_numbers([np.datetime64(end)], self.period)[0]
+        subset = ReturnSketch(self.alpha, self.period)
+        subset.tickers = list(self.tickers)
+        subset.codes, subset.periods, subset.keys, subset.counts = self.codes[keep], self.periods[keep], self.keys[keep], self.counts[keep]
+        return subset
+
+    def summary(self, levels=default_levels, pooled=False):
+        """
+        VaR and Expected Shortfall per ticker, or of all returns together with pooled.
+
+        :return: DataFrame with Stock Ticker, Returns and a VaR/Expected Shortfall pair per level.
+        """
+        present = np.unique(self.codes)
+        if pooled:
+            groups, labels = np.zeros(len(self), dtype=np.int64), [pooled_label]
+        else:
+            groups, labels = np.searchsorted(present, self.codes), [self.tickers[code] for code in present]
+        n, results = tail_statistics(groups, bucket_values(self.keys, self.alpha), self.counts, len(labels), levels)
+        return summary_frame(labels, n, results)
+
+
+def price_return_rows(prices, tickers, after=None):
+    """
+    Daily close-to-close returns of tickers from a price-history store.
+
+    :param after: Optional dict ticker -> int64 ns date; only returns dated after it are given.
+    :return: (codes into tickers, dates, returns)
+    """
+    codes, dates, returns = [], [], []
+    for code, ticker in enumerate(tickers):
+        ticker_dates, close = prices.load(ticker)
+        start = 1
+        if after and ticker in after:
+            start = max(int(np.searchsorted(np.asarray(ticker_dates).view(np.int64), after[ticker], side='right')), 1)
+        if start >= len(close):
+            continue
+        close = np.asarray(close[start - 1:])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns.append(close[1:] / close[:-1] - 1)
+        dates.append(np.asarray(ticker_dates[start:]))
+        codes.append(np.full(len(close) - 1, code))
+    if not codes:
+        return np.empty(0, dtype=int), np.empty(0, dtype='datetime64[ns]'), np.empty(0)
+    return np.concatenate(codes), np.concatenate(dates), np.concatenate(returns)
+
+
+def exact_summary(prices, tickers=None, start=None, end=None, levels=default_levels, pooled=False, period=default_period):
+    """
+    The statistics of ReturnSketch.summary computed from the raw returns, for validating the sketches.
+
+    Reads and sorts every return, which is what the sketches avoid. start and end select whole
+    periods, as in ReturnSketch.select.
+    """
+    tickers = list(prices.tickers() if tickers is None else [t for t in tickers if t in prices])
+    codes, dates, returns = price_return_rows(prices, tickers)
+    return_periods = period_numbers(dates, period)
+    keep = np.isfinite(returns)
+    if start is not None:
+        keep &= return_periods >= period_numbers([np.datetime64(start)], period)[0]
+    if end is not None:
+        keep &= return_periods <= period_numbers([np.datetime64(end)], period)[0]
+    codes, returns = codes[keep], returns[keep]
+
+    if pooled:
+        groups, labels = np.zeros(len(codes), dtype=np.int64), [pooled_label]
+    else:
+        present = np.unique(codes)
+        groups, labels = np.searchsorted(present, codes), [tickers[code] for code in present]
+    n, results = tail_statistics(groups, returns, np.ones(len(returns), dtype=np.int64), len(labels), levels)
+    return summary_frame(labels, n, results)
+
+
+class SketchStore:
+    """Return sketches of a price-history store, persisted in one .npz file and updated incrementally."""
+
+    def __init__(self, path=sketch_file, alpha=default_alpha, period=default_period):
+        self.path = path
+        self.sketch = ReturnSketch(alpha, period)
+        # ticker -> (date of the last return folded in, price-store generation it was read from)
+        self.sources = {}
+
+    def load(self):
+        """Load the sketches from disk; a missing file, or one of another format, accuracy or period, gives empty sketches."""
+        if not os.path.exists(self.path):
+            return self
+        with np.load(self.path, allow_pickle=False) as data:
+            if int(data['format']) != sketch_format or float(data['alpha']) != self.sketch.alpha or str(data['period']) != self.sketch.period:
+                print(f"Rebuilding {self.path}: written with another format, accuracy or period")
+                return self
+            self.sketch.tickers = data['tickers'].tolist()
+            self.sketch.codes, self.sketch.periods, self.sketch.keys, self.sketch.counts = data['codes'], data['periods'], data['keys'], data['counts']
+            self.sources = {ticker: (int(last), int(generation)) for ticker, last, generation in zip(data['source_tickers'].tolist(), data['source_last'], data['source_generation'])}
+        return self
+
+    def save(self):
+        """Write the sketches atomically."""
+        sources = list(self.sources.items())
+        with atomic_write(self.path, 'wb') as f:
+            np.savez(f, format=sketch_format, alpha=self.sketch.alpha, period=self.sketch.period, tickers=np.array(self.sketch.tickers, dtype=str),
+                     codes=self.sketch.codes, periods=self.sketch.periods, keys=self.sketch.keys, counts=self.sketch.counts,
+                     source_tickers=np.array([ticker for ticker, _ in sources], dtype=str),
+                     source_last=np.array([last for _, (last, _) in sources], dtype=np.int64),
+                     source_generation=np.array([generation for _, (_, generation) in sources], dtype=np.int64))
+
+    def update(self, prices):
+        """
+        Fold in the days added to a price-history store since the last update.
+
+        Tickers whose stored history was rewritten (a backfill or correction) are rebuilt from scratch.
+
+        :return: Number of returns folded in.
+        """
+        rebuild = [ticker for ticker in prices.tickers() if ticker in self.sources and self.sources[ticker][1] != prices.generation(ticker)]
+        self.sketch.drop(rebuild)
+        after = {ticker: last for ticker, (last, generation) in self.sources.items() if ticker not in rebuild}
+
+        tickers = prices.tickers()
+        codes, dates, returns = price_return_rows(prices, tickers, after=after)
+        self.sketch.add(tickers, codes, dates, returns)
+        for ticker in tickers:
+            ticker_dates, _ = prices.load(ticker)
+            if len(ticker_dates):
+                self.sources[ticker] = (int(np.asarray(ticker_dates[-1:]).view(np.int64)[0]), prices.generation(ticker))
+        return len(returns)
@@ -0,0 +1,260 @@
+import os
+import pickle
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from risktide_files import write_frame_atomically
+
+# Default locations of the portfolio store and the files it replaces / exports
+portfolio_db_file = 'portfolio.db'
+legacy_pickle_file = 'portfolio.pkl'
+portfolio_csv_file = 'portfolio_data.csv'
+
+# Column names as shown in the GUI and written to portfolio_data.csv
+portfolio_columns = ("Stock Ticker", "Date Purchased", "Units Purchased", "Purchase Price", "Total Purchase Price")
+
+schema = """
+CREATE TABLE IF NOT EXISTS lots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    date_purchased TEXT NOT NULL,
+    units REAL,
+    purchase_price REAL,
+    total_purchase_price REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class PortfolioStore:
+    """
+    SQLite-backed portfolio (WAL mode).
+
+    Every add/delete is a single transaction touching only the affected rows. The
+    portfolio_data.csv file for the metrics script is written lazily by export_csv,
+    only when the lots changed since the last export.
+    """
+
+    def __init__(self, path=portfolio_db_file, legacy_path=legacy_pickle_file):
+        """
+        :param legacy_path: portfolio.pkl migrated into a newly created store; None to start empty.
+        """
+        self.path = path
+        is_new = not os.path.exists(path)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(schema)
+        if is_new and legacy_path:
+            self.import_legacy_pickle(legacy_path)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def import_legacy_pickle(self, pickle_path=legacy_pickle_file):
+        """One-time migration of the old portfolio.pkl into the store."""
+        if not os.path.exists(pickle_path):
+            return 0
+        with open(pickle_path, 'rb') as f:
+            portfolio_data = pickle.load(f)
+        ids = self.add_lots(portfolio_data)
+        print(f"Migrated {len(ids)} lots from {pickle_path} to {self.path}")
+        return len(ids)
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def version(self):
+        """Counter bumped by every change to the lots."""
+        with self.lock:
+            return int(self.get_meta('version', 0))
+
+    def bump_version(self):
+        self.set_meta('version', int(self.get_meta('version', 0)) + 1)
+
+    def add_lots(self, lots):
+        """
+        Insert lots in one transaction.
+
+        :param lots: Iterable of (ticker, date_purchased, units, purchase_price, total_purchase_price).
+        :return: The new lot ids, in order.
+        """
+        lots = [tuple(lot) for lot in lots]
+        if not lots:
+            return []
+        ids = []
+        with self.lock, self.conn:
+            for t, d, u, p, tp in lots:
+                cursor = self.conn.execute(
+                    "INSERT INTO lots (ticker, date_purchased, units, purchase_price, total_purchase_price) VALUES (?, ?, ?, ?, ?)",
+                    (str(t), str(d), to_float(u), to_float(p), to_float(tp))
+                )
+                ids.append(cursor.lastrowid)
+            self.bump_version()
+        return ids
+
+    def delete_lots(self, lot_ids):
+        """Delete lots by id in one transaction; returns the number of rows removed."""
+        lot_ids = [(int(lot_id),) for lot_id in lot_ids]
+        if not lot_ids:
+            return 0
+        with self.lock, self.conn:
+            removed = self.conn.executemany("DELETE FROM lots WHERE id = ?", lot_ids).rowcount
+            self.bump_version()
+        return removed
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM lots").fetchone()[0]
+
+    def all_lots(self):
+        """Return [(id, (ticker, date, units, price, total)), ...] in insertion order."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, ticker, date_purchased, units, purchase_price, total_purchase_price FROM lots ORDER BY id"
+            ).fetchall()
+        return [(row[0], row[1:]) for row in rows]
+
+    def to_frame(self):
+        """Return the portfolio as a DataFrame with the GUI column names, in insertion order."""
+        with self.lock:
+            frame = pd.read_sql_query(
+                "SELECT ticker, date_purchased, units, purchase_price, total_purchase_price FROM lots ORDER BY id",
+                self.conn
+            )
+        frame.columns = list(portfolio_columns)
+        return frame
+
+    def export_csv(self, path=portfolio_csv_file, force=False):
+        """
+        Write portfolio_data.csv if the lots changed since the last export (or the file is missing).
+
+        :return: True when the file was written.
+        """
+        with self.lock:
+            version = int(self.get_meta('version', 0))
+            exported = self.get_meta('exported_version')
+            if not force and exported == str(version) and os.path.exists(path):
+                return False
+            write_frame_atomically(self.to_frame(), path)
+            with self.conn:
+                self.set_meta('exported_version', version)
+        return True
+
+
+class PortfolioModel:
+    """
+    Typed, column-oriented copy of the portfolio used to order the portfolio view.
+
+    Dates are parsed once to int64 nanoseconds and numbers to float64, so sorting never
+    re-parses the strings shown in the Treeview. Sort permutations are cached per sort
+    order and dropped whenever lots are added or deleted. Missing or unparseable values
+    sort last in both directions.
+    """
+
+    numeric_columns = ("Units Purchased", "Purchase Price", "Total Purchase Price")
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.data = {
+            "Stock Ticker": np.empty(0, dtype=object),
+            "Date Purchased": np.empty(0, dtype=np.int64),
+            "Units Purchased": np.empty(0, dtype=float),
+            "Purchase Price": np.empty(0, dtype=float),
+            "Total Purchase Price": np.empty(0, dtype=float),
+        }
+        self.sort_keys = {}  # column -> numeric key array
+        self.permutations = {}  # ((column, reverse), ...) -> row permutation
+
+    @classmethod
+    def from_lots(cls, lots):
+        """Build the model from [(id, values), ...] as returned by PortfolioStore.all_lots."""
+        model = cls()
+        model.append(lots)
+        return model
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def typed_columns(lots):
+        """Parse [(id, values), ...] into (ids, column arrays)."""
+        ids = np.array([lot_id for lot_id, _ in lots], dtype=np.int64)
+        rows = [values for _, values in lots]
+        tickers = np.array([str(row[0]) for row in rows], dtype=object)
+        dates = pd.to_datetime(pd.Series([row[1] for row in rows], dtype=object), format="%d-%m-%Y", errors='coerce')
+        columns = {"Stock Ticker": tickers, "Date Purchased": dates.to_numpy(dtype='datetime64[ns]').view(np.int64)}
+        for offset, name in enumerate(PortfolioModel.numeric_columns, start=2):
+            columns[name] = pd.to_numeric(pd.Series([row[offset] for row in rows], dtype=object), errors='coerce').to_numpy(dtype=float)
+        return ids, columns
+
+    def invalidate(self):
+        """Forget cached sort keys and permutations (called on every edit)."""
+        self.sort_keys.clear()
+        self.permutations.clear()
+
+    def append(self, lots):
+        lots = list(lots)
+        if not lots:
+            return
+        ids, columns = self.typed_columns(lots)
+        self.ids = np.concatenate([self.ids, ids])
+        for name, values in columns.items():
+            self.data[name] = np.concatenate([self.data[name], values])
+        self.invalidate()
+
+    def delete(self, lot_ids):
+        keep = ~np.isin(self.ids, np.asarray(list(lot_ids), dtype=np.int64))
+        self.ids = self.ids[keep]
+        for name in self.data:
+            self.data[name] = self.data[name][keep]
+        self.invalidate()
+
+    def sort_key(self, col):
+        """Float key for a column (NaN for missing values); tickers are ranked case-insensitively."""
+        if col not in self.sort_keys:
+            if col == "Stock Ticker":
+                lowered = np.array([ticker.lower() for ticker in self.data[col]], dtype=str)
+                self.sort_keys[col] = np.unique(lowered, return_inverse=True)[1].astype(float)
+            elif col == "Date Purchased":
+                dates = self.data[col]
+                self.sort_keys[col] = np.where(dates == np.iinfo(np.int64).min, np.nan, dates.astype(float))
+            else:
+                self.sort_keys[col] = self.data[col]
+        return self.sort_keys[col]
+
+    def argsort(self, order):
+        """
+        Stable permutation for a multi-column sort.
+
+        :param order: Sequence of (column, reverse) pairs, most significant first.
+        """
+        order = tuple((col, bool(reverse)) for col, reverse in order)
+        if order not in self.permutations:
+            # Negate descending keys instead of flipping the result, so ties keep their order
+            keys = [-self.sort_key(col) if reverse else self.sort_key(col) for col, reverse in order]
+            # np.lexsort sorts by the last key first
+            self.permutations[order] = np.lexsort(keys[::-1]) if keys else np.arange(len(self.ids))
+        return self.permutations[order]
+
+    def sorted_ids(self, order):
+        """Lot ids in the requested sort order."""
+        return self.ids[self.argsort(order)]
+
+
+def to_float(value):
+    """Store numbers as REAL; values typed into the GUI arrive as strings."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
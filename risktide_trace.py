@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# Stage-level instrumentation for the refresh pipeline, the metrics engine and the GUI.
+#
+#   with risktide_trace.run('refresh'):
+#       with risktide_trace.span('csv_load', path=path) as s:
+#           frame = pd.read_csv(path)
+#           s.rows = len(frame)
+#
+# A span records its wall time, the CPU time of its thread, a row count and, when memory tracing
+# is on, the peak allocation above its starting level. Each finished span becomes one JSON line
+# in a rotating log. Records are buffered and written in batches (when a run ends, when flush_records
+# have piled up or the oldest has waited flush_seconds, and at exit), so spans finishing on worker
+# threads only take a short lock and never wait on the file. Spans nest per thread; run() starts a new run id, and spans opened while no
+# run is active (Treeview updates, graph renders) belong to the last one started, so a refresh and
+# the GUI work that follows it read as one breakdown. Only the standard library is used here.
+#
+# Memory tracing uses tracemalloc, which slows allocation-heavy code down noticeably, so it is off
+# unless RISKTIDE_TRACE_MEMORY=1 or enable(memory_tracing=True). RISKTIDE_TRACE=0 turns spans off entirely.
+# Spans opened once per ticker (span(..., detailed=True)) would crowd the stages out of the log and
+# of the recent records, so they are only recorded with RISKTIDE_TRACE_DETAIL=1 or enable(detailed=True).
+
+# Rotating JSON-lines log of finished spans
+trace_file = 'risktide_trace.jsonl'
+max_log_bytes = 5 * 2**20
+log_backups = 3
+
+# Finished spans kept in memory for the Diagnostics window
+max_recent_spans = 10_000
+
+# Finished spans buffered before they are written to the log, and how long the oldest may wait
+flush_records = 512
+flush_seconds = 2.0
+
+enabled = os.environ.get('RISKTIDE_TRACE', '1') != '0'
+memory = os.environ.get('RISKTIDE_TRACE_MEMORY', '0') == '1'
+detail = os.environ.get('RISKTIDE_TRACE_DETAIL', '0') == '1'
+
+logger = logging.getLogger('risktide.trace')
+logger.propagate = False
+log_lock = threading.Lock()
+log_path = None
+log_handler = None
+
+# Records not written yet; log_lock is held while a batch is taken and written, so batches stay in order
+pending = []
+pending_lock = threading.Lock()
+pending_since = 0.0
+
+recent = deque(maxlen=max_recent_spans)
+local = threading.local()
+current_run = None
+
+# Open spans of every thread while memory tracing is on: tracemalloc keeps a single process-wide
+# peak, so it is folded into each open span before it is reset
+open_spans = set()
+memory_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage; set rows (or any field) while it is open."""
+
+    def __init__(self, name, run, parent, depth, rows=None, **fields):
+        self.name = name
+        self.run = run
+        self.parent = parent
+        self.depth = depth
+        self.rows = rows
+        self.fields = fields
+        self.start = None
+        self.peak = 0
+        self.start_bytes = 0
+
+    def record(self, wall, cpu, error):
+        record = {
+            'run': self.run,
+            'span': self.name,
+            'parent': self.parent,
+            'depth': self.depth,
+            'start': self.start,
+            'wall': round(wall, 6),
+            'cpu': round(cpu, 6),
+            'rows': None if self.rows is None else int(self.rows),
+            'peak_bytes': self.peak - self.start_bytes if memory else None,
+            'thread': threading.current_thread().name,
+            'error': error,
+        }
+        record.update(self.fields)
+        return record
+
+
+class NullSpan:
+    """Stands in for a span while tracing is off, so callers can always set rows."""
+
+    rows = None
+
+
+def enable(trace=True, memory_tracing=None, path=None, detailed=None):
+    """
+    Turn spans (and optionally peak allocation tracking and per-ticker spans) on or off.
+
+    :param path: Log file to write to instead of trace_file.
+    """
+    global enabled, memory, detail
+    enabled = trace
+    if memory_tracing is not None:
+        memory = memory_tracing
+    if detailed is not None:
+        detail = detailed
+    if path is not None:
+        set_log_path(path)
+
+
+def set_log_path(path):
+    """Write finished spans to path from now on (those still buffered go to the old log first)."""
+    global log_path, log_handler
+    flush()
+    with log_lock:
+        if log_handler is not None:
+            logger.removeHandler(log_handler)
+            log_handler.close()
+            log_handler = None
+        log_path = path
+
+
+def flush():
+    """Write every buffered record to the log."""
+    global log_handler
+    with log_lock:
+        with pending_lock:
+            records = pending[:]
+            pending.clear()
+        if not records:
+            return
+        try:
+            if log_handler is None:
+                # Opened on the first write so importing the module never creates the file
+                log_handler = RotatingFileHandler(log_path or trace_file, maxBytes=max_log_bytes, backupCount=log_backups, encoding='utf-8')
+                log_handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(log_handler)
+                logger.setLevel(logging.INFO)
+            for record in records:
+                logger.info(json.dumps(record, default=str))
+        except OSError:
+            pass  # A full disk or read-only directory must not break the pipeline
+
+
+atexit.register(flush)
+
+
+def buffer_record(record):
+    """Queue a finished span for the log, writing the batch once it is full or its oldest record has waited flush_seconds."""
+    global pending_since
+    now = time.monotonic()
+    with pending_lock:
+        if not pending:
+            pending_since = now
+        pending.append(record)
+        due = len(pending) >= flush_records or now - pending_since >= flush_seconds
+    if due:
+        flush()
+
+
+def stack():
+    if not hasattr(local, 'stack'):
+        local.stack = []
+    return local.stack
+
+
+def fold_peak():
+    """Credit the process-wide peak since the last reset to every open span, then reset it."""
+    peak = tracemalloc.get_traced_memory()[1]
+    for open_span in open_spans:
+        open_span.peak = max(open_span.peak, peak)
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def span(name, rows=None, detailed=False, **fields):
+    """
+    Time the enclosed block as a stage called name.
+
+    :param rows: Rows processed, when known up front; may also be set on the yielded span.
+    :param detailed: A span opened once per ticker (or other item), only recorded when per-ticker tracing is on.
+    :param fields: Extra values written with the record (ticker, plot, path, ...).
+    """
+    if not enabled or (detailed and not detail):
+        yield NullSpan()
+        return
+
+    spans = stack()
+    parent = spans[-1] if spans else None
+    current = Span(name, parent.run if parent else current_run, parent.name if parent else None, len(spans), rows, **fields)
+    current.start = datetime.now().isoformat(timespec='milliseconds')
+
+    if memory:
+        with memory_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            fold_peak()
+            current.start_bytes = current.peak = tracemalloc.get_traced_memory()[0]
+            open_spans.add(current)
+
+    spans.append(current)
+    error = None
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        spans.pop()
+        if memory and current in open_spans:
+            with memory_lock:
+                fold_peak()
+                open_spans.discard(current)
+        record = current.record(wall, cpu, error)
+        recent.append(record)
+        buffer_record(record)
+
+
+@contextmanager
+def run(name, **fields):
+    """Start a new run and time it as its top-level span; its records are on disk once it ends."""
+    global current_run
+    current_run = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    try:
+        with span(name, **fields) as current:
+            yield current
+    finally:
+        flush()
+
+
+def read_log(path=None):
+    """Every record in the log and its rotated backups, oldest first; unreadable lines are skipped."""
+    flush()
+    path = path or log_path or trace_file
+    records = []
+    for i in range(log_backups, -1, -1):
+        name = f'{path}.{i}' if i else path
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass
+    return records
+
+
+def last_run(path=None):
+    """
+    Records of the last run started in this process, or of the last run in the log when none was.
+
+    :return: List of span records in the order they finished.
+    """
+    records = list(recent)
+    if current_run is None:
+        records = read_log(path)
+    run_ids = [r['run'] for r in records if r.get('run') is not None]
+    if not run_ids:
+        return []
+    latest = current_run or run_ids[-1]
+    return [r for r in records if r.get('run') == latest]
+
+
+def breakdown(records):
+    """
+    Aggregate span records by name.
+
+    :return: List of dicts (span, calls, wall, cpu, rows, peak_mb, errors), in the order the stages first started.
+    """
+    stages = {}
+    for record in sorted(records, key=lambda r: (r.get('start') or '', r.get('depth', 0))):
+        stage = stages.setdefault(record['span'], {'span': record['span'], 'depth': record.get('depth', 0), 'calls': 0,
+                                                   'wall': 0.0, 'cpu': 0.0, 'rows': None, 'peak_mb': None, 'errors': 0})
+        stage['calls'] += 1
+        stage['wall'] += record.get('wall') or 0.0
+        stage['cpu'] += record.get('cpu') or 0.0
+        if record.get('rows') is not None:
+            stage['rows'] = (stage['rows'] or 0) + record['rows']
+        if record.get('peak_bytes') is not None:
+            stage['peak_mb'] = max(stage['peak_mb'] or 0.0, record['peak_bytes'] / 2**20)
+        if record.get('error'):
+            stage['errors'] += 1
+    return list(stages.values())
@@ -0,0 +1,201 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTreeview:
+    """
+    A ttk.Treeview that only materializes the rows on screen.
+
+    The full data lives in a backing model (row keys in display order plus a key -> values
+    mapping). The Treeview holds a fixed pool of item slots, one per visible row plus a
+    small buffer, and scrolling just rewrites the values of those slots. Selection, reordering
+    and deletion all work on row keys, so they cover rows that are not materialized.
+    """
+
+    def __init__(self, parent, columns, height=10, yscrollbar=None, buffer_rows=2, **kwargs):
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", height=height, selectmode="extended", **kwargs)
+        self.keys = []  # row keys in display order
+        self.values = {}  # row key -> tuple of column values
+        self.selected = set()
+        self.offset = 0
+        self.buffer_rows = buffer_rows
+        self.slots = []
+        self.updating_selection = False
+
+        self.yscrollbar = yscrollbar
+        if yscrollbar is not None:
+            yscrollbar.config(command=self.yview)
+
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", self.on_key_up)
+        self.tree.bind("<Down>", self.on_key_down)
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.visible_rows()) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll(self.visible_rows()) or "break")
+
+        self.resize_slots(height)
+
+    # Geometry -----------------------------------------------------------------------------
+
+    def pack(self, **kwargs):
+        self.tree.pack(**kwargs)
+
+    def row_height(self):
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight")) or 20
+        except (ValueError, tk.TclError):
+            return 20
+
+    def visible_rows(self):
+        return max(1, len(self.slots) - self.buffer_rows)
+
+    def on_configure(self, event):
+        # One row height is taken by the headings
+        rows = max(1, event.height // self.row_height() - 1)
+        if rows != self.visible_rows():
+            self.resize_slots(rows)
+
+    def resize_slots(self, rows):
+        """Keep exactly rows + buffer_rows items in the Treeview."""
+        wanted = rows + self.buffer_rows
+        while len(self.slots) < wanted:
+            slot = f"slot{len(self.slots)}"
+            self.tree.insert("", "end", iid=slot, values=())
+            self.slots.append(slot)
+        while len(self.slots) > wanted:
+            self.tree.delete(self.slots.pop())
+        self.refresh()
+
+    # Backing model ------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set_rows(self, rows):
+        """Replace all data with rows of (key, values)."""
+        self.keys = []
+        self.values = {}
+        for key, values in rows:
+            self.keys.append(key)
+            self.values[key] = tuple(values)
+        self.selected.clear()
+        self.offset = 0
+        self.refresh()
+
+    def extend(self, rows):
+        """Append rows of (key, values) at the end."""
+        for key, values in rows:
+            self.keys.append(key)
+            self.values[key] = tuple(values)
+        self.refresh()
+
+    def delete(self, keys):
+        """Remove rows by key."""
+        keys = set(keys)
+        if not keys:
+            return
+        self.keys = [key for key in self.keys if key not in keys]
+        for key in keys:
+            self.values.pop(key, None)
+        self.selected -= keys
+        self.refresh()
+
+    def selection(self):
+        """Selected row keys, in display order."""
+        return [key for key in self.keys if key in self.selected]
+
+    def reorder(self, keys):
+        """Show the rows in the given key order (must contain every key once)."""
+        self.keys = list(keys)
+        self.refresh()
+
+    # Scrolling ----------------------------------------------------------------------------
+
+    def max_offset(self):
+        return max(0, len(self.keys) - self.visible_rows())
+
+    def scroll_to(self, offset):
+        offset = min(max(0, int(offset)), self.max_offset())
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+        else:
+            self.update_scrollbar()
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def yview(self, *args):
+        """Scrollbar command: 'moveto fraction' or 'scroll n units|pages'."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * len(self.keys)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.visible_rows() if args[2] == "pages" else 1)
+            self.scroll(step)
+
+    def on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def on_key_up(self, event):
+        focus = self.tree.focus()
+        if focus == self.slots[0] and self.offset > 0:
+            self.scroll(-1)
+            return "break"
+
+    def on_key_down(self, event):
+        last = min(self.visible_rows(), len(self.keys) - self.offset) - 1
+        if last >= 0 and self.tree.focus() == self.slots[last] and self.offset < self.max_offset():
+            self.scroll(1)
+            return "break"
+
+    def update_scrollbar(self):
+        if self.yscrollbar is None:
+            return
+        total = len(self.keys)
+        if total == 0:
+            self.yscrollbar.set(0, 1)
+            return
+        first = self.offset / total
+        last = min(1.0, (self.offset + self.visible_rows()) / total)
+        self.yscrollbar.set(first, last)
+
+    # Rendering ----------------------------------------------------------------------------
+
+    def refresh(self):
+        """Write the rows at the current offset into the slot pool."""
+        self.offset = min(self.offset, self.max_offset())
+        self.updating_selection = True
+        try:
+            selected_slots = []
+            for i, slot in enumerate(self.slots):
+                row = self.offset + i
+                if row < len(self.keys):
+                    key = self.keys[row]
+                    self.tree.item(slot, values=self.values[key])
+                    if key in self.selected:
+                        selected_slots.append(slot)
+                else:
+                    self.tree.item(slot, values=())
+            self.tree.selection_set(selected_slots)
+        finally:
+            self.updating_selection = False
+        self.update_scrollbar()
+
+    def on_select(self, event=None):
+        """Mirror the slot selection into the backing model."""
+        if self.updating_selection:
+            return
+        visible = {}
+        for i, slot in enumerate(self.slots):
+            row = self.offset + i
+            if row < len(self.keys):
+                visible[slot] = self.keys[row]
+        # Rows scrolled out of view keep their selection state
+        self.selected -= set(visible.values())
+        self.selected |= {visible[slot] for slot in self.tree.selection() if slot in visible}
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import risktide_trace
+from risktide_files import atomic_write
+from risktide_benchmark import load_benchmark
+from risktide_cache import MetricsCache, metrics_cache_file, benchmark_version
+from risktide_store import PortfolioStore, PortfolioModel, portfolio_db_file, legacy_pickle_file, portfolio_columns
+from risktide_metrics import compute_metrics, save_summary, summary_file, spy_data_file
+from risktide_portfolio import add_portfolio_risk, save_portfolio_risk, portfolio_risk_file
+
+# A workspace holds many named portfolios (client accounts) next to each other:
+#
+#   portfolio.db, metrics_cache.pkl, stock_metrics_summary.csv, ...   the 'Default' portfolio, as before
+#   portfolios/<name>/portfolio.db, metrics_cache.pkl, ...            every other portfolio
+#
+# The benchmark is opened once (memory-mapped) and shared read-only by every portfolio. compute_all
+# runs the portfolios on a bounded thread pool: the benchmark, the open stores and the per-ticker
+# caches stay in one process without copies, and the NumPy kernels release the GIL for much of
+# their work. Each portfolio keeps its last results in memory together with the lot, benchmark and
+# price-history versions they were computed from, so unchanged portfolios are not recomputed, and
+# the GUI can switch between portfolios without reading them again.
+
+# Where the named portfolios live, one directory each
+workspace_dir = 'portfolios'
+
+# The portfolio kept in the working directory, as before workspaces existed
+default_portfolio_name = 'Default'
+
+# Versions the saved results of a portfolio were computed from
+results_file = 'results.json'
+
+# Portfolios computed at the same time
+default_workers = min(4, os.cpu_count() or 1)
+
+# Portfolio names double as directory names
+name_pattern = re.compile(r'^[\w][\w .-]{0,63}$')
+
+
+def price_versions(prices):
+    """Identity of the price-history store the returns come from: its directory and every ticker's version, None without one."""
+    if prices is None:
+        return None
+    return {'directory': os.path.abspath(prices.directory),
+            'tickers': {ticker: prices.version(ticker) for ticker in prices.tickers()}}
+
+
+class WorkspacePortfolio:
+    """One named portfolio: its store, metrics cache and latest results, kept open between uses."""
+
+    def __init__(self, name, directory, legacy_path=None):
+        self.name = name
+        self.directory = directory
+        self.store = PortfolioStore(self.path(portfolio_db_file), legacy_path=legacy_path)
+        self.cache = MetricsCache(self.path(metrics_cache_file)).load()
+        self.lock = threading.Lock()
+        self.summary = None
+        self.stats = None
+        self.versions = None  # (lot version, benchmark version, price versions) of summary
+        self.lots = None
+        self.model = None
+        self.lots_version = None
+        self.load_results()
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def load_results(self):
+        """Pick up the summary saved by an earlier run, with the versions it was computed from."""
+        try:
+            with open(self.path(results_file), 'r') as f:
+                saved = json.load(f)
+            self.summary = pd.read_csv(self.path(summary_file))
+            self.versions = (saved['lot_version'], saved['benchmark_version'], saved['price_versions'])
+        except (FileNotFoundError, ValueError, KeyError, pd.errors.EmptyDataError):
+            self.summary = None
+            self.versions = None
+
+    def save_results(self):
+        with atomic_write(self.path(results_file)) as f:
+            json.dump({'lot_version': self.versions[0], 'benchmark_version': self.versions[1], 'price_versions': self.versions[2]}, f)
+
+    def is_current(self, version, prices=None):
+        """True when the summary reflects the current lots, the given benchmark version and the price store (or none)."""
+        return self.summary is not None and self.versions == (self.store.version(), version, price_versions(prices))
+
+    def view_state(self):
+        """
+        Lots and sort model for the portfolio view, rebuilt only when the lots changed.
+
+        :return: (lots as [(id, values), ...], PortfolioModel)
+        """
+        version = self.store.version()
+        if self.lots is None or self.lots_version != version:
+            self.lots = self.store.all_lots()
+            self.model = PortfolioModel.from_lots(self.lots)
+            self.lots_version = version
+        return self.lots, self.model
+
+    def compute(self, spy_data, version, prices=None, force=False):
+        """
+        Recompute the metrics and portfolio risk unless the saved results are still current.
+
+        :param version: benchmark_version(spy_data), computed once by the caller.
+        :param prices: Optional PriceStore; results computed from another store, or without one, are not current.
+        :return: True when the portfolio was recomputed.
+        """
+        with self.lock:
+            versions = (self.store.version(), version, price_versions(prices))
+            if not force and self.summary is not None and self.versions == versions:
+                return False
+
+            with risktide_trace.span('portfolio_compute', portfolio=self.name) as span:
+                portfolio_df = self.store.to_frame()
+                span.rows = len(portfolio_df)
+                summary = compute_metrics(portfolio_df, spy_data, cache=self.cache, prices=prices)
+                summary, stats = add_portfolio_risk(summary, portfolio_df, spy_data, prices=prices)
+
+                save_summary(summary, self.path(summary_file))
+                save_portfolio_risk(stats, self.path(portfolio_risk_file))
+                self.cache.save()
+
+            # Swap the results at once so readers never see a half-updated portfolio
+            self.summary, self.stats, self.versions = summary, stats, versions
+            self.save_results()
+            return True
+
+    def close(self):
+        self.store.close()
+
+
+class Workspace:
+    """
+    Named portfolios sharing one benchmark.
+
+    Portfolios are opened on first use and stay open; the benchmark is loaded once and reloaded
+    only by load_benchmark(reload=True), e.g. after a refresh.
+    """
+
+    def __init__(self, root=workspace_dir, default_directory='.', benchmark_path=spy_data_file):
+        self.root = root
+        self.default_directory = default_directory
+        self.benchmark_path = benchmark_path
+        self.portfolios = {}
+        self.lock = threading.Lock()
+        self.spy_data = None
+        self.version = None
+
+    def names(self):
+        """The default portfolio first, then every named portfolio in the workspace directory, sorted."""
+        names = [default_portfolio_name]
+        if os.path.isdir(self.root):
+            names += sorted(name for name in os.listdir(self.root)
+                            if os.path.exists(os.path.join(self.root, name, portfolio_db_file)))
+        return names
+
+    def directory(self, name):
+        return self.default_directory if name == default_portfolio_name else os.path.join(self.root, name)
+
+    def portfolio(self, name):
+        """The open portfolio called name, opening it on first use."""
+        with self.lock:
+            portfolio = self.portfolios.get(name)
+            if portfolio is None:
+                if name not in self.names():
+                    raise KeyError(f"No portfolio named {name!r} in {self.root}")
+                # Only the default portfolio takes over the old portfolio.pkl
+                legacy_path = legacy_pickle_file if name == default_portfolio_name else None
+                portfolio = WorkspacePortfolio(name, self.directory(name), legacy_path=legacy_path)
+                self.portfolios[name] = portfolio
+            return portfolio
+
+    def create(self, name, lots=None):
+        """
+        Add an empty portfolio, or one holding lots (e.g. PortfolioStore.to_frame() of another store).
+
+        :raises ValueError: for names that are taken or not usable as a directory name.
+        """
+        if not name_pattern.match(name) or name in ('.', '..'):
+            raise ValueError(f"Invalid portfolio name {name!r}: use letters, digits, spaces, '.', '-' and '_'")
+        if name in self.names():
+            raise ValueError(f"A portfolio named {name!r} already exists")
+        os.makedirs(self.directory(name), exist_ok=True)
+        with self.lock:
+            portfolio = self.portfolios[name] = WorkspacePortfolio(name, self.directory(name))
+        if lots is not None and len(lots):
+            portfolio.store.add_lots(lots[list(portfolio_columns)].itertuples(index=False, name=None))
+        return portfolio
+
+    def remove(self, name):
+        """Delete a named portfolio and everything stored for it (the default portfolio cannot be removed)."""
+        if name == default_portfolio_name:
+            raise ValueError("The default portfolio cannot be removed")
+        with self.lock:
+            portfolio = self.portfolios.pop(name, None)
+        if portfolio is not None:
+            portfolio.close()
+        shutil.rmtree(self.directory(name))
+
+    def load_benchmark(self, reload=False):
+        """The shared benchmark, opened once from its memory-mapped cache."""
+        with self.lock:
+            if self.spy_data is None or reload:
+                with risktide_trace.span('benchmark_load', path=self.benchmark_path) as span:
+                    self.spy_data = load_benchmark(self.benchmark_path)
+                    self.version = benchmark_version(self.spy_data)
+                    span.rows = len(self.spy_data)
+            return self.spy_data
+
+    def compute_all(self, names=None, max_workers=default_workers, prices=None, force=False, progress=print):
+        """
+        Bring the results of every portfolio (or of names) up to date, several at a time.
+
+        :param max_workers: Portfolios computed concurrently.
+        :param progress: Called with a message as each portfolio finishes.
+        :return: dict name -> None when done, or the exception that stopped that portfolio.
+        """
+        spy_data = self.load_benchmark()
+        names = list(names or self.names())
+        outcome = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='portfolios') as executor:
+            futures = {executor.submit(self.compute_one, name, spy_data, prices, force): name for name in names}
+            for done, future in enumerate(as_completed(futures), start=1):
+                name = futures[future]
+                error = future.exception()
+                outcome[name] = error
+                if error is not None:
+                    status = f"failed: {error}"
+                elif future.result():
+                    status = "recomputed"
+                else:
+                    status = "up to date"
+                progress(f"[{done}/{len(names)}] {name}: {status}")
+        return outcome
+
+    def compute_one(self, name, spy_data, prices=None, force=False):
+        return self.portfolio(name).compute(spy_data, self.version, prices=prices, force=force)
+
+    def close(self):
+        with self.lock:
+            for portfolio in self.portfolios.values():
+                portfolio.close()
+            self.portfolios.clear()
@@ -0,0 +1,38 @@
+import os
+import sys
+import pytest
+
+# The modules live flat in the repository root; the synthetic data generator in benchmarks/
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [root, os.path.join(root, 'benchmarks')]
+
+import risktide_trace  # noqa: E402
+import risktide_synthetic  # noqa: E402
+
+# Spans would otherwise be logged to risktide_trace.jsonl in the working directory
+risktide_trace.enable(False)
+
+# Small enough to run in seconds, large enough that every ticker has a usable history
+test_tickers = 30
+test_lots_per_ticker = 40
+test_days = 800
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    """Paths of a seeded synthetic benchmark, portfolio CSV and JStock export."""
+    return risktide_synthetic.write_dataset(str(tmp_path_factory.mktemp('data')), test_tickers, test_lots_per_ticker, test_days)
+
+
+@pytest.fixture(scope='session')
+def spy_data(dataset):
+    from risktide_benchmark import load_benchmark
+
+    return load_benchmark(dataset['spy'])
+
+
+@pytest.fixture(scope='session')
+def portfolio_data(dataset):
+    from risktide_metrics import load_portfolio_data
+
+    return load_portfolio_data(dataset['portfolio'])
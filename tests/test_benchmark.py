@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_benchmark import load_benchmark, build_benchmark_cache, cache_dir_for, read_cache_meta
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'spy_data.csv'
+    write_closes(path, 100 + np.arange(50.0))
+    return str(path)
+
+
+def write_closes(path, close):
+    pd.DataFrame({'Date': pd.bdate_range('2024-01-01', periods=len(close)).strftime('%Y-%m-%d'), 'Close': close}).to_csv(path, index=False)
+
+
+def builds(csv_path):
+    cache_dir = cache_dir_for(csv_path)
+    return sorted(name for name in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, name)))
+
+
+def test_cache_matches_the_csv(csv_path):
+    spy = load_benchmark(csv_path)
+    frame = pd.read_csv(csv_path)
+    np.testing.assert_array_equal(spy.close, frame['Close'])
+    np.testing.assert_allclose(spy.returns, frame['Close'].pct_change())
+    np.testing.assert_array_equal(spy.dates, pd.to_datetime(frame['Date']).to_numpy())
+
+
+def test_rebuild_leaves_open_maps_alone(csv_path):
+    before = load_benchmark(csv_path)
+    write_closes(csv_path, 200 + np.arange(60.0))
+    after = load_benchmark(csv_path)
+
+    # The open benchmark still reads the build it mapped; the new one reads the new CSV
+    np.testing.assert_array_equal(before.close, 100 + np.arange(50.0))
+    np.testing.assert_array_equal(after.close, 200 + np.arange(60.0))
+    assert os.path.dirname(before.paths['close']) != os.path.dirname(after.paths['close'])
+
+
+def test_builds_before_the_previous_one_are_deleted(csv_path):
+    load_benchmark(csv_path)
+    first = builds(csv_path)
+    build_benchmark_cache(csv_path)
+    second = builds(csv_path)
+    build_benchmark_cache(csv_path)
+    current = read_cache_meta(cache_dir_for(csv_path))['build']
+
+    assert len(first) == 1 and len(second) == 2
+    # The previous build is kept for readers that read meta.json just before the switch
+    assert builds(csv_path) == sorted(set(second) - set(first) | {current})
+
+
+def test_old_cache_layout_is_replaced(csv_path):
+    cache_dir = cache_dir_for(csv_path)
+    os.makedirs(cache_dir)
+    for name in ('dates', 'close', 'returns'):
+        np.save(os.path.join(cache_dir, f'{name}.npy'), np.zeros(3))
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        f.write('{"version": 1}')
+
+    spy = load_benchmark(csv_path)
+    assert len(spy) == 50
+    assert sorted(os.listdir(cache_dir)) == sorted(builds(csv_path) + ['meta.json'])
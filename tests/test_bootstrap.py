@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from risktide_metrics import return_rows, metric_arrays
+from risktide_bootstrap import bootstrap_metrics, resample_rows, interval_metrics, bytes_per_row
+
+resamples = 12
+
+
+@pytest.fixture(scope='module')
+def rows(portfolio_data, spy_data):
+    """Return rows grouped by ticker, as bootstrap_metrics lays them out."""
+    tickers, codes, y, x, _ = return_rows(portfolio_data, spy_data)
+    order = np.argsort(codes, kind='stable')
+    return tickers, codes[order], y[order], x[order]
+
+
+@pytest.mark.parametrize('method', ['iid', 'block'])
+def test_replicates_do_not_depend_on_batching(rows, method):
+    tickers, codes, y, x = rows
+    whole = bootstrap_metrics(tickers, codes, y, x, resamples=resamples, method=method, seed=3)
+    # A cap of a few rows' worth of memory runs one resample per batch
+    single = bootstrap_metrics(tickers, codes, y, x, resamples=resamples, method=method, seed=3, max_bytes=bytes_per_row)
+    for metric in interval_metrics:
+        np.testing.assert_array_equal(single[metric], whole[metric], err_msg=metric)
+
+
+@pytest.mark.parametrize('method', ['iid', 'block'])
+def test_replicates_match_metrics_of_each_resample(rows, method):
+    tickers, codes, y, x = rows
+    k = len(tickers)
+    replicates = bootstrap_metrics(tickers, codes, y, x, resamples=resamples, method=method, seed=8)
+
+    sizes = np.bincount(codes, minlength=k)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    drawn = resample_rows(np.random.default_rng(8), codes, starts, sizes, resamples, method)
+    for b in range(resamples):
+        # Every resampled row stays within its own ticker
+        np.testing.assert_array_equal(codes[drawn[b]], codes)
+        expected = metric_arrays(codes, y[drawn[b]], x[drawn[b]], k)
+        for metric in interval_metrics:
+            np.testing.assert_allclose(replicates[metric][b], expected[metric].astype(np.float32), rtol=1e-5, atol=1e-6,
+                                       err_msg=f'{metric}, resample {b}')
+
+
+def test_blocks_are_consecutive_rows(rows):
+    tickers, codes, y, x = rows
+    sizes = np.bincount(codes, minlength=len(tickers))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    drawn = resample_rows(np.random.default_rng(1), codes, starts, sizes, 4, 'block', block_length=5)
+    position = np.arange(len(codes)) - starts[codes]
+    offset = drawn - starts[codes]
+    within_block = position % 5 != 0
+    step = (offset[:, 1:] - offset[:, :-1]) % sizes[codes[1:]]
+    assert np.all(step[:, within_block[1:]] == 1)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import pickle
+import pandas as pd
+from risktide_benchmark import load_benchmark
+from risktide_cache import MetricsCache
+from risktide_metrics import compute_metrics
+from test_metrics import assert_same_summary
+
+
+def cache_stats(capsys):
+    """(reused, recomputed) from the last compute_metrics run."""
+    line = [line for line in capsys.readouterr().out.splitlines() if line.startswith('Metrics cache:')][-1]
+    words = line.split()
+    return int(words[2]), int(words[5])
+
+
+def test_unchanged_inputs_reuse_every_ticker(portfolio_data, spy_data, tmp_path, capsys):
+    cache = MetricsCache(str(tmp_path / 'metrics_cache.pkl'))
+    first = compute_metrics(portfolio_data, spy_data, cache=cache)
+    assert cache_stats(capsys)[0] == 0
+    cache.save()
+
+    cache = MetricsCache(cache.path).load()
+    second = compute_metrics(portfolio_data, spy_data, cache=cache)
+    assert cache_stats(capsys) == (len(first), 0)
+    assert_same_summary(second, first, rtol=0, atol=0)
+
+
+def test_changed_lots_recompute_only_their_ticker(portfolio_data, spy_data, capsys):
+    cache = MetricsCache('unused.pkl')
+    compute_metrics(portfolio_data, spy_data, cache=cache)
+    capsys.readouterr()
+
+    ticker = portfolio_data['Stock Ticker'].iloc[0]
+    changed = portfolio_data.copy()
+    row = changed.index[changed['Stock Ticker'] == ticker][3]
+    changed.loc[row, 'Purchase Price'] *= 1.1
+    summary = compute_metrics(changed, spy_data, cache=cache)
+
+    assert cache_stats(capsys)[1] == 1
+    assert_same_summary(summary, compute_metrics(changed, spy_data), rtol=0, atol=0)
+
+
+def test_changed_benchmark_csv_misses_the_cache(dataset, portfolio_data, tmp_path, capsys):
+    csv_path = str(tmp_path / 'spy_data.csv')
+    shutil.copy(dataset['spy'], csv_path)
+    cache = MetricsCache('unused.pkl')
+    compute_metrics(portfolio_data, load_benchmark(csv_path), cache=cache)
+
+    # Touching the file without changing it keeps the cache
+    os.utime(csv_path, ns=(0, 0))
+    compute_metrics(portfolio_data, load_benchmark(csv_path), cache=cache)
+    assert cache_stats(capsys)[1] == 0
+
+    frame = pd.read_csv(csv_path)
+    frame.loc[len(frame) // 2, 'Close'] *= 1.05
+    frame.to_csv(csv_path, index=False)
+    spy_data = load_benchmark(csv_path)
+    summary = compute_metrics(portfolio_data, spy_data, cache=cache)
+    assert cache_stats(capsys)[0] == 0
+    assert_same_summary(summary, compute_metrics(portfolio_data, spy_data), rtol=0, atol=0)
+
+
+def test_other_cache_formats_are_discarded(tmp_path):
+    path = str(tmp_path / 'metrics_cache.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump({'format': 0, 'benchmark_version': 'x', 'entries': [('AAA', ('f', {}))]}, f)
+    assert len(MetricsCache(path).load()) == 0
@@ -0,0 +1,38 @@
+import json
+import pandas as pd
+import pytest
+import risktide_cli
+from risktide_metrics import compute_metrics
+from risktide_portfolio import add_portfolio_risk
+from test_metrics import assert_same_summary
+
+
+def test_compute_writes_the_engine_summary(dataset, spy_data, portfolio_data, tmp_path):
+    output = tmp_path / 'metrics.csv'
+    risk_output = tmp_path / 'portfolio_risk.csv'
+    exit_code = risktide_cli.main(['compute', '--portfolio', dataset['portfolio'], '--benchmark', dataset['spy'], '--no-cache',
+                                   '--output', str(output), '--portfolio-risk-output', str(risk_output)])
+    assert exit_code == risktide_cli.exit_ok
+
+    expected, stats = add_portfolio_risk(compute_metrics(portfolio_data, spy_data), portfolio_data, spy_data)
+    assert_same_summary(pd.read_csv(output), expected)
+    risk = pd.read_csv(risk_output).set_index('Metric')['Value']
+    assert risk['Volatility'] == pytest.approx(stats['Volatility'], rel=1e-12)
+
+
+def test_compute_processes_engine_and_json_output(dataset, spy_data, portfolio_data, tmp_path):
+    output = tmp_path / 'metrics.json'
+    exit_code = risktide_cli.main(['compute', '--portfolio', dataset['portfolio'], '--benchmark', dataset['spy'], '--no-cache',
+                                   '--no-portfolio-risk', '--engine', 'processes', '--workers', '2', '--chunksize', '4', '--output', str(output)])
+    assert exit_code == risktide_cli.exit_ok
+    with open(output, encoding='utf-8') as f:
+        summary = pd.DataFrame(json.load(f))
+    # to_json keeps 10 decimal places
+    assert_same_summary(summary, compute_metrics(portfolio_data, spy_data), atol=1e-9)
+
+
+def test_missing_input_is_an_error_exit(dataset, tmp_path):
+    exit_code = risktide_cli.main(['compute', '--portfolio', str(tmp_path / 'missing.db'), '--benchmark', dataset['spy'],
+                                   '--output', str(tmp_path / 'metrics.csv')])
+    assert exit_code == risktide_cli.exit_error
+    assert not (tmp_path / 'metrics.csv').exists()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_metrics import compute_metrics, return_rows
+from risktide_factors import regress_portfolio, build_factor_set
+
+
+@pytest.fixture(scope='module')
+def factor_path(tmp_path_factory, spy_data):
+    """A Fama-French style table (YYYYMMDD dates, percent returns) of two factors on most benchmark days."""
+    rng = np.random.default_rng(21)
+    dates = pd.DatetimeIndex(np.asarray(spy_data.dates))
+    dates = dates[rng.random(len(dates)) < 0.9]
+    path = tmp_path_factory.mktemp('factors') / 'factors.csv'
+    pd.DataFrame({'Date': dates.strftime('%Y%m%d').astype(int),
+                  'SMB': rng.normal(0, 0.6, len(dates)),
+                  'HML': rng.normal(0, 0.5, len(dates)),
+                  'RF': 0.01}).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def portfolio_df(dataset):
+    return pd.read_csv(dataset['portfolio'])
+
+
+def test_benchmark_factor_matches_summary(portfolio_df, portfolio_data, spy_data):
+    regression = regress_portfolio(portfolio_df, spy_data).set_index('Stock Ticker')
+    summary = compute_metrics(portfolio_data, spy_data).set_index('Stock Ticker').loc[regression.index]
+    for metric in ('Alpha', 'Beta', 'R²'):
+        np.testing.assert_allclose(regression[f'{metric} (SPY)'], summary[metric], rtol=1e-9, atol=1e-12, err_msg=metric)
+    # With one factor the multivariate fit is the univariate one
+    np.testing.assert_allclose(regression['Factor Beta (SPY)'], regression['Beta (SPY)'], rtol=1e-9, atol=1e-12)
+
+
+def test_multivariate_fit_matches_lstsq(portfolio_df, portfolio_data, spy_data, factor_path):
+    regression = regress_portfolio(portfolio_df, spy_data, [factor_path], percent=True).set_index('Stock Ticker')
+    factors = build_factor_set(spy_data, [factor_path], percent=True)
+    assert factors.names == ['SPY', 'SMB', 'HML']
+
+    tickers, codes, y, _, _, dates = return_rows(portfolio_data, spy_data, with_dates=True)
+    rows = factors.rows(dates)
+    complete = ~np.isnan(rows).any(axis=1)
+    checked = 0
+    for code, ticker in enumerate(tickers):
+        mine = complete & (codes == code)
+        if mine.sum() <= len(factors) + 1:
+            assert np.isnan(regression.loc[ticker, 'Factor Alpha'])
+            continue
+        design = np.column_stack([np.ones(mine.sum()), rows[mine]])
+        coef, _, _, _ = np.linalg.lstsq(design, y[mine], rcond=None)
+        fitted = design @ coef
+        r_squared = 1 - ((y[mine] - fitted) ** 2).sum() / ((y[mine] - y[mine].mean()) ** 2).sum()
+
+        row = regression.loc[ticker]
+        assert row['Factor Rows'] == mine.sum()
+        np.testing.assert_allclose(row[['Factor Alpha', 'Factor Beta (SPY)', 'Factor Beta (SMB)', 'Factor Beta (HML)']].to_numpy(dtype=float),
+                                   coef, rtol=1e-7, atol=1e-10, err_msg=ticker)
+        np.testing.assert_allclose(row['Factor R²'], r_squared, rtol=1e-7, atol=1e-10, err_msg=ticker)
+        checked += 1
+    assert checked > 0
@@ -0,0 +1,52 @@
+import pandas as pd
+import numpy as np
+import pytest
+from risktide_benchmark import load_benchmark
+from risktide_horizon import BenchmarkSource, LocalSource, refresh_benchmark, replace_store
+
+
+def split_source(dataset, tmp_path, stored_rows):
+    """A store holding the first stored_rows benchmark rows and a source holding all of them."""
+    full = pd.read_csv(dataset['spy'], dtype=str)
+    source_path = tmp_path / 'source.csv'
+    full.to_csv(source_path, index=False)
+    store_path = str(tmp_path / 'spy_data.csv')
+    replace_store(full.iloc[:stored_rows], store_path)
+    return full, LocalSource(str(source_path)), store_path
+
+
+def test_incremental_refresh_matches_a_full_download(dataset, tmp_path):
+    full, source, store_path = split_source(dataset, tmp_path, 700)
+    assert refresh_benchmark(source, store_path) == len(full) - 700
+
+    refreshed = load_benchmark(store_path)
+    reference = load_benchmark(dataset['spy'])
+    np.testing.assert_array_equal(refreshed.dates, reference.dates)
+    np.testing.assert_array_equal(refreshed.close, reference.close)
+    np.testing.assert_array_equal(refreshed.returns, reference.returns)
+    pd.testing.assert_frame_equal(pd.read_csv(store_path, dtype=str), full)
+
+
+def test_refresh_without_new_rows_leaves_the_store_alone(dataset, tmp_path):
+    full, source, store_path = split_source(dataset, tmp_path, len(pd.read_csv(dataset['spy'])))
+    assert refresh_benchmark(source, store_path) == 0
+    pd.testing.assert_frame_equal(pd.read_csv(store_path, dtype=str), full)
+
+
+def test_readjusted_source_reloads_the_full_history(dataset, tmp_path):
+    full, source, store_path = split_source(dataset, tmp_path, 700)
+    # The source now reports different closes for the stored overlap, as after a dividend re-adjustment
+    adjusted = full.copy()
+    adjusted['Close'] = (adjusted['Close'].astype(float) * 0.99).astype(str)
+    adjusted.to_csv(source.path, index=False)
+
+    assert refresh_benchmark(source, store_path) == len(full)
+    np.testing.assert_allclose(load_benchmark(store_path).close, adjusted['Close'].astype(float))
+
+
+def test_a_source_without_fetch_cannot_be_created():
+    class Incomplete(BenchmarkSource):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
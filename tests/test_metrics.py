@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_metrics import compute_metrics, summary_columns, spy_frame
+
+
+def assert_same_summary(actual, expected, rtol=1e-9, atol=1e-12):
+    """Same tickers and columns, every metric equal up to rounding (NaN where the other is NaN)."""
+    actual = actual.set_index('Stock Ticker').sort_index()
+    expected = expected.set_index('Stock Ticker').sort_index()
+    assert list(actual.index) == list(expected.index)
+    assert list(actual.columns) == list(expected.columns)
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=rtol, atol=atol)
+
+
+@pytest.fixture(scope='module')
+def reference(portfolio_data, spy_data):
+    """process_stock for every ticker, the original per-ticker implementation."""
+    return compute_metrics(portfolio_data, spy_frame(spy_data), engine='threads', max_workers=1)
+
+
+def test_reference_covers_every_ticker(reference, portfolio_data):
+    assert list(reference.columns) == summary_columns
+    assert len(reference) == portfolio_data['Stock Ticker'].nunique()
+
+
+def test_vectorized_matches_process_stock(reference, portfolio_data, spy_data):
+    assert_same_summary(compute_metrics(portfolio_data, spy_data, engine='vectorized'), reference)
+
+
+def test_vectorized_accepts_a_benchmark_frame(portfolio_data, spy_data):
+    assert_same_summary(compute_metrics(portfolio_data, spy_frame(spy_data)), compute_metrics(portfolio_data, spy_data), rtol=0, atol=0)
+
+
+def test_processes_match_process_stock(reference, portfolio_data, spy_data):
+    summary = compute_metrics(portfolio_data, spy_data, engine='processes', max_workers=2, chunksize=7)
+    assert_same_summary(summary, reference)
+
+
+def test_vectorized_skips_tickers_like_process_stock(spy_data):
+    # One lot only, or no lot on a benchmark trading day: not enough data for any metric
+    dates = pd.Series(pd.to_datetime(spy_data.dates[:5])).dt.strftime('%d-%m-%Y')
+    lots = pd.DataFrame({
+        'Stock Ticker': ['ONE', 'OK', 'OK', 'OK', 'OK'],
+        'Date Purchased': list(dates),
+        'Purchase Price': [10.0, 10.0, 11.0, 10.5, 12.0],
+    })
+    vectorized = compute_metrics(lots, spy_data)
+    reference = compute_metrics(lots, spy_frame(spy_data), engine='threads', max_workers=1)
+    assert list(vectorized['Stock Ticker']) == ['OK']
+    assert_same_summary(vectorized, reference)
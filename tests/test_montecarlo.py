@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from risktide_portfolio import build_panel, blocked_covariance
+from risktide_montecarlo import covariance_model
+
+
+@pytest.fixture(scope='module')
+def panel(portfolio_data, spy_data):
+    return build_panel(portfolio_data, spy_data)
+
+
+def test_bootstrap_days_match_dense_panel(panel):
+    simulated = np.zeros(len(panel), dtype=bool)
+    simulated[1::2] = True
+    model = covariance_model(panel, simulated, 'bootstrap')
+    # Historical days as the dense matrix would give them: deviation from the mean, 0 where missing
+    dense = np.nan_to_num(panel.block(0, len(panel))[:, simulated] - model.mean)
+    days = np.random.default_rng(2).integers(0, len(panel.dates), 500)
+    np.testing.assert_allclose(model.historical_days(days), dense[days], rtol=0, atol=1e-15)
+
+
+def test_covariance_loadings_reproduce_the_simulated_covariance(panel):
+    simulated = np.zeros(len(panel), dtype=bool)
+    simulated[::3] = True
+    model = covariance_model(panel, simulated, 'normal', block_size=4)
+    expected = np.nan_to_num(blocked_covariance(panel))[np.ix_(simulated, simulated)]
+    values, vectors = np.linalg.eigh(expected)
+    keep = values > values.max() * 1e-12
+    psd = (vectors[:, keep] * values[keep]) @ vectors[:, keep].T
+    np.testing.assert_allclose(model.loadings @ model.loadings.T, psd, rtol=1e-9, atol=1e-15)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_portfolio import ReturnPanel, build_panel, blocked_covariance, portfolio_risk, modelled_weights
+
+
+@pytest.fixture(scope='module')
+def panel(portfolio_data, spy_data):
+    return build_panel(portfolio_data, spy_data)
+
+
+def test_same_day_returns_are_compounded():
+    dates = np.array(['2024-01-02', '2024-01-03', '2024-01-03', '2024-01-02'], dtype='datetime64[ns]')
+    panel = ReturnPanel(['A', 'B'], np.array([0, 0, 0, 1]), dates, np.array([0.01, 0.10, -0.05, 0.02]), benchmark=np.array([0.0, 0.02, 0.01, 0.0]))
+    np.testing.assert_array_equal(panel.codes, [0, 0, 1])
+    np.testing.assert_allclose(panel.values, [0.01, 1.10 * 0.95 - 1, 0.02])
+    np.testing.assert_allclose(panel.benchmark, [0.0, 1.02 * 1.01 - 1, 0.0])
+    np.testing.assert_array_equal(panel.counts(), [2, 1])
+
+
+def test_blocked_covariance_matches_pandas(panel):
+    dense = pd.DataFrame(panel.block(0, len(panel)))
+    # A block size that does not divide the ticker count exercises the ragged last block
+    np.testing.assert_allclose(blocked_covariance(panel, block_size=7), dense.cov().to_numpy(), rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(blocked_covariance(panel, block_size=7, correlation=True), dense.corr().to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+def test_weighted_series_rescales_over_present_tickers(panel):
+    weights = np.random.default_rng(4).random(len(panel))
+    weights[::5] = 0.0
+    dense = panel.block(0, len(panel))
+    present = ~np.isnan(dense)
+    weight_present = (present * weights).sum(axis=1)
+    covered = weight_present > 0
+    expected = np.nansum(dense * weights, axis=1)[covered] / weight_present[covered]
+    np.testing.assert_allclose(panel.weighted_series(weights), expected, rtol=1e-12, atol=1e-15)
+
+
+
+def test_blocked_risk_matches_dense_covariance(panel):
+    capital = np.random.default_rng(6).random(len(panel)) * 1000
+    capital[::4] = 0.0
+    stats, positions = portfolio_risk(panel, capital, block_size=7)
+
+    modelled, weights = modelled_weights(panel, capital)
+    covariance = np.nan_to_num(blocked_covariance(panel))
+    variance = weights @ covariance @ weights
+    assert stats['Variance'] == pytest.approx(variance, rel=1e-9)
+    assert stats['Volatility'] == pytest.approx(np.sqrt(variance), rel=1e-9)
+    np.testing.assert_allclose(positions['Volatility'], np.sqrt(np.diag(blocked_covariance(panel))), rtol=1e-9)
+    # The component VaRs add up to the parametric VaR
+    assert np.nansum(positions['Component VaR (95%)']) == pytest.approx(stats['Parametric VaR (95%)'], rel=1e-9)
+
+
+def test_negative_variance_is_reported():
+    # A and B move together on days 0-3, B and C on days 3-5, A and C against each other on days 6-9:
+    # every pair is consistent on its own dates, but together they are not positive semi-definite
+    days = {0: {0: .01, 1: -.01, 2: .02, 3: -.02, 6: .01, 7: -.01, 8: .02, 9: -.02},
+            1: {0: .01, 1: -.01, 2: .02, 3: -.02, 4: .01, 5: -.01},
+            2: {3: -.02, 4: .01, 5: -.01, 6: -.01, 7: .01, 8: -.02, 9: .02}}
+    codes = np.array([code for code, returns in days.items() for _ in returns])
+    dates = np.array([np.datetime64('2024-01-01') + np.timedelta64(day, 'D') for returns in days.values() for day in returns], dtype='datetime64[ns]')
+    values = np.array([value for returns in days.values() for value in returns.values()])
+    panel = ReturnPanel(['A', 'B', 'C'], codes, dates, values)
+
+    with pytest.warns(RuntimeWarning, match='not positive semi-definite'):
+        stats, positions = portfolio_risk(panel, np.array([1000.0, -1000.0, 1000.0]))
+    assert stats['Variance'] < 0
+    assert np.isnan(stats['Volatility']) and np.isnan(stats['Parametric VaR (95%)'])
+    assert positions['Marginal VaR (95%)'].isna().all()
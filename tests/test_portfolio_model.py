@@ -0,0 +1,47 @@
+import numpy as np
+from risktide_store import PortfolioModel
+
+lots = [
+    (1, ('msft', '03-01-2024', 5, 370.0, 1850.0)),
+    (2, ('AAPL', '02-01-2024', 10, 185.5, 1855.0)),
+    (3, ('aapl', 'not a date', 2, 182.0, 364.0)),
+    (4, ('MSFT', '02-01-2024', 'n/a', 371.0, None)),
+    (5, ('Aapl', '', 10, 190.0, 1900.0)),
+    (6, ('GOOG', '15-02-2024', 10, 140.0, 1400.0)),
+]
+
+
+def test_tickers_sort_case_insensitively_and_ties_keep_their_order():
+    model = PortfolioModel.from_lots(lots)
+    assert model.sorted_ids([('Stock Ticker', False)]).tolist() == [2, 3, 5, 6, 1, 4]
+    # Descending reverses the keys, not the ties
+    assert model.sorted_ids([('Stock Ticker', True)]).tolist() == [1, 4, 6, 2, 3, 5]
+
+
+def test_missing_values_sort_last_in_both_directions():
+    model = PortfolioModel.from_lots(lots)
+    assert model.sorted_ids([('Date Purchased', False)]).tolist() == [2, 4, 1, 6, 3, 5]
+    assert model.sorted_ids([('Date Purchased', True)]).tolist() == [6, 1, 2, 4, 3, 5]
+    assert model.sorted_ids([('Units Purchased', False)]).tolist()[-1] == 4
+    assert model.sorted_ids([('Total Purchase Price', True)]).tolist()[-1] == 4
+
+
+def test_multi_column_sort():
+    model = PortfolioModel.from_lots(lots)
+    order = [('Units Purchased', True), ('Stock Ticker', False), ('Purchase Price', True)]
+    assert model.sorted_ids(order).tolist() == [5, 2, 6, 1, 3, 4]
+
+    rows = {lot_id: values for lot_id, values in lots}
+    expected = sorted(rows, key=lambda lot_id: (-float(rows[lot_id][2]) if rows[lot_id][2] != 'n/a' else np.inf,
+                                                rows[lot_id][0].lower(), -rows[lot_id][3]))
+    assert model.sorted_ids(order).tolist() == expected
+
+
+def test_edits_drop_cached_orders():
+    model = PortfolioModel.from_lots(lots)
+    order = [('Purchase Price', False)]
+    assert model.sorted_ids(order).tolist() == [6, 3, 2, 5, 1, 4]
+
+    model.delete([6, 3])
+    model.append([(7, ('TSLA', '01-03-2024', 1, 100.0, 100.0))])
+    assert model.sorted_ids(order).tolist() == [7, 2, 5, 1, 4]
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_prices import PriceStore, asof_positions
+
+dates = pd.bdate_range('2023-01-02', periods=120)
+close = 100 * np.exp(np.cumsum(np.random.default_rng(9).normal(0, 0.01, len(dates))))
+
+
+def history(store, ticker):
+    stored_dates, stored_close = store.load(ticker)
+    return np.asarray(stored_dates), np.asarray(stored_close)
+
+
+def test_appends_and_backfills_equal_a_full_ingest(tmp_path):
+    full = PriceStore(str(tmp_path / 'full'))
+    full.append('AAA', dates, close)
+
+    store = PriceStore(str(tmp_path / 'pieces'))
+    assert store.append('AAA', dates[40:80], close[40:80]) == 40
+    assert store.append('AAA', dates[80:], close[80:]) == 40
+    generation = store.generation('AAA')
+    # A backfill overlapping the stored rows is merged and the ticker rewritten
+    assert store.append('AAA', dates[:45], close[:45]) == 40
+    assert store.generation('AAA') == generation + 1
+
+    reopened = PriceStore(store.directory)
+    for actual, expected in zip(history(reopened, 'AAA'), history(full, 'AAA')):
+        np.testing.assert_array_equal(actual, expected)
+    assert reopened.version('AAA') != full.version('AAA')  # same rows, but it went through a rewrite
+
+
+def test_corrections_replace_stored_values(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.append('AAA', dates, close)
+    version = store.version('AAA')
+    store.append('AAA', dates[10:12], [1.0, 2.0])
+
+    _, stored = history(PriceStore(store.directory), 'AAA')
+    np.testing.assert_array_equal(stored[10:12], [1.0, 2.0])
+    np.testing.assert_array_equal(np.delete(stored, [10, 11]), np.delete(close, [10, 11]))
+    assert store.version('AAA') != version
+
+
+def test_rows_past_the_index_are_ignored_and_cut_off(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.append('AAA', dates[:50], close[:50])
+    # An append that wrote its rows but died before saving the index
+    store.append('AAA', dates[50:60], close[50:60], save=False)
+
+    reopened = PriceStore(store.directory)
+    assert reopened.rows('AAA') == 50
+    reopened.append('AAA', dates[50:], close[50:])
+    np.testing.assert_array_equal(history(PriceStore(store.directory), 'AAA')[1], close)
+
+
+def test_asof_positions_tolerance():
+    index = np.array(['2024-01-02', '2024-01-03', '2024-01-08'], dtype='datetime64[ns]')
+    lookup = np.array(['2024-01-01', '2024-01-02', '2024-01-05', '2024-01-08', '2024-01-20'], dtype='datetime64[ns]')
+    assert asof_positions(lookup, index).tolist() == [-1, 0, 1, 2, 2]
+    assert asof_positions(lookup, index, tolerance=0).tolist() == [-1, 0, -1, 2, -1]
+    assert asof_positions(lookup, index, tolerance='2D').tolist() == [-1, 0, 1, 2, -1]
+    assert asof_positions(lookup, index, tolerance=pd.Timedelta(days=1)).tolist() == [-1, 0, -1, 2, -1]
+
+
+def test_other_layout_versions_are_rejected(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.append('AAA', dates, close)
+    store.index['version'] = 0
+    store.save_index()
+    with pytest.raises(ValueError, match='layout version'):
+        PriceStore(store.directory)
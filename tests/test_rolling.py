@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+import risktide_cli
+from risktide_metrics import return_rows
+from risktide_prices import PriceStore
+from risktide_rolling import rolling_metrics, parse_windows
+
+windows = (5, 21)
+
+
+def naive_rolling(portfolio_data, spy_data, window, prices=None):
+    """Rolling metrics of every ticker from plain pandas rolling windows over its own rows."""
+    tickers, codes, y, x, _, dates = return_rows(portfolio_data, spy_data, prices=prices, with_dates=True)
+    frames = []
+    for code, ticker in enumerate(tickers):
+        rows = codes == code
+        stock = pd.Series(y[rows])
+        spy = pd.Series(x[rows])
+        wealth = (1 + stock).cumprod()
+        downside_std = stock.rolling(window).apply(lambda r: r[r < 0].std(ddof=1) if (r < 0).sum() >= 2 else np.nan, raw=True)
+        spy_var = spy.rolling(window).var()
+        frames.append(pd.DataFrame({
+            'Stock Ticker': ticker,
+            'Date': dates[rows],
+            'Window': window,
+            'Beta': np.where(spy_var > 0, stock.rolling(window).cov(spy) / spy_var, 0.0),
+            'Sharpe Ratio': stock.rolling(window).mean() / stock.rolling(window).std(),
+            'Sortino Ratio': np.where(downside_std > 0, stock.rolling(window).mean() / downside_std, np.nan),
+            'Drawdown': wealth / wealth.rolling(window).max() - 1,
+            'VaR (95%)': stock.rolling(window).apply(lambda r: np.percentile(r, 5), raw=True),
+        }).iloc[window - 1:])
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def prices(tmp_path_factory, portfolio_data, spy_data):
+    """Daily closes of a few portfolio tickers on the benchmark's trading days."""
+    rng = np.random.default_rng(17)
+    store = PriceStore(str(tmp_path_factory.mktemp('prices') / 'price_history'))
+    for ticker in portfolio_data['Stock Ticker'].unique()[:5]:
+        close = 30 * np.exp(np.cumsum(rng.normal(0.0002, 0.015, len(spy_data.dates))))
+        store.append(ticker, np.asarray(spy_data.dates), close)
+    return store
+
+
+def assert_same_rolling(actual, expected):
+    assert len(actual) == len(expected)
+    assert list(actual['Stock Ticker'].astype(str)) == list(expected['Stock Ticker'])
+    np.testing.assert_array_equal(actual['Date'].to_numpy(), expected['Date'].to_numpy())
+    for column in ('Beta', 'Sharpe Ratio', 'Sortino Ratio', 'Drawdown', 'VaR (95%)'):
+        # The rolling metrics are stored as float32
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-5, atol=1e-6, err_msg=column)
+
+
+@pytest.mark.parametrize('window', windows)
+def test_rolling_matches_pandas_windows(portfolio_data, spy_data, window):
+    rolling = rolling_metrics(portfolio_data, spy_data, windows=windows)
+    assert_same_rolling(rolling[rolling['Window'] == window].reset_index(drop=True), naive_rolling(portfolio_data, spy_data, window))
+
+
+def test_rolling_windows_count_trading_days_with_prices(portfolio_data, spy_data, prices):
+    rolling = rolling_metrics(portfolio_data, spy_data, windows=(21, 63), prices=prices)
+    assert set(rolling['Stock Ticker'].astype(str)) == set(prices.tickers())
+    for window in (21, 63):
+        actual = rolling[rolling['Window'] == window].reset_index(drop=True)
+        assert_same_rolling(actual, naive_rolling(portfolio_data, spy_data, window, prices=prices))
+        # One value per trading day once the window is full
+        assert len(actual) == len(prices.tickers()) * (len(spy_data.dates) - window)
+
+
+def test_parse_windows():
+    assert parse_windows('63, 21,252,21') == (21, 63, 252)
+    with pytest.raises(ValueError):
+        parse_windows('1,5')
+
+
+def test_cli_rolling_reads_the_price_store(dataset, portfolio_data, spy_data, prices, tmp_path):
+    output = tmp_path / 'rolling.csv'
+    exit_code = risktide_cli.main(['rolling', '--portfolio', dataset['portfolio'], '--benchmark', dataset['spy'],
+                                   '--prices', prices.directory, '--windows', '21', '--output', str(output)])
+    assert exit_code == risktide_cli.exit_ok
+    written = pd.read_csv(output)
+    assert len(written) == len(rolling_metrics(portfolio_data, spy_data, windows=(21,), prices=prices))
+    assert set(written['Stock Ticker']) == set(prices.tickers())
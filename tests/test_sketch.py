@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_prices import PriceStore
+from risktide_sketch import ReturnSketch, SketchStore, exact_summary, price_return_rows, default_alpha
+
+sketch_tickers = ('AAA', 'BBB', 'CCC', 'DDD')
+sketch_days = 1500
+
+
+@pytest.fixture
+def prices(tmp_path):
+    """A price-history store of a few tickers with random-walk closes, one ending early."""
+    rng = np.random.default_rng(11)
+    store = PriceStore(str(tmp_path / 'price_history'))
+    dates = pd.bdate_range('2015-01-01', periods=sketch_days)
+    for i, ticker in enumerate(sketch_tickers):
+        days = sketch_days - 400 * (i == 3)
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.01 + 0.005 * i, days)))
+        store.append(ticker, dates[:days], close)
+    return store
+
+
+def full_sketch(prices, tickers=None):
+    tickers = list(prices.tickers() if tickers is None else tickers)
+    codes, dates, returns = price_return_rows(prices, tickers)
+    return ReturnSketch().add(tickers, codes, dates, returns)
+
+
+def assert_within_alpha(actual, expected):
+    """VaR within alpha of the exact order statistic, Expected Shortfall within alpha of the exact loss mean."""
+    assert list(actual['Stock Ticker']) == list(expected['Stock Ticker'])
+    np.testing.assert_array_equal(actual['Returns'], expected['Returns'])
+    for column in expected.columns[2:]:
+        exact = expected[column].to_numpy()
+        assert np.all(expected[column] < 0), column
+        np.testing.assert_array_less(np.abs(actual[column].to_numpy() - exact), default_alpha * np.abs(exact) + 1e-12, err_msg=column)
+
+
+def test_summary_within_alpha_of_exact(prices):
+    sketch = full_sketch(prices)
+    assert_within_alpha(sketch.summary(), exact_summary(prices))
+    assert_within_alpha(sketch.summary(pooled=True), exact_summary(prices, pooled=True))
+
+
+def test_select_matches_exact_periods(prices):
+    sketch = full_sketch(prices).select(['BBB', 'DDD'], start='2016-03', end='2018-06')
+    assert_within_alpha(sketch.summary(), exact_summary(prices, ['BBB', 'DDD'], start='2016-03', end='2018-06'))
+
+
+def assert_same_sketch(actual, expected):
+    """Same counts per (ticker, period, bucket), whatever the ticker codes."""
+    def rows(sketch):
+        frame = pd.DataFrame({'ticker': np.asarray(sketch.tickers, dtype=object)[sketch.codes], 'period': sketch.periods,
+                              'key': sketch.keys, 'count': sketch.counts})
+        return frame.sort_values(['ticker', 'period', 'key']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(rows(actual), rows(expected))
+
+
+def test_merged_sketches_equal_whole(prices):
+    merged = full_sketch(prices, sketch_tickers[:2]).merge(full_sketch(prices, sketch_tickers[2:]))
+    assert_same_sketch(merged, full_sketch(prices))
+    pd.testing.assert_frame_equal(merged.summary(pooled=True), full_sketch(prices).summary(pooled=True))
+
+
+def test_incremental_update_equals_rebuild(tmp_path):
+    rng = np.random.default_rng(5)
+    dates = pd.bdate_range('2020-01-01', periods=600)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+    prices = PriceStore(str(tmp_path / 'price_history'))
+    store = SketchStore(str(tmp_path / 'return_sketches.npz'))
+
+    prices.append('AAA', dates[:350], close[:350])
+    store.update(prices)
+    store.save()
+    prices.append('AAA', dates[350:], close[350:])
+    store = SketchStore(store.path).load()
+    assert store.update(prices) == 250
+    assert_same_sketch(store.sketch, full_sketch(prices))
+
+    # A backfill rewrites the ticker, so its sketch is rebuilt rather than added to twice
+    prices.append('AAA', dates[:10], close[:10] * 1.01)
+    store.update(prices)
+    assert_same_sketch(store.sketch, full_sketch(prices))
@@ -0,0 +1,74 @@
+import os
+import pickle
+import pandas as pd
+from risktide_store import PortfolioStore, portfolio_columns
+
+lots = [
+    ('AAPL', '02-01-2024', 10, 185.5, 1855.0),
+    ('MSFT', '03-01-2024', '5', '370.0', '1850.0'),
+    ('AAPL', '15-02-2024', 2, 182.0, 364.0),
+]
+
+
+def test_legacy_pickle_is_migrated_once(tmp_path):
+    legacy = tmp_path / 'portfolio.pkl'
+    with open(legacy, 'wb') as f:
+        pickle.dump(lots, f)
+    db = str(tmp_path / 'portfolio.db')
+
+    store = PortfolioStore(db, legacy_path=str(legacy))
+    frame = store.to_frame()
+    assert list(frame.columns) == list(portfolio_columns)
+    assert list(frame['Stock Ticker']) == ['AAPL', 'MSFT', 'AAPL']
+    # Numbers typed as strings are stored as REAL
+    assert frame['Units Purchased'].tolist() == [10.0, 5.0, 2.0]
+    store.close()
+
+    # An existing store is not migrated into again
+    store = PortfolioStore(db, legacy_path=str(legacy))
+    assert store.count() == len(lots)
+    store.close()
+
+
+def test_store_without_legacy_file_starts_empty(tmp_path):
+    store = PortfolioStore(str(tmp_path / 'portfolio.db'), legacy_path=str(tmp_path / 'missing.pkl'))
+    assert store.count() == 0 and store.version() == 0
+    store.close()
+
+
+def test_every_change_bumps_the_version(tmp_path):
+    store = PortfolioStore(str(tmp_path / 'portfolio.db'), legacy_path=None)
+    ids = store.add_lots(lots)
+    added = store.version()
+    assert added > 0
+
+    assert store.delete_lots(ids[:2]) == 2
+    assert store.version() > added
+    assert [lot_id for lot_id, _ in store.all_lots()] == ids[2:]
+
+    # Deleting nothing is not a change
+    deleted = store.version()
+    assert store.delete_lots([]) == 0
+    assert store.version() == deleted
+    store.close()
+
+
+def test_export_is_skipped_while_the_lots_are_unchanged(tmp_path):
+    store = PortfolioStore(str(tmp_path / 'portfolio.db'), legacy_path=None)
+    path = str(tmp_path / 'portfolio_data.csv')
+    store.add_lots(lots)
+
+    assert store.export_csv(path)
+    modified = os.stat(path).st_mtime_ns
+    assert not store.export_csv(path)
+    assert os.stat(path).st_mtime_ns == modified
+
+    store.delete_lots([store.all_lots()[0][0]])
+    assert store.export_csv(path)
+    assert len(pd.read_csv(path)) == len(lots) - 1
+
+    # A missing file is written again, and force always writes
+    os.remove(path)
+    assert store.export_csv(path)
+    assert store.export_csv(path, force=True)
+    store.close()
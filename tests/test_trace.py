@@ -0,0 +1,56 @@
+import threading
+import pytest
+import risktide_trace
+
+
+@pytest.fixture
+def trace(tmp_path):
+    """Tracing on, logging to a temporary file; off again afterwards like the rest of the suite."""
+    path = str(tmp_path / 'trace.jsonl')
+    risktide_trace.enable(True, path=path)
+    risktide_trace.recent.clear()
+    yield path
+    risktide_trace.enable(False, detailed=False)
+    risktide_trace.set_log_path(None)
+
+
+def test_spans_are_buffered_until_the_run_ends(trace):
+    with risktide_trace.run('refresh'):
+        with risktide_trace.span('csv_load', rows=10):
+            pass
+        with open(trace, 'a+', encoding='utf-8') as f:
+            f.seek(0)
+            assert f.read() == ''
+    names = [record['span'] for record in risktide_trace.read_log(trace)]
+    assert names == ['csv_load', 'refresh']
+    assert [record['depth'] for record in risktide_trace.last_run()] == [1, 0]
+
+
+def test_full_batches_are_written_without_a_run(trace, monkeypatch):
+    monkeypatch.setattr(risktide_trace, 'flush_records', 3)
+    for _ in range(3):
+        with risktide_trace.span('graph_render'):
+            pass
+    with open(trace, encoding='utf-8') as f:
+        assert len(f.readlines()) == 3
+
+
+def test_per_ticker_spans_need_detailed_tracing(trace):
+    def worker(ticker):
+        with risktide_trace.span('merge', detailed=True, ticker=ticker):
+            pass
+
+    with risktide_trace.run('metrics'):
+        threads = [threading.Thread(target=worker, args=(f'T{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert [record['span'] for record in risktide_trace.last_run()] == ['metrics']
+
+    risktide_trace.enable(True, detailed=True)
+    with risktide_trace.run('metrics'):
+        worker('AAA')
+    records = risktide_trace.last_run()
+    assert [(record['span'], record.get('ticker')) for record in records] == [('merge', 'AAA'), ('metrics', None)]
+    assert len(risktide_trace.read_log(trace)) == 3
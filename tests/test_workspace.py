@@ -0,0 +1,74 @@
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from risktide_prices import PriceStore
+from risktide_workspace import Workspace, default_portfolio_name
+
+
+@pytest.fixture
+def workspace(dataset, tmp_path):
+    """A workspace whose default portfolio holds the synthetic lots, on its own copy of the benchmark."""
+    benchmark = str(tmp_path / 'spy_data.csv')
+    shutil.copy(dataset['spy'], benchmark)
+    workspace = Workspace(root=str(tmp_path / 'portfolios'), default_directory=str(tmp_path), benchmark_path=benchmark)
+    portfolio = workspace.portfolio(default_portfolio_name)
+    lots = pd.read_csv(dataset['portfolio'])
+    portfolio.store.add_lots(lots.itertuples(index=False, name=None))
+    yield workspace
+    workspace.close()
+
+
+def recomputed(workspace, prices=None):
+    outcome = {}
+    workspace.compute_all(prices=prices, progress=lambda message: outcome.setdefault('status', message))
+    return outcome['status'].endswith('recomputed')
+
+
+def test_results_stay_cached_until_the_lots_change(workspace):
+    assert recomputed(workspace)
+    assert not recomputed(workspace)
+
+    portfolio = workspace.portfolio(default_portfolio_name)
+    portfolio.store.delete_lots([portfolio.store.all_lots()[0][0]])
+    assert recomputed(workspace)
+    assert not recomputed(workspace)
+
+
+def test_saved_results_survive_a_restart(workspace):
+    recomputed(workspace)
+    workspace.close()
+    reopened = Workspace(root=workspace.root, default_directory=workspace.default_directory, benchmark_path=workspace.benchmark_path)
+    assert not recomputed(reopened)
+    assert reopened.portfolio(default_portfolio_name).is_current(reopened.version)
+    reopened.close()
+
+
+def test_a_new_benchmark_recomputes(workspace):
+    recomputed(workspace)
+    frame = pd.read_csv(workspace.benchmark_path)
+    frame.loc[10, 'Close'] *= 1.02
+    frame.to_csv(workspace.benchmark_path, index=False)
+    workspace.load_benchmark(reload=True)
+    assert recomputed(workspace)
+    assert not recomputed(workspace)
+
+
+def test_price_store_changes_recompute(workspace, tmp_path):
+    recomputed(workspace)
+    spy_data = workspace.load_benchmark()
+    prices = PriceStore(str(tmp_path / 'price_history'))
+    ticker = workspace.portfolio(default_portfolio_name).store.to_frame()['Stock Ticker'].iloc[0]
+    close = 50 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.01, len(spy_data.dates))))
+    prices.append(ticker, np.asarray(spy_data.dates)[:-20], close[:-20])
+
+    # Switching from lot returns to a price store, then appending to the store
+    assert recomputed(workspace, prices)
+    assert not recomputed(workspace, prices)
+    assert not workspace.portfolio(default_portfolio_name).is_current(workspace.version)
+    prices.append(ticker, np.asarray(spy_data.dates)[-20:], close[-20:])
+    assert recomputed(workspace, prices)
+    # A freshly opened handle on the same store is the same source
+    assert not recomputed(workspace, PriceStore(prices.directory))
+    # And going back to the lots recomputes again
+    assert recomputed(workspace)